@@ -1,12 +1,18 @@
 from autotune.benchmarks.cifar_problem import CifarProblem
+from autotune.benchmarks.known_fn_store import KnownFnStore
 from autotune.benchmarks.known_loss_fn_problem import KnownFnProblem
 from autotune.benchmarks.mnist_problem import MnistProblem
 from autotune.benchmarks.mrbi_problem import MrbiProblem
+from autotune.benchmarks.nd_opt_function_problem import (
+    AVAILABLE_ND_OPT_FUNCTIONS, NdOptFunctionProblem, NdOptFunctionSimulationProblem)
 from autotune.benchmarks.opt_function_problem import AVAILABLE_OPT_FUNCTIONS, OptFunctionProblem
 from autotune.benchmarks.opt_function_simulation_problem import OptFunctionSimulationProblem
+from autotune.benchmarks.replay_problem import ReplayProblem, load_recorded_loss_functions
 from autotune.benchmarks.svhn_problem import SvhnProblem
 
 __all__ = [
     'CifarProblem', 'MnistProblem', 'MrbiProblem', 'SvhnProblem',
-    'OptFunctionSimulationProblem', 'OptFunctionProblem', 'AVAILABLE_OPT_FUNCTIONS', 'KnownFnProblem'
+    'OptFunctionSimulationProblem', 'OptFunctionProblem', 'AVAILABLE_OPT_FUNCTIONS', 'KnownFnProblem',
+    'KnownFnStore', 'ReplayProblem', 'load_recorded_loss_functions',
+    'NdOptFunctionProblem', 'NdOptFunctionSimulationProblem', 'AVAILABLE_ND_OPT_FUNCTIONS'
 ]
@@ -0,0 +1,117 @@
+import json
+from functools import lru_cache
+from os.path import join as join_path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, cast
+
+import numpy as np
+
+from autotune.core import Arm
+from autotune.util.files import ensure_dir
+
+CURVES_FILE = "curves.npy"    # float32 (n_functions, max_length), padded with NaN
+LENGTHS_FILE = "lengths.npy"  # int64 (n_functions,)
+MASK_FILE = "mask.npy"        # bool (n_functions, max_length), True where curves holds a value
+ARMS_FILE = "arms.npy"        # float64 (n_functions, n_hyperparams)
+COLUMNS_FILE = "columns.json"  # names of the hyperparameters (columns of arms)
+
+
+class KnownFnStore:
+    """Known loss functions stored as arrays: one padded float32 matrix of loss functions with their lengths and mask,
+    plus the matrix of the (numeric) hyperparameter values of their arms and the names of its columns. Saved as a
+    directory of .npy files that are memory-mapped when loaded, so that a database of known loss functions is opened in
+    milliseconds instead of unpickling whole evaluators. A loaded store is pickled as its directory, so that it is
+    shared read-only by worker processes (each of them maps the files once)."""
+
+    def __init__(self, curves: np.ndarray, lengths: np.ndarray, mask: np.ndarray, arms: np.ndarray,
+                 columns: Sequence[str]):
+        """
+        :param curves: loss functions, padded with NaN, shape (n_functions, max_length)
+        :param lengths: length of each loss function, shape (n_functions,)
+        :param mask: whether curves holds a value, shape (n_functions, max_length)
+        :param arms: hyperparameter values of the arm of each loss function, shape (n_functions, len(columns))
+        :param columns: names of the hyperparameters
+        """
+        if not len(curves) == len(lengths) == len(mask) == len(arms):
+            raise ValueError(f"Inconsistent number of known loss functions: {len(curves)} curves, {len(lengths)} "
+                             f"lengths, {len(mask)} masks and {len(arms)} arms")
+        self.curves = curves
+        self.lengths = lengths
+        self.mask = mask
+        self.arms = arms
+        self.columns = tuple(columns)
+        self.directory: Optional[str] = None  # directory the store was loaded from, if any
+
+    def __reduce__(self) -> Tuple[Callable[..., 'KnownFnStore'], Tuple[Any, ...]]:
+        if self.directory is not None:
+            return _load_known_fn_store, (self.directory,)
+        return type(self), (self.curves, self.lengths, self.mask, self.arms, self.columns)
+
+    def __len__(self) -> int:
+        return len(self.lengths)
+
+    def get_loss_function(self, index: int) -> List[float]:
+        """
+        :param index: index of the known loss function
+        :return: known loss function (without padding)
+        """
+        return cast(List[float], self.curves[index, :self.lengths[index]].tolist())
+
+    def get_arm(self, index: int) -> Arm:
+        """
+        :param index: index of the known loss function
+        :return: arm of the known loss function
+        """
+        return Arm(**dict(zip(self.columns, self.arms[index].tolist())))
+
+    @classmethod
+    def from_known_fs(cls, known_fs: Dict[Arm, List[float]]) -> 'KnownFnStore':
+        """
+        :param known_fs: known loss functions by arm (all arms must have the same numeric hyperparameters)
+        :return: store of the known loss functions
+        """
+        arms = list(known_fs.keys())
+        columns = tuple(arms[0].__dict__.keys()) if arms else ()
+        lengths = np.array([len(loss_function) for loss_function in known_fs.values()], dtype=np.int64)
+        max_length = int(lengths.max()) if len(lengths) else 0
+        mask = np.arange(max_length) < lengths[:, None]
+        curves = np.full((len(arms), max_length), np.nan, dtype=np.float32)
+        curves[mask] = np.concatenate([np.asarray(f, dtype=np.float32) for f in known_fs.values()]) if arms else []
+        arm_values = np.array([[float(arm[hp_name]) for hp_name in columns] for arm in arms], dtype=np.float64)
+        return cls(curves, lengths, mask, arm_values.reshape(len(arms), len(columns)), columns)
+
+    def save(self, directory: str) -> None:
+        """
+        :param directory: directory in which to save the store (created if it does not exist)
+        """
+        ensure_dir(directory)
+        np.save(join_path(directory, CURVES_FILE), np.asarray(self.curves, dtype=np.float32))
+        np.save(join_path(directory, LENGTHS_FILE), np.asarray(self.lengths, dtype=np.int64))
+        np.save(join_path(directory, MASK_FILE), np.asarray(self.mask, dtype=bool))
+        np.save(join_path(directory, ARMS_FILE), np.asarray(self.arms, dtype=np.float64))
+        with open(join_path(directory, COLUMNS_FILE), "w") as f:
+            json.dump(list(self.columns), f)
+
+    @classmethod
+    def load(cls, directory: str) -> 'KnownFnStore':
+        """
+        :param directory: directory of a saved store
+        :return: store, its arrays are memory-mapped read-only (cached, so every process maps a directory once)
+        """
+        return _load_known_fn_store(directory)
+
+    @classmethod
+    def _load(cls, directory: str) -> 'KnownFnStore':
+        def load_array(file_name: str) -> np.ndarray:
+            return cast(np.ndarray, np.load(join_path(directory, file_name), mmap_mode='r'))
+
+        with open(join_path(directory, COLUMNS_FILE)) as f:
+            columns = json.load(f)
+        store = cls(load_array(CURVES_FILE), load_array(LENGTHS_FILE), load_array(MASK_FILE), load_array(ARMS_FILE),
+                    columns)
+        store.directory = directory
+        return store
+
+
+@lru_cache(maxsize=None)
+def _load_known_fn_store(directory: str) -> KnownFnStore:
+    return KnownFnStore._load(directory)  # pylint: disable=protected-access
@@ -1,23 +1,146 @@
 from __future__ import division
 
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Sequence, Tuple, Union
 
 import matplotlib.pyplot as plt
 import numpy as np
+from scipy.spatial import cKDTree
 
+from autotune.benchmarks.known_fn_store import KnownFnStore
 from autotune.core import (
     Arm, Domain, HyperparameterOptimisationProblem, OptimisationGoals, SimulationEvaluator, SimulationProblem)
 from autotune.util.io import print_evaluation
 
 
+class KnownFnIndex:
+    """Nearest neighbour index of the arms of known loss functions. Arms are normalized as in Arm.normalize and stored
+    in a matrix with a KD-tree (one per set of hyperparameters to compare, built on first use), so that the closest
+    known arm (in terms of mean square error) is found in O(log N) rather than by scanning all known arms."""
+
+    def __init__(self, arm_values: np.ndarray, columns: Sequence[str], domain: Domain,
+                 arms: Optional[Sequence[Arm]] = None):
+        """
+        :param arm_values: hyperparameter values of the known arms, shape (n_arms, len(columns))
+        :param columns: names of the hyperparameters
+        :param domain: domain of hyperparameters, used to normalize hyperparameter values
+        :param arms: known arms (as objects), if not given they are built from arm_values when needed
+        """
+        self.arm_values = arm_values
+        self.columns = tuple(columns)
+        self.domain = domain
+        self._arms = list(arms) if arms is not None else None
+        self._trees: Dict[Tuple[str, ...], Tuple[np.ndarray, cKDTree]] = {}
+
+    @classmethod
+    def from_arms(cls, arms: Sequence[Arm], domain: Domain) -> 'KnownFnIndex':
+        """
+        :param arms: arms of the known loss functions
+        :param domain: domain of hyperparameters, used to normalize hyperparameter values
+        :return: index of the arms (on the hyperparameters that all of them have)
+        """
+        columns = [hp_name for hp_name in arms[0].__dict__ if all(hasattr(arm, hp_name) for arm in arms[1:])] \
+            if arms else []
+        return cls(cls.to_matrix(arms, columns), columns, domain, arms)
+
+    @property
+    def arms(self) -> List[Arm]:
+        if self._arms is None:
+            self._arms = [Arm(**dict(zip(self.columns, values))) for values in self.arm_values.tolist()]
+        return self._arms
+
+    @staticmethod
+    def to_matrix(arms: Sequence[Arm], hyperparams_names: Sequence[str]) -> np.ndarray:
+        """
+        :param arms: arms
+        :param hyperparams_names: hyperparameters to keep (columns)
+        :return: matrix of hyperparameter values, shape (len(arms), len(hyperparams_names))
+        """
+        values = np.array([[float(arm[hp_name]) for hp_name in hyperparams_names] for arm in arms], dtype=float)
+        return values.reshape(len(arms), len(hyperparams_names))
+
+    def normalize(self, values: np.ndarray, hyperparams_names: Sequence[str]) -> np.ndarray:
+        """
+        :param values: matrix of hyperparameter values, shape (n_arms, len(hyperparams_names))
+        :param hyperparams_names: names of the hyperparameters (columns)
+        :return: matrix of hyperparameter values normalized as in Arm.normalize
+        """
+        return self.domain.compile(hyperparams_names).normalize(values)
+
+    def _get_tree(self, hyperparams_names: Tuple[str, ...]) -> Tuple[np.ndarray, cKDTree]:
+        if hyperparams_names not in self._trees:
+            missing = set(hyperparams_names) - set(self.columns)
+            if missing:
+                raise KeyError(f"Known arms have no values for hyperparameters {missing}")
+            column_indices = [self.columns.index(hp_name) for hp_name in hyperparams_names]
+            normalized_arms = self.normalize(np.asarray(self.arm_values)[:, column_indices], hyperparams_names)
+            self._trees[hyperparams_names] = normalized_arms, cKDTree(normalized_arms)
+        return self._trees[hyperparams_names]
+
+    def query(self, arms: Sequence[Arm]) -> np.ndarray:
+        """
+        :param arms: proposed arms, distances are computed on the hyperparameters of each proposed arm
+        :return: index of the closest known arm of every proposed arm (the first one in case of ties)
+        """
+        closest = np.empty(len(arms), dtype=np.int64)
+        arms_by_hyperparams: Dict[Tuple[str, ...], List[int]] = {}
+        for i, arm in enumerate(arms):
+            arms_by_hyperparams.setdefault(tuple(arm.__dict__.keys()), []).append(i)
+
+        for hyperparams_names, indices in arms_by_hyperparams.items():
+            normalized_arms, tree = self._get_tree(hyperparams_names)
+            normalized_proposed = self.normalize(self.to_matrix([arms[i] for i in indices], hyperparams_names),
+                                                 hyperparams_names)
+            distances, _ = tree.query(normalized_proposed)
+            # the tree finds the distance to the closest arm, all the arms at (about) that distance are then compared
+            # exactly like the square errors of a linear scan so that ties are broken in the same way (first arm)
+            candidates = tree.query_ball_point(normalized_proposed, distances * (1 + 1e-9) + 1e-12)
+            for i, proposed, arm_candidates in zip(indices, normalized_proposed, candidates):
+                arm_candidates = np.sort(np.asarray(arm_candidates, dtype=np.int64))
+                sq_errors = sum((proposed[c] - normalized_arms[arm_candidates, c]) ** 2
+                                for c in range(len(hyperparams_names)))
+                closest[i] = arm_candidates[np.argmin(sq_errors)]
+        return closest
+
+    def get_closest_arms(self, arms: Sequence[Arm]) -> List[Arm]:
+        """
+        :param arms: proposed arms
+        :return: closest known arm of every proposed arm
+        """
+        return [self.arms[i] for i in self.query(arms)]
+
+
 class KnownFnEvaluator(SimulationEvaluator):
 
-    def __init__(self, known_fs: Dict[Arm, List[float]], proposed_arm: Arm, domain: Domain, should_plot: bool = False):
+    def __init__(self, known_fs: Union[Dict[Arm, List[float]], KnownFnStore], proposed_arm: Arm, domain: Domain,
+                 should_plot: bool = False, known_fn_index: Optional[KnownFnIndex] = None):
+        """
+        :param known_fs: known loss functions by arm (or store of known loss functions)
+        :param proposed_arm: arm to evaluate
+        :param domain: domain of hyperparameters, used to normalize hyperparameter values
+        :param should_plot: whether to plot the loss function
+        :param known_fn_index: nearest neighbour index of the arms of known_fs (built if not given)
+        """
         super().__init__(0, 0, 0, 0)
         self.should_plot = should_plot
         self.known_fs = known_fs
         self.proposed_arm = self.arm = proposed_arm
         self.domain = domain
+        self.known_fn_index = known_fn_index
+        self.closest_arm: Optional[Arm] = None  # closest known arm, looked up on first evaluation
+        self.closest_fs: List[float] = []       # known loss function of the closest known arm
+
+    def _find_closest(self) -> None:
+        """Looks up the closest known arm and its loss function (once)."""
+        if self.closest_arm is not None:
+            return
+        if self.known_fn_index is None:
+            self.known_fn_index = get_known_fn_index(self.known_fs, self.domain)
+        index = self.known_fn_index.query([self.proposed_arm])[0]
+        if isinstance(self.known_fs, KnownFnStore):
+            self.closest_arm, self.closest_fs = self.known_fs.get_arm(index), self.known_fs.get_loss_function(index)
+        else:
+            self.closest_arm = self.known_fn_index.arms[index]
+            self.closest_fs = self.known_fs[self.closest_arm]
 
     @print_evaluation(verbose=False, goals_to_print=("fval",))
     def evaluate(self, n_resources: int) -> OptimisationGoals:
@@ -31,43 +154,43 @@ class KnownFnEvaluator(SimulationEvaluator):
         validation_error attributes are mandatory for OptimisationGoals objects but Branin has no machine learning model
         """
         time = int(n_resources)
-        available_arms: List[Arm] = list(self.known_fs.keys())
-        hyperparams_names = self.proposed_arm.__dict__.keys()
-        min_sq_error = np.inf
-        min_sq_error_arm: Optional[Arm] = None
-
-        def sq_error_term(arm1: Arm, arm2: Arm, hp: str) -> float:
-            return (float(arm1[hp]) - float(arm2[hp])) ** 2
+        self._find_closest()
 
-        for arm in available_arms:
-            normalized_arm = Arm.normalize(arm, domain=self.domain)
-            normalized_proposed_arm = Arm.normalize(self.proposed_arm, domain=self.domain)
-            sq_error = sum(sq_error_term(normalized_proposed_arm, normalized_arm, hp_name)
-                           for hp_name in hyperparams_names)
-
-            if sq_error < min_sq_error:
-                min_sq_error_arm = arm
-                min_sq_error = sq_error
-
-        # with open("min_sq_error_file.txt", "a") as f:
-        #     f.write(f"{np.sqrt(min_sq_error/len(hyperparams_names))},")
-
-        assert min_sq_error_arm is not None
         if self.should_plot:
-            plt.plot(list(range(time)), self.known_fs[min_sq_error_arm][:time], linewidth=1.5)
+            plt.plot(list(range(time)), self.closest_fs[:time], linewidth=1.5)
             plt.xlabel("time/epoch/resources")
             plt.ylabel("error/loss")
 
-        return OptimisationGoals(fval=self.known_fs[min_sq_error_arm][time-1], test_error=-1, validation_error=-1,
-                                 fvals=self.known_fs[min_sq_error_arm])
+        return OptimisationGoals(fval=self.closest_fs[time-1], test_error=-1, validation_error=-1,
+                                 fvals=self.closest_fs)
+
+
+def get_known_fn_index(known_fs: Union[Dict[Arm, List[float]], KnownFnStore], domain: Domain) -> KnownFnIndex:
+    """
+    :param known_fs: known loss functions by arm (or store of known loss functions)
+    :param domain: domain of hyperparameters, used to normalize hyperparameter values
+    :return: nearest neighbour index of the arms of the known loss functions
+    """
+    if isinstance(known_fs, KnownFnStore):
+        return KnownFnIndex(known_fs.arms, known_fs.columns, domain)
+    return KnownFnIndex.from_arms(list(known_fs.keys()), domain)
 
 
 class KnownFnProblem(HyperparameterOptimisationProblem, SimulationProblem):
 
-    def __init__(self, known_fs: Dict[Arm, List[float]], real_problem: HyperparameterOptimisationProblem):
+    def __init__(self, known_fs: Union[Dict[Arm, List[float]], KnownFnStore],
+                 real_problem: HyperparameterOptimisationProblem, known_fn_index: Optional[KnownFnIndex] = None):
+        """
+        :param known_fs: known loss functions by arm, or a store of known loss functions (eg. KnownFnStore.load(dir))
+        :param real_problem: problem whose domain and hyperparameters to optimise are used
+        :param known_fn_index: nearest neighbour index of the arms of known_fs (eg. shared by several problems), built
+                               if not given
+        """
         HyperparameterOptimisationProblem.__init__(self, real_problem.domain, real_problem.hyperparams_to_opt)
         SimulationProblem.__init__(self)
         self.known_fs = known_fs
+        self.known_fn_index = known_fn_index if known_fn_index is not None else \
+            get_known_fn_index(known_fs, self.domain)
 
     def get_evaluator(  # type: ignore # pylint: disable=arguments-differ  # FIXME
             self, arm: Optional[Arm] = None, should_plot: bool = False
@@ -80,7 +203,8 @@ class KnownFnProblem(HyperparameterOptimisationProblem, SimulationProblem):
         if arm is None:  # if no arm is provided, generate a random arm
             arm = Arm()
             arm.draw_hp_val(domain=self.domain, hyperparams_to_opt=self.hyperparams_to_opt)
-        return KnownFnEvaluator(known_fs=self.known_fs, proposed_arm=arm, should_plot=should_plot, domain=self.domain)
+        return KnownFnEvaluator(known_fs=self.known_fs, proposed_arm=arm, should_plot=should_plot, domain=self.domain,
+                                known_fn_index=self.known_fn_index)
 
 
 if __name__ == "__main__":
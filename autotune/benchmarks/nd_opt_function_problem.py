@@ -0,0 +1,220 @@
+"""d-dimensional optimisation functions (see https://www.sfu.ca/~ssurjano/optimization.html) to study how optimisers
+scale with the number of hyperparameters. Functions take a batch of points as an (N, d) array and are vectorized across
+both points and dimensions, hyperparameters are named x1, ..., xd."""
+from __future__ import division
+
+from operator import attrgetter
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from autotune.benchmarks.opt_function_problem import (
+    OptFunctionBuilder, OptFunctionEvaluator, OptFunctionProblem, add_noise)
+from autotune.benchmarks.opt_function_simulation_problem import (
+    OptFunctionSimulationEvaluator, OptFunctionSimulationProblem)
+from autotune.core import Arm, Domain, ModelBuilder, Param, ShapeFamily
+
+AVAILABLE_ND_OPT_FUNCTIONS = ('rastrigin', 'styblinski_tang', 'levy', 'ackley')
+
+BOUNDS = {
+    'rastrigin': (-5.12, 5.12),
+    'styblinski_tang': (-5, 5),
+    'levy': (-10, 10),
+    'ackley': (-32.768, 32.768),
+}
+
+GLOBAL_MIN_STYBLINSKI_TANG_PER_DIMENSION = -39.16616570377142  # global minimum is d times this, at xi = -2.903534
+
+
+def rastrigin(xs: np.ndarray, noise_variance: float = 0, scaled_noise: bool = False,
+              rng: Optional[np.random.Generator] = None) -> np.ndarray:
+    """Rastrigin function.
+
+    :param xs: points, shape (N, d)
+    :param noise_variance: how noisy to make rastrigin
+    :param scaled_noise: whether to apply linear noise scaling
+    :param rng: random generator of the noise (see opt_function_problem)
+    :return: values of rastrigin function, shape (N,), global minimum 0 at 0
+    """
+    f = 10 * xs.shape[1] + np.sum(xs ** 2 - 10 * np.cos(2 * np.pi * xs), axis=1)
+    return np.asarray(add_noise(f, noise_variance, 1 if not scaled_noise else f, rng))
+
+
+def styblinski_tang(xs: np.ndarray, noise_variance: float = 0, scaled_noise: bool = False,
+                    rng: Optional[np.random.Generator] = None) -> np.ndarray:
+    """Styblinski-Tang function.
+
+    :param xs: points, shape (N, d)
+    :param noise_variance: how noisy to make styblinski-tang
+    :param scaled_noise: whether to apply linear noise scaling
+    :param rng: random generator of the noise (see opt_function_problem)
+    :return: values of styblinski-tang function, shape (N,)
+    """
+    f = np.sum(xs ** 4 - 16 * xs ** 2 + 5 * xs, axis=1) / 2
+    global_min = GLOBAL_MIN_STYBLINSKI_TANG_PER_DIMENSION * xs.shape[1]
+    return np.asarray(add_noise(f, noise_variance, 1 if not scaled_noise else f - global_min, rng))
+
+
+def levy(xs: np.ndarray, noise_variance: float = 0, scaled_noise: bool = False,
+         rng: Optional[np.random.Generator] = None) -> np.ndarray:
+    """Levy function.
+
+    :param xs: points, shape (N, d)
+    :param noise_variance: how noisy to make levy
+    :param scaled_noise: whether to apply linear noise scaling
+    :param rng: random generator of the noise (see opt_function_problem)
+    :return: values of levy function, shape (N,), global minimum 0 at 1
+    """
+    w = 1 + (xs - 1) / 4
+    f = np.sin(np.pi * w[:, 0]) ** 2
+    f += np.sum((w[:, :-1] - 1) ** 2 * (1 + 10 * np.sin(np.pi * w[:, :-1] + 1) ** 2), axis=1)
+    f += (w[:, -1] - 1) ** 2 * (1 + np.sin(2 * np.pi * w[:, -1]) ** 2)
+    return np.asarray(add_noise(f, noise_variance, 1 if not scaled_noise else f, rng))
+
+
+def ackley(xs: np.ndarray, noise_variance: float = 0, scaled_noise: bool = False,
+           rng: Optional[np.random.Generator] = None) -> np.ndarray:
+    """Ackley function.
+
+    :param xs: points, shape (N, d)
+    :param noise_variance: how noisy to make ackley
+    :param scaled_noise: whether to apply linear noise scaling
+    :param rng: random generator of the noise (see opt_function_problem)
+    :return: values of ackley function, shape (N,), global minimum 0 at 0
+    """
+    a, b, c = 20, 0.2, 2 * np.pi
+    f = -a * np.exp(-b * np.sqrt(np.mean(xs ** 2, axis=1))) - np.exp(np.mean(np.cos(c * xs), axis=1)) + a + np.e
+    return np.asarray(add_noise(f, noise_variance, 1 if not scaled_noise else f, rng))
+
+
+ND_OPT_FUNCTIONS: Dict[str, Callable[..., np.ndarray]] = {
+    'rastrigin': rastrigin,
+    'styblinski_tang': styblinski_tang,
+    'levy': levy,
+    'ackley': ackley,
+}
+
+
+def get_hyperparams_names(n_dimensions: int) -> Tuple[str, ...]:
+    """
+    :param n_dimensions: number of dimensions d
+    :return: names of the hyperparameters x1, ..., xd
+    """
+    return tuple(f"x{i}" for i in range(1, n_dimensions + 1))
+
+
+def get_nd_domain(func_name: str, n_dimensions: int) -> Domain:
+    """
+    :param func_name: name of the d-dimensional optimisation function (eg. rastrigin, ackley)
+    :param n_dimensions: number of dimensions d
+    :return: domain of the function, uniform on the usual hypercube of the function
+    """
+    if n_dimensions < 1:
+        raise ValueError(f"Number of dimensions must be at least 1, instead {n_dimensions} was supplied")
+    min_val, max_val = BOUNDS[func_name]
+    return Domain(**{hp_name: Param(hp_name, min_val, max_val, distrib='uniform', scale='linear')
+                     for hp_name in get_hyperparams_names(n_dimensions)})
+
+
+def get_points(arms: Sequence[Arm], n_dimensions: int) -> np.ndarray:
+    """
+    :param arms: arms with hyperparameters x1, ..., xd
+    :param n_dimensions: number of dimensions d
+    :return: points, shape (len(arms), d)
+    """
+    get_values = attrgetter(*get_hyperparams_names(n_dimensions))
+    return np.array([get_values(arm) for arm in arms], dtype=float).reshape(len(arms), n_dimensions)
+
+
+class NdOptFunctionEvaluator(OptFunctionEvaluator):
+
+    def __init__(self, func_name: str, model_builder: ModelBuilder, n_dimensions: int):
+        super().__init__(func_name, model_builder)
+        self.n_dimensions = n_dimensions
+
+    def get_function_value(self) -> float:
+        return float(ND_OPT_FUNCTIONS[self.func_name](get_points([self.arm], self.n_dimensions))[0])
+
+
+class NdOptFunctionProblem(OptFunctionProblem):
+
+    """d-dimensional canonical optimisation test problem."""
+
+    def __init__(self, func_name: str, n_dimensions: int, hyperparams_to_opt: Tuple[str, ...] = ()):
+        """
+        :param func_name: name of the d-dimensional optimisation function (eg. rastrigin, ackley)
+        :param n_dimensions: number of dimensions d (hyperparameters x1, ..., xd)
+        :param hyperparams_to_opt: names of hyperparameters to be optimised, if () all params from domain are optimised
+        """
+        super().__init__(func_name, hyperparams_to_opt, get_nd_domain(func_name, n_dimensions))
+        self.n_dimensions = n_dimensions
+
+    def get_evaluator(self, arm: Optional[Arm] = None) -> NdOptFunctionEvaluator:
+        """
+        :param arm: a combination of hyperparameters and their values
+        :return: problem evaluator for an arm (given or random if not given)
+        """
+        if arm is None:  # if no arm is provided, generate a random arm
+            arm = Arm()
+            arm.draw_hp_val(domain=self.domain, hyperparams_to_opt=self.hyperparams_to_opt)
+        return NdOptFunctionEvaluator(self.func_name, OptFunctionBuilder(arm), self.n_dimensions)
+
+    def get_function_values(self, arms: Sequence[Arm], noise_variance: float = 0,
+                            rng: Optional[np.random.Generator] = None) -> np.ndarray:
+        return ND_OPT_FUNCTIONS[self.func_name](get_points(arms, self.n_dimensions), noise_variance=noise_variance,
+                                                rng=rng)
+
+    def sample_domain(self, n_points: int, is_grid: bool = False,
+                      rng: Optional[np.random.Generator] = None) -> Tuple[np.ndarray, np.ndarray]:
+        raise TypeError(f"{type(self).__name__} has no (x, y) domain, draw arms instead (see draw_arms)")
+
+    def plot_surface(self, n_simulations: int, is_grid: bool = False, file_path: Optional[str] = None) -> None:
+        raise TypeError(f"{type(self).__name__} has no (x, y) domain, surfaces are only plotted for 2D functions")
+
+
+class NdOptFunctionSimulationEvaluator(OptFunctionSimulationEvaluator):
+
+    def __init__(self, n_dimensions: int, **kwargs: Any):
+        """
+        :param n_dimensions: number of dimensions d
+        :param kwargs: parameters of OptFunctionSimulationEvaluator
+        """
+        super().__init__(**kwargs)
+        self.n_dimensions = n_dimensions
+
+    def get_function_value(self) -> float:
+        return float(ND_OPT_FUNCTIONS[self.func_name](get_points([self.arm], self.n_dimensions))[0])
+
+
+class NdOptFunctionSimulationProblem(OptFunctionSimulationProblem):
+
+    def __init__(self, func_name: str, n_dimensions: int, hyperparams_to_opt: Tuple[str, ...] = (),
+                 **kwargs: Any):
+        """
+        :param func_name: name of the d-dimensional optimisation function (eg. rastrigin, ackley)
+        :param n_dimensions: number of dimensions d (hyperparameters x1, ..., xd)
+        :param hyperparams_to_opt: names of hyperparameters to be optimised, if () all params from domain are optimised
+        :param kwargs: other parameters of OptFunctionSimulationProblem (eg. is_lazy, seed, crn, curve_bank_dir)
+        """
+        super().__init__(func_name, hyperparams_to_opt, hyperparams_domain=get_nd_domain(func_name, n_dimensions),
+                         **kwargs)
+        self.n_dimensions = n_dimensions
+
+    def _get_simulation_evaluator(self, **kwargs: Any) -> NdOptFunctionSimulationEvaluator:
+        return NdOptFunctionSimulationEvaluator(self.n_dimensions, **kwargs)
+
+    def get_function_values(self, arms: Sequence[Arm], noise_variance: float = 0,
+                            rng: Optional[np.random.Generator] = None) -> np.ndarray:
+        return ND_OPT_FUNCTIONS[self.func_name](get_points(arms, self.n_dimensions), noise_variance=noise_variance,
+                                                rng=rng)
+
+    def sample_domain(self, n_points: int, is_grid: bool = False,
+                      rng: Optional[np.random.Generator] = None) -> Tuple[np.ndarray, np.ndarray]:
+        raise TypeError(f"{type(self).__name__} has no (x, y) domain, draw arms instead (see draw_arms)")
+
+    def plot_surface(
+            self, n_simulations: int, is_grid: bool = False, file_path: Optional[str] = None,
+            max_resources: int = 81, n_resources: Optional[int] = None,
+            shape_families: Tuple[ShapeFamily, ...] = (ShapeFamily(None, 0.9, 10, 0.1),), init_noise: float = 0
+    ) -> None:
+        raise TypeError(f"{type(self).__name__} has no (x, y) domain, surfaces are only plotted for 2D functions")
@@ -1,9 +1,11 @@
 from __future__ import division
 
-from typing import Any, Optional, Tuple, Union, cast
+from types import ModuleType
+from typing import Any, List, Optional, Sequence, Tuple, Union, cast, overload
 
 import matplotlib.pyplot as plt
 import numpy as np
+from matplotlib.figure import Figure
 from mpl_toolkits.mplot3d import Axes3D
 
 from autotune.core import (
@@ -11,6 +13,7 @@ from autotune.core import (
 from autotune.util.io import print_evaluation
 
 AVAILABLE_OPT_FUNCTIONS = ('rastrigin', 'wave', 'branin', 'egg', 'camel')
+SURFACE_RESOLUTION = 200  # maximum number of rows (and columns) of grid surfaces that are drawn
 
 HYPERPARAMS_DOMAIN_EGGHOLDER = Domain(
     x=Param('x', -512, 512, distrib='uniform', scale='linear'),
@@ -46,30 +49,74 @@ DOMAINS = {
 }
 
 
+def draw_noise(f: Union[float, np.ndarray], rng: Optional[np.random.Generator]) -> Union[float, np.ndarray]:
+    """
+    :param f: values of an optimisation function
+    :param rng: random generator, if None the global numpy random state is used
+    :return: standard normal noise, one draw per value of f (of the same shape as f)
+    """
+    random_state: Union[ModuleType, np.random.Generator] = np.random if rng is None else rng
+    return random_state.standard_normal(np.shape(f))
+
+
+@overload
+def add_noise(f: float, noise_variance: float, scale: float, rng: Optional[np.random.Generator]) -> float: ...
+
+
+@overload
+def add_noise(f: np.ndarray, noise_variance: float, scale: Union[float, np.ndarray],
+              rng: Optional[np.random.Generator]) -> np.ndarray: ...
+
+
+@overload
+def add_noise(f: Union[float, np.ndarray], noise_variance: float, scale: Union[float, np.ndarray],
+              rng: Optional[np.random.Generator]) -> Union[float, np.ndarray]: ...
+
+
+def add_noise(f: Union[float, np.ndarray], noise_variance: float, scale: Union[float, np.ndarray],
+              rng: Optional[np.random.Generator]) -> Union[float, np.ndarray]:
+    """
+    :param f: values of an optimisation function
+    :param noise_variance: how noisy to make the function, nothing is drawn if it is 0
+    :param scale: scale of the noise (eg. f - global minimum for linear noise scaling)
+    :param rng: random generator of the noise (see draw_noise)
+    :return: noisy values of f
+    """
+    if noise_variance == 0:
+        return f
+    return f + noise_variance * draw_noise(f, rng) * scale
+
+
 def egg_holder(
-        x1: Union[int, np.ndarray], x2: Union[int, np.ndarray], noise_variance: int = 0, scaled_noise: bool = False
-) -> Union[int, np.ndarray]:
+        x1: Union[int, np.ndarray], x2: Union[int, np.ndarray], noise_variance: float = 0, scaled_noise: bool = False,
+        rng: Optional[np.random.Generator] = None
+) -> Union[float, np.ndarray]:
     """Egg Holder function.
 
     :param x1: x
     :param x2: y
     :param noise_variance: how noisy to make egg holder
     :param scaled_noise: whether to apply linear noise scaling
+    :param rng: random generator of the noise (one draw per value of x1, x2), if None the global numpy random state
+                is used
     :return: value of Egg Holder function
     """
     f = - (x2+47) * np.sin(np.sqrt(abs(x2 + 0.5*x1 + 47))) - x1 * np.sin(np.sqrt(abs(x1 - x2 - 47)))
-    return f + noise_variance * np.random.randn(1)[0] * (1 if not scaled_noise else f - GLOBAL_MIN_EGGHOLDER)
+    return add_noise(f, noise_variance, 1 if not scaled_noise else f - GLOBAL_MIN_EGGHOLDER, rng)
 
 
 def branin(
-        x1: Union[int, np.ndarray], x2: Union[int, np.ndarray], noise_variance: float = 0, scaled_noise: bool = False
-) -> Union[int, np.ndarray]:
+        x1: Union[int, np.ndarray], x2: Union[int, np.ndarray], noise_variance: float = 0, scaled_noise: bool = False,
+        rng: Optional[np.random.Generator] = None
+) -> Union[float, np.ndarray]:
     """Branin function.
 
     :param x1: x
     :param x2: y
     :param noise_variance: how noisy to make branin
     :param scaled_noise: whether to apply linear noise scaling
+    :param rng: random generator of the noise (one draw per value of x1, x2), if None the global numpy random state
+                is used
     :return: value of Branin function
     """
     a = 1
@@ -80,52 +127,61 @@ def branin(
     t = 1 / (8 * np.pi)
 
     f = a * (x2 - b * x1 ** 2 + c * x1 - r) ** 2 + s * (1 - t) * np.cos(x1) + s
-    return f + noise_variance * np.random.randn(1)[0] * (1 if not scaled_noise else f - GLOBAL_MIN_BRANIN)
+    return add_noise(f, noise_variance, 1 if not scaled_noise else f - GLOBAL_MIN_BRANIN, rng)
 
 
 def six_hump_camel(
-        x1: Union[int, np.ndarray], x2: Union[int, np.ndarray], noise_variance: int = 0, scaled_noise: bool = False
-) -> Union[int, np.ndarray]:
+        x1: Union[int, np.ndarray], x2: Union[int, np.ndarray], noise_variance: float = 0, scaled_noise: bool = False,
+        rng: Optional[np.random.Generator] = None
+) -> Union[float, np.ndarray]:
     """Six Hump Camel function.
 
     :param x1: x
     :param x2: y
     :param noise_variance: how noisy to make six hump camel
     :param scaled_noise:
+    :param rng: random generator of the noise (one draw per value of x1, x2), if None the global numpy random state
+                is used
     :return: value of Six Hump Camel function
     """
     f = (4 - (2.1*(x1**2)) + ((x1**4)/3)) * (x1**2)
     f += x1 * x2
     f += (-4 + 4*(x2**2)) * (x2**2)
-    return f + noise_variance * np.random.randn(1)[0] * (1 if not scaled_noise else f - GLOBAL_MIN_CAMEL)
+    return add_noise(f, noise_variance, 1 if not scaled_noise else f - GLOBAL_MIN_CAMEL, rng)
 
 
 def drop_wave(
-        x1: Union[int, np.ndarray], x2: Union[int, np.ndarray], noise_variance: int = 0, scaled_noise: bool = False
-) -> Union[int, np.ndarray]:
+        x1: Union[int, np.ndarray], x2: Union[int, np.ndarray], noise_variance: float = 0, scaled_noise: bool = False,
+        rng: Optional[np.random.Generator] = None
+) -> Union[float, np.ndarray]:
     """Drop-wave function.
 
     :param x1: x
     :param x2: y
     :param noise_variance: how noisy to make drop-wave
     :param scaled_noise:
+    :param rng: random generator of the noise (one draw per value of x1, x2), if None the global numpy random state
+                is used
     :return: value of drop-wave function
     """
     f1 = 1 + np.cos(12*np.sqrt(x1**2 + x2**2))
     f2 = 0.5 * (x1**2 + x2**2) + 2
     f = - f1 / f2
-    return f + noise_variance * np.random.randn(1)[0] * (1 if not scaled_noise else f - GLOBAL_MIN_WAVE)
+    return add_noise(f, noise_variance, 1 if not scaled_noise else f - GLOBAL_MIN_WAVE, rng)
 
 
 def rastrigin(
-        x1: Union[int, np.ndarray], x2: Union[int, np.ndarray], noise_variance: int = 0, scaled_noise: bool = False
-) -> Union[int, np.ndarray]:
+        x1: Union[int, np.ndarray], x2: Union[int, np.ndarray], noise_variance: float = 0, scaled_noise: bool = False,
+        rng: Optional[np.random.Generator] = None
+) -> Union[float, np.ndarray]:
     """Rastrigin function.
 
     :param x1: x
     :param x2: y
     :param noise_variance: how noisy to make rastrigin
     :param scaled_noise:
+    :param rng: random generator of the noise (one draw per value of x1, x2), if None the global numpy random state
+                is used
     :return: value of rastrigin function
     """
     d = 2
@@ -135,7 +191,7 @@ def rastrigin(
         return cast(float, x_i**2 - 10 * np.cos(2*np.pi*x_i))
 
     f = 10*d + sum(rastrigin_term(x_i) for x_i in x)  # type: ignore  # sum() apparently is annotated with int only
-    return f + noise_variance * np.random.randn(1)[0] * (1 if not scaled_noise else f - GLOBAL_MIN_RASTRIGIN)
+    return add_noise(f, noise_variance, 1 if not scaled_noise else f - GLOBAL_MIN_RASTRIGIN, rng)
 
 
 OPT_FUNCTIONS = {
@@ -173,8 +229,13 @@ class OptFunctionEvaluator(Evaluator):
         :return: the function value for the current arm can be found in OptimisationGoals.fval, Note that test_error and
         validation_error attributes are mandatory for OptimisationGoals objects but 6HC has no machine learning model
         """
-        return OptimisationGoals(fval=OPT_FUNCTIONS[self.func_name](self.arm.x, self.arm.y, noise_variance=0),
-                                 test_error=-1, validation_error=-1)
+        return OptimisationGoals(fval=self.get_function_value(), test_error=-1, validation_error=-1)
+
+    def get_function_value(self) -> float:
+        """
+        :return: value of the optimisation function at the arm (without noise)
+        """
+        return float(OPT_FUNCTIONS[self.func_name](self.arm.x, self.arm.y, noise_variance=0))
 
     def _train(self, epoch: int, max_batches: int, batch_size: int) -> float:
         raise TypeError('Cannot call _train on well defined loss functions')
@@ -190,12 +251,16 @@ class OptFunctionProblem(HyperparameterOptimisationProblem):
 
     """Canonical optimisation test problem See https://www.sfu.ca/~ssurjano/optimization.html."""
 
-    def __init__(self, func_name: str, hyperparams_to_opt: Tuple[str, ...] = ()):
+    supports_batch_evaluation = True  # optimisation functions are vectorized across arms
+
+    def __init__(self, func_name: str, hyperparams_to_opt: Tuple[str, ...] = (),
+                 hyperparams_domain: Optional[Domain] = None):
         """
         :param func_name: Name of the optimization function (Eg. branin, egg)
         :param hyperparams_to_opt: names of hyperparameters to be optimised, if () all params from domain are optimised
+        :param hyperparams_domain: domain of the function, by default the domain of the 2D function func_name
         """
-        super().__init__(DOMAINS[func_name], hyperparams_to_opt)
+        super().__init__(DOMAINS[func_name] if hyperparams_domain is None else hyperparams_domain, hyperparams_to_opt)
         self.func_name = func_name
 
     def get_evaluator(self, arm: Optional[Arm] = None) -> OptFunctionEvaluator:
@@ -209,31 +274,90 @@ class OptFunctionProblem(HyperparameterOptimisationProblem):
         model_builder = OptFunctionBuilder(arm)
         return OptFunctionEvaluator(self.func_name, model_builder)
 
-    def plot_surface(self, n_simulations: int) -> None:
-        xs, ys, zs = [], [], []
-        for _ in range(n_simulations):
-            evaluator = self.get_evaluator()
-            xs.append(evaluator.arm.x)
-            ys.append(evaluator.arm.y)
-            zs.append(evaluator.evaluate(n_resources=0).fval)
+    def evaluate_batch(self, evaluators: Sequence[Evaluator], n_resources: int) -> List[OptimisationGoals]:
+        """Evaluates the optimisation function on the arms of all evaluators at once (without noise, like evaluate).
+
+        :param evaluators: evaluators of this problem
+        :param n_resources: this parameter is not used in this function but all optimisers require this parameter
+        :return: optimisation goals of every evaluator, the same as evaluator.evaluate(n_resources)
+        """
+        fvals = self.get_function_values([evaluator.arm for evaluator in evaluators])
+        return [OptimisationGoals(fval=fval, test_error=-1, validation_error=-1) for fval in fvals.tolist()]
 
-        xs, ys, zs = [np.array(array, dtype="float64") for array in (xs, ys, zs)]
+    def get_function_values(self, arms: Sequence[Arm], noise_variance: float = 0,
+                            rng: Optional[np.random.Generator] = None) -> np.ndarray:
+        """
+        :param arms: arms
+        :param noise_variance: how noisy to make the function
+        :param rng: random generator of the noise (see the optimisation functions)
+        :return: values of the optimisation function at all arms (in one call)
+        """
+        xs = np.array([arm.x for arm in arms], dtype=float)
+        ys = np.array([arm.y for arm in arms], dtype=float)
+        return np.asarray(OPT_FUNCTIONS[self.func_name](xs, ys, noise_variance=noise_variance, rng=rng))
+
+    def sample_domain(self, n_points: int, is_grid: bool = False,
+                      rng: Optional[np.random.Generator] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        :param n_points: number of points (x, y)
+        :param is_grid: whether to take a regular grid of about n_points points rather than random points
+        :param rng: random generator of random points, if None the global numpy random state is used
+        :return: xs, ys - of shape (n, n) with n = floor(sqrt(n_points)) if is_grid, of shape (n_points,) otherwise
+        """
+        x_param, y_param = self.domain['x'], self.domain['y']
+        if is_grid:
+            side = int(np.sqrt(n_points))
+            return cast(Tuple[np.ndarray, np.ndarray], tuple(np.meshgrid(x_param.get_param_range(side),
+                                                                         y_param.get_param_range(side))))
+        return (np.asarray(x_param.get_param_range(n_points, stochastic=True, rng=rng), dtype=float),
+                np.asarray(y_param.get_param_range(n_points, stochastic=True, rng=rng), dtype=float))
+
+    def plot_surface(self, n_simulations: int, is_grid: bool = False, file_path: Optional[str] = None) -> None:
+        """Plots the surface of the optimisation function, evaluated on all points at once.
+
+        :param n_simulations: number of points at which to evaluate the function
+        :param is_grid: whether to evaluate the function on a regular grid rather than on random points (much faster to
+                        render for many points)
+        :param file_path: if given, the plot is saved to this file (no interactive backend is needed), otherwise shown
+        """
+        xs, ys = self.sample_domain(n_simulations, is_grid)
+        zs = np.asarray(OPT_FUNCTIONS[self.func_name](xs, ys, noise_variance=0))
 
         # plt.hist(zs, cumulative=False)
         # plt.xlabel(f"Values of {self.func_name} function")
         # plt.ylabel("Count")
         # plt.show()
 
-        fig = plt.figure()
-        ax = fig.gca(projection=Axes3D.name)
+        plot_surface(xs, ys, zs, file_path)
+
+
+def plot_surface(xs: np.ndarray, ys: np.ndarray, zs: np.ndarray, file_path: Optional[str] = None,
+                 colorbar_shrink: float = 0.5) -> None:
+    """
+    :param xs: x coordinates, of shape (n, m) for a grid (drawn as a surface) or (n,) for scattered points (drawn as a
+               triangulated surface)
+    :param ys: y coordinates, of the same shape as xs
+    :param zs: values, of the same shape as xs
+    :param file_path: if given, the plot is saved to this file (no interactive backend is needed), otherwise shown
+    :param colorbar_shrink: size of the colour bar relative to the plot
+    """
+    fig = Figure() if file_path is not None else plt.figure()
+    ax = fig.add_subplot(projection=Axes3D.name)
+    if np.ndim(zs) == 2:
+        surf = ax.plot_surface(xs, ys, zs, cmap="coolwarm", antialiased=True,
+                               rcount=min(SURFACE_RESOLUTION, zs.shape[0]), ccount=min(SURFACE_RESOLUTION, zs.shape[1]))
+    else:
         surf = ax.plot_trisurf(xs, ys, zs, cmap="coolwarm", antialiased=True)
-        fig.colorbar(surf, shrink=0.5, aspect=5)
+    fig.colorbar(surf, shrink=colorbar_shrink, aspect=5)
 
+    if file_path is not None:
+        fig.savefig(file_path)
+    else:
         plt.show()
 
 
 if __name__ == "__main__":
-    OptFunctionProblem('rastrigin').plot_surface(50000)
+    OptFunctionProblem('rastrigin').plot_surface(1000000, is_grid=True)
     OptFunctionProblem('wave').plot_surface(50000)
     OptFunctionProblem('egg').plot_surface(50000)
     OptFunctionProblem('branin').plot_surface(50000)
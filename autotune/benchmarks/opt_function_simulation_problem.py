@@ -1,18 +1,20 @@
 from __future__ import division
 
-from typing import Optional, Tuple
+from types import ModuleType
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
 
 import matplotlib.pyplot as plt
 import numpy as np
-from mpl_toolkits.mplot3d import Axes3D
 
 from autotune.benchmarks.opt_function_problem import (
-    OPT_FUNCTIONS, OptFunctionBuilder, OptFunctionEvaluator, OptFunctionProblem)
+    OPT_FUNCTIONS, OptFunctionBuilder, OptFunctionEvaluator, OptFunctionProblem, plot_surface)
 from autotune.core import (
-    Arm, ModelBuilder, OptimisationGoals, RoundRobinShapeFamilyScheduler, ShapeFamily, SimulationEvaluator,
-    SimulationProblem)
+    Arm, CommonRandomNumbers, CurveBank, Domain, Evaluator, EvaluatorParams, HyperparameterOptimisationProblem,
+    ModelBuilder, OptimisationGoals, ShapeFamily, SimulationEvaluator, SimulationProblem, simulate_batch)
 from autotune.util.io import print_evaluation
 
+SURFACE_CHUNK_SIZE = 10000  # number of loss functions simulated at once by plot_surface
+
 
 class OptFunctionSimulationEvaluator(OptFunctionEvaluator, SimulationEvaluator):
     EPSILON = 0.0001
@@ -27,7 +29,10 @@ class OptFunctionSimulationEvaluator(OptFunctionEvaluator, SimulationEvaluator):
                  end_shift: int = 200,
                  max_resources: int = 81,
                  init_noise: int = 0,
-                 should_plot: bool = False):
+                 should_plot: bool = False,
+                 is_lazy: bool = False,
+                 rng: Optional[np.random.Generator] = None,
+                 curve_bank: Optional[CurveBank] = None):
         """
         :param model_builder:
         :param ml_aggressiveness:
@@ -39,13 +44,23 @@ class OptFunctionSimulationEvaluator(OptFunctionEvaluator, SimulationEvaluator):
         :param max_resources:
         :param init_noise:
         :param should_plot:
+        :param is_lazy: simulate the loss function only up to the requested resources and resume from there when more
+                        resources are requested (only applies if not is_smooth since smoothing needs the whole curve)
+        :param rng: random stream of this evaluator (needed by is_lazy so that the lazy loss function is the same as the
+                    one that would have been simulated at once)
+        :param curve_bank: if given, the loss function is drawn from this bank of pre-simulated loss functions of the
+                           same shape family (and max_resources) instead of being simulated
         """
         OptFunctionEvaluator.__init__(self, func_name=func_name, model_builder=model_builder)
         SimulationEvaluator.__init__(self, ml_aggressiveness, necessary_aggressiveness, up_spikiness, max_resources,
-                                     is_smooth)
+                                     is_smooth, rng)
+        self.is_lazy = is_lazy and not is_smooth
+        self.curve_bank = curve_bank
         self.init_noise = init_noise
         self.start_shift, self.end_shift = start_shift, end_shift
         self.should_plot = should_plot
+        self.f_1: Optional[float] = None  # first value of f (noisy), set when the loss function is simulated
+        self.f_n: Optional[float] = None  # target, last value of f, set when the loss function is simulated
 
     @print_evaluation(verbose=False, goals_to_print=())
     def evaluate(self, n_resources: int) -> OptimisationGoals:
@@ -58,36 +73,98 @@ class OptFunctionSimulationEvaluator(OptFunctionEvaluator, SimulationEvaluator):
         time = int(n_resources)
         n_resources_before_first_halving = 0
         n = self.max_resources + n_resources_before_first_halving
-        branin_value = OPT_FUNCTIONS[self.func_name](self.arm.x, self.arm.y, noise_variance=0, scaled_noise=True)
-        branin_noisy_value = OPT_FUNCTIONS[self.func_name](self.arm.x, self.arm.y, self.init_noise, scaled_noise=False)
-        f_n = branin_value - self.end_shift  # target (last value of f)
-        f_1 = branin_noisy_value - self.start_shift  # first value of f
-        # print(f"Starting from: {branin_value} and aiming to finish at: {f_n}")
-
-        if not self.non_smooth_fs:
-            self.non_smooth_fs = [f_1]
-            self.simulate(n, n, f_n)
-
-        if time == 1:
-            self.non_smooth_fs = [f_1]
-            self.simulate(n, n, f_n)
-            return OptimisationGoals(fval=self.fs[time-1], test_error=-1, validation_error=-1)
 
-        self.simulate(n, n, f_n)
+        if not self.non_smooth_fs:  # the loss function is simulated once, then all evaluations are lookups
+            random_state: Union[ModuleType, np.random.Generator] = np.random if self.rng is None else self.rng
+            opt_function_value = self.get_function_value()
+            self.f_n = opt_function_value - self.end_shift  # target (last value of f)
+            self.f_1 = opt_function_value + self.init_noise * random_state.standard_normal() - self.start_shift
+            self.non_smooth_fs = [self.f_1]
+            if self.curve_bank is not None:  # the bank already applied smoothing (if any) to its loss functions
+                n_curves = len(self.curve_bank)
+                index = int(np.random.randint(n_curves) if self.rng is None else self.rng.integers(n_curves))
+                self.non_smooth_fs = self.curve_bank.get_loss_function(index, self.f_1, self.f_n).tolist()
+                self.is_smooth = False
+        f_n = self.f_n
+        assert f_n is not None  # set with the first value of the loss function
+        self.simulate(min(time, n) if self.is_lazy else n, n, f_n)  # resumes from the last simulated point
 
+        fs = self.fs
         if self.should_plot:
-            plt.plot(list(range(time)), self.fs[:time], linewidth=1.5)
+            plt.plot(list(range(time)), fs[:time], linewidth=1.5)
             plt.xlabel("time/epoch/resources")
             plt.ylabel("error/loss")
             # plt.ylim(-self.end_shift-10, 210-self.start_shift)
-        if time == self.max_resources and self.necessary_aggressiveness != np.inf:
+        if time == self.max_resources and self.necessary_aggressiveness != np.inf and self.curve_bank is None:
             assert self.non_smooth_fs[n-1] - f_n < self.EPSILON
 
-        return OptimisationGoals(fval=self.fs[time-1], test_error=-1, validation_error=-1)
+        return OptimisationGoals(fval=fs[time-1], test_error=-1, validation_error=-1)
 
 
 class OptFunctionSimulationProblem(OptFunctionProblem, SimulationProblem):
 
+    supports_batch_evaluation = False  # evaluators simulate loss functions (see simulate_batch for batches of arms)
+
+    def __init__(self, func_name: str, hyperparams_to_opt: Tuple[str, ...] = (), is_lazy: bool = False,
+                 seed: Optional[int] = None, crn: Union[None, int, np.random.SeedSequence, CommonRandomNumbers] = None,
+                 curve_bank_dir: Optional[str] = None, curve_bank_size: int = 10000,
+                 hyperparams_domain: Optional[Domain] = None):
+        """
+        :param func_name: Name of the optimization function (Eg. branin, egg)
+        :param hyperparams_to_opt: names of hyperparameters to be optimised, if () all params from domain are optimised
+        :param is_lazy: evaluators simulate (non-smooth) loss functions only up to the requested resources
+        :param seed: if given or if is_lazy, every evaluator draws from its own random stream spawned from this seed
+                     (if None, it is drawn from the global numpy random state so that np.random.seed reproduces runs)
+        :param crn: common random numbers (or their seed), if given random arms and the loss function of every arm are
+                    drawn from the streams of the run (overrides seed), so that all optimisers see the same randomness
+        :param curve_bank_dir: if given, loss functions are drawn from banks of pre-simulated loss functions (one bank
+                               of curve_bank_size loss functions per shape family, created in this directory if missing)
+        :param curve_bank_size: number of loss functions per bank
+        :param hyperparams_domain: domain of the function, by default the domain of the 2D function func_name
+        """
+        super().__init__(func_name, hyperparams_to_opt, hyperparams_domain)
+        self.is_lazy = is_lazy
+        self.crn = crn if crn is None or isinstance(crn, CommonRandomNumbers) else CommonRandomNumbers(crn)
+        if seed is None and is_lazy:
+            seed = int(np.random.randint(2 ** 32, dtype=np.int64))
+        self.seed_sequence = np.random.SeedSequence(seed) if seed is not None else None
+        self.curve_bank_dir = curve_bank_dir
+        self.curve_bank_size = curve_bank_size
+        self._curve_banks: Dict[Tuple[ShapeFamily, int], CurveBank] = {}  # by shape family and max_resources
+
+    def evaluate_batch(self, evaluators: Sequence[Evaluator], n_resources: int) -> List[OptimisationGoals]:
+        """
+        :param evaluators: evaluators of this problem
+        :param n_resources: resources allocated to each evaluator
+        :return: optimisation goals of every evaluator, evaluated one after another (each simulates its loss function)
+        """
+        return HyperparameterOptimisationProblem.evaluate_batch(self, evaluators, n_resources)
+
+    def _get_rng(self, arm: Arm) -> Optional[np.random.Generator]:
+        """
+        :param arm: arm of the new evaluator
+        :return: random stream for a new evaluator (None means that the evaluator uses the global numpy random state)
+        """
+        if self.crn is not None:
+            return self.crn.get_curve_rng(arm)
+        if self.seed_sequence is None:
+            return None
+        return np.random.default_rng(self.seed_sequence.spawn(1)[0])
+
+    def draw_arms(self, n: int, rng: Optional[np.random.Generator] = None) -> List[Arm]:
+        """
+        :param n: number of arms
+        :param rng: random generator to draw from, by default the stream of arms of the common random numbers (if any)
+        :return: random arms
+        """
+        return super().draw_arms(n, rng if rng is not None or self.crn is None else self.crn.arms_rng)
+
+    def _draw_arm(self) -> Arm:
+        """
+        :return: random arm (drawn from the stream of arms of the common random numbers, if any)
+        """
+        return self.draw_arms(1)[0]
+
     def get_evaluator(  # type: ignore # pylint: disable=arguments-differ  # FIXME
             self, arm: Optional[Arm] = None,
             ml_aggressiveness: float = 0.9, necessary_aggressiveness: float = 10, up_spikiness: float = 0.1,
@@ -108,24 +185,76 @@ class OptFunctionSimulationProblem(OptFunctionProblem, SimulationProblem):
         :return: problem evaluator for an arm (given or random if not given)
         """
         if arm is None:  # if no arm is provided, generate a random arm
-            arm = Arm()
-            arm.draw_hp_val(domain=self.domain, hyperparams_to_opt=self.hyperparams_to_opt)
+            arm = self._draw_arm()
+        curve_bank = None
+        if self.curve_bank_dir is not None:
+            shape_family = ShapeFamily(None, ml_aggressiveness, necessary_aggressiveness, up_spikiness, is_smooth)
+            curve_bank = self._get_curve_bank(shape_family, max_resources)
         model_builder = OptFunctionBuilder(arm)
-        return OptFunctionSimulationEvaluator(
+        return self._get_simulation_evaluator(
             func_name=self.func_name, model_builder=model_builder, ml_aggressiveness=ml_aggressiveness,
             necessary_aggressiveness=necessary_aggressiveness, up_spikiness=up_spikiness, is_smooth=is_smooth,
             start_shift=start_shift, end_shift=end_shift, max_resources=max_resources, init_noise=init_noise,
-            should_plot=should_plot)
+            should_plot=should_plot, is_lazy=self.is_lazy, rng=self._get_rng(arm), curve_bank=curve_bank)
+
+    def _get_curve_bank(self, shape_family: ShapeFamily, max_resources: int) -> CurveBank:
+        """
+        :param shape_family: shape family of the loss functions (arm, start_shift and end_shift are ignored)
+        :param max_resources: number of points of each loss function
+        :return: bank of the shape family, looked up on disk only the first time it is requested by this problem
+        """
+        key = (shape_family, max_resources)
+        if key not in self._curve_banks:
+            assert self.curve_bank_dir is not None
+            self._curve_banks[key] = CurveBank.get_or_create(self.curve_bank_dir, shape_family, max_resources,
+                                                             self.curve_bank_size)
+        return self._curve_banks[key]
+
+    def _get_simulation_evaluator(self, **kwargs: Any) -> OptFunctionSimulationEvaluator:
+        """
+        :param kwargs: parameters of OptFunctionSimulationEvaluator
+        :return: evaluator of the loss function simulated for an arm
+        """
+        return OptFunctionSimulationEvaluator(**kwargs)
+
+    def simulate_batch(self, evaluator_params: Sequence[EvaluatorParams]) -> np.ndarray:
+        """Simulates the loss functions of a whole rung of arms at once. This is the batched (and equally distributed)
+        counterpart of calling get_evaluator(*params).evaluate(max_res) for each params in evaluator_params.
 
-    def plot_surface(  # pylint: disable=arguments-differ
-            self, n_simulations: int, max_resources: int = 81, n_resources: Optional[int] = None,
-            shape_families: Tuple[ShapeFamily, ...] = (ShapeFamily(None, 0.9, 10, 0.1),),
-            init_noise: float = 0
+        :param evaluator_params: parameters as given by ShapeFamilyScheduler.get_family, if an arm is None a random arm
+                                 is generated. All of them must have the same max_res.
+        :return: simulated loss functions, shape (len(evaluator_params), max_res)
+        """
+        max_resources = {params.max_res for params in evaluator_params}
+        if len(max_resources) != 1:
+            raise ValueError(f"All arms of a batch must have the same max_res, instead {max_resources} were supplied")
+
+        random_arms = iter(self.draw_arms(sum(params.arm is None for params in evaluator_params)))
+        arms = [params.arm if params.arm is not None else next(random_arms) for params in evaluator_params]
+
+        f_values = self.get_function_values(arms)
+        noise = np.array([params.noise for params in evaluator_params]) * np.random.randn(len(arms))
+
+        def column(field_name: str) -> np.ndarray:
+            return np.array([getattr(params, field_name) for params in evaluator_params])
+
+        return simulate_batch(
+            f_1=f_values + noise - column('start_shift'), f_n=f_values - column('end_shift'),
+            ml_aggressiveness=column('ml_agg'), necessary_aggressiveness=column('necessary_agg'),
+            up_spikiness=column('up_spikiness'), max_resources=max_resources.pop(), is_smooth=column('is_smooth'))
+
+    def plot_surface(
+            self, n_simulations: int, is_grid: bool = False, file_path: Optional[str] = None,
+            max_resources: int = 81, n_resources: Optional[int] = None,
+            shape_families: Tuple[ShapeFamily, ...] = (ShapeFamily(None, 0.9, 10, 0.1),), init_noise: float = 0
     ) -> None:
         """plots the surface of the values of simulated loss functions at n_resources, by default is plot the losses at
-        max resources, in which case their values would be 200-branin (if necessary aggressiveness is not disabled)
+        max resources, in which case their values would be 200-branin (if necessary aggressiveness is not disabled).
+        Loss functions are simulated in batches (see simulate_batch), shape families are assigned in round robin.
 
         :param n_simulations: number of simulations
+        :param is_grid: whether to simulate loss functions on a regular grid of arms rather than on random arms
+        :param file_path: if given, the plot is saved to this file (no interactive backend is needed), otherwise shown
         :param max_resources: maximum number of resources
         :param n_resources: show the surface of the values of simulated loss functions at n_resources
                             Note that this is relative to max_resources
@@ -135,23 +264,24 @@ class OptFunctionSimulationProblem(OptFunctionProblem, SimulationProblem):
         if n_resources is None:
             n_resources = max_resources
         assert n_resources <= max_resources
-        scheduler = RoundRobinShapeFamilyScheduler(shape_families, max_resources, init_noise)
-
-        xs, ys, zs = [], [], []
-        for _ in range(n_simulations):
-            evaluator = self.get_evaluator(*scheduler.get_family(), should_plot=True)  # type: ignore  # FIXME
-            xs.append(evaluator.arm.x)
-            ys.append(evaluator.arm.y)
-            z = evaluator.evaluate(n_resources=n_resources).fval
-            zs.append(z)
-
-        xs, ys, zs = [np.array(array, dtype="float64") for array in (xs, ys, zs)]
-        fig = plt.figure()
-        ax = fig.gca(projection=Axes3D.name)
-        surf = ax.plot_trisurf(xs, ys, zs, cmap="coolwarm", antialiased=True)
-        fig.colorbar(surf, shrink=0.3, aspect=5)
-
-        plt.show()
+
+        xs, ys = self.sample_domain(n_simulations, is_grid)
+        f_values = np.asarray(OPT_FUNCTIONS[self.func_name](xs.ravel(), ys.ravel(), noise_variance=0))
+        families = np.arange(len(f_values)) % len(shape_families)
+        zs = np.empty(len(f_values))
+        for start in range(0, len(f_values), SURFACE_CHUNK_SIZE):
+            stop = min(start + SURFACE_CHUNK_SIZE, len(f_values))
+            for family_index, (_, ml_agg, necessary_agg, up_spikiness, is_smooth, start_shift, end_shift) in \
+                    enumerate(shape_families):
+                indices = start + np.flatnonzero(families[start:stop] == family_index)
+                f = f_values[indices]
+                fs = simulate_batch(
+                    f_1=f + init_noise * np.random.randn(len(indices)) - start_shift, f_n=f - end_shift,
+                    ml_aggressiveness=ml_agg, necessary_aggressiveness=necessary_agg, up_spikiness=up_spikiness,
+                    max_resources=max_resources, is_smooth=is_smooth)
+                zs[indices] = fs[:, n_resources - 1]
+
+        plot_surface(xs, ys, zs.reshape(xs.shape), file_path, colorbar_shrink=0.3)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,102 @@
+import pickle
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import matplotlib.pyplot as plt
+
+from autotune.benchmarks.known_fn_store import KnownFnStore
+from autotune.benchmarks.known_loss_fn_problem import KnownFnEvaluator, KnownFnIndex, get_known_fn_index
+from autotune.core import Arm, Domain, HyperparameterOptimisationProblem, OptimisationGoals, SimulationProblem
+from autotune.util.files import PathType
+from autotune.util.io import print_evaluation
+
+
+def load_recorded_loss_functions(output_dirs: Sequence[PathType],
+                                 file_name: str = 'model.pth') -> Dict[Arm, List[float]]:
+    """Loads the loss functions recorded by real evaluations (eg. TorchEvaluator), that is the loss_progress.<file_name>
+    files found (recursively) in the given output directories.
+
+    :param output_dirs: output directories of real optimisations (eg. of MnistProblem or CifarProblem)
+    :param file_name: file name of the evaluators (see Evaluator)
+    :return: validation errors at epochs 1, 2, ... by arm (if an arm was recorded more than once, its longest history)
+    """
+    recorded_fs: Dict[Arm, List[float]] = {}
+    for output_dir in output_dirs:
+        for loss_progress_file in sorted(Path(output_dir).rglob(f'loss_progress.{file_name}')):
+            with open(loss_progress_file, 'rb') as f:
+                loss_history, arm = pickle.load(f)
+            loss_fn = [float(val_error) for val_error in loss_history[1:]]  # loss_history[0] is the untrained model
+            if loss_fn and len(loss_fn) > len(recorded_fs.get(arm, [])):
+                recorded_fs[arm] = loss_fn
+    return recorded_fs
+
+
+class ReplayEvaluator(KnownFnEvaluator):
+
+    @print_evaluation(verbose=False, goals_to_print=("validation_error",))
+    def evaluate(self, n_resources: int) -> OptimisationGoals:
+        """Replays the recorded validation errors of the proposed arm (or of the closest recorded arm if the proposed
+        arm was not recorded), the n-th resource being the n-th recorded epoch.
+
+        :param n_resources: epoch, if more epochs than recorded are requested the last recorded epoch is used
+        :return: recorded validation error at the epoch (fval is the validation error too)
+        """
+        self._find_closest()
+        time = max(min(int(n_resources), len(self.closest_fs)), 1)
+
+        if self.should_plot:
+            plt.plot(list(range(time)), self.closest_fs[:time], linewidth=1.5)
+            plt.xlabel("time/epoch/resources")
+            plt.ylabel("error/loss")
+
+        val_error = self.closest_fs[time-1]
+        return OptimisationGoals(fval=val_error, validation_error=val_error, test_error=-1,
+                                 fvals=self.closest_fs[:time])
+
+
+class ReplayProblem(HyperparameterOptimisationProblem, SimulationProblem):
+    """Tabular benchmark of the loss functions recorded by real evaluations. An arm is evaluated by looking up its
+    recorded validation errors (exact if the arm was recorded, nearest recorded arm otherwise), so optimisers can be
+    benchmarked against real learning curves without training any model."""
+
+    def __init__(self, recorded_fs: Union[Dict[Arm, List[float]], KnownFnStore], hyperparams_domain: Domain,
+                 hyperparams_to_opt: Tuple[str, ...] = (), known_fn_index: Optional[KnownFnIndex] = None):
+        """
+        :param recorded_fs: recorded loss functions by arm (see load_recorded_loss_functions) or a store of them
+        :param hyperparams_domain: domain of the hyperparameters of the recorded problem (eg. mnist_problem's domain)
+        :param hyperparams_to_opt: names of hyperparameters to be optimised, if () all params from domain are optimised
+        :param known_fn_index: nearest neighbour index of the arms of recorded_fs, built if not given
+        """
+        if not len(recorded_fs):
+            raise ValueError("Cannot replay a problem without recorded loss functions")
+        HyperparameterOptimisationProblem.__init__(self, hyperparams_domain, hyperparams_to_opt)
+        SimulationProblem.__init__(self)
+        self.recorded_fs = recorded_fs
+        self.known_fn_index = known_fn_index if known_fn_index is not None else \
+            get_known_fn_index(recorded_fs, self.domain)
+
+    @classmethod
+    def from_output_dirs(cls, output_dirs: Sequence[PathType], hyperparams_domain: Domain,
+                         hyperparams_to_opt: Tuple[str, ...] = (), file_name: str = 'model.pth') -> 'ReplayProblem':
+        """
+        :param output_dirs: output directories of real optimisations (eg. of MnistProblem or CifarProblem)
+        :param hyperparams_domain: domain of the hyperparameters of the recorded problem
+        :param hyperparams_to_opt: names of hyperparameters to be optimised, if () all params from domain are optimised
+        :param file_name: file name of the evaluators (see Evaluator)
+        :return: replay of the loss functions recorded in the output directories
+        """
+        return cls(load_recorded_loss_functions(output_dirs, file_name), hyperparams_domain, hyperparams_to_opt)
+
+    def get_evaluator(  # type: ignore # pylint: disable=arguments-differ  # FIXME
+            self, arm: Optional[Arm] = None, should_plot: bool = False
+    ) -> ReplayEvaluator:
+        """
+        :param arm: a combination of hyperparameters and their values
+        :param should_plot: whether to plot the loss function
+        :return: problem evaluator for an arm (given or random if not given)
+        """
+        if arm is None:  # if no arm is provided, generate a random arm
+            arm = Arm()
+            arm.draw_hp_val(domain=self.domain, hyperparams_to_opt=self.hyperparams_to_opt)
+        return ReplayEvaluator(known_fs=self.recorded_fs, proposed_arm=arm, should_plot=should_plot,
+                               domain=self.domain, known_fn_index=self.known_fn_index)
@@ -1,6 +1,11 @@
 from autotune.core.arm import Arm
+from autotune.core.common_random_numbers import CommonRandomNumbers
+from autotune.core.curve_bank import CurveBank
+from autotune.core.domain_codec import DomainCodec
 from autotune.core.evaluation import Evaluation
+from autotune.core.evaluation_history import EvaluationHistory, get_best_n_indices
 from autotune.core.evaluator import Evaluator, TEvaluator
+from autotune.core.executor import EvaluationExecutor, ProcessExecutor, SerialExecutor, ThreadExecutor
 from autotune.core.hyperparams_domain import Domain
 from autotune.core.model_builder import ModelBuilder
 from autotune.core.optimisation_goals import OptimisationGoals
@@ -9,13 +14,16 @@ from autotune.core.params import CategoricalParam, PairParam, Param
 from autotune.core.problem_def import HyperparameterOptimisationProblem, SimulationProblem
 from autotune.core.shape_family_scheduler import (
     EvaluatorParams, RoundRobinShapeFamilyScheduler, ShapeFamily, ShapeFamilyScheduler, UniformShapeFamilyScheduler)
-from autotune.core.simulation_evaluator import SimulationEvaluator
+from autotune.core.simulation_evaluator import SimulationEvaluator, simulate_batch
 
 __all__ = [
     'HyperparameterOptimisationProblem', 'SimulationProblem',
     'Param', 'PairParam', 'CategoricalParam',
-    'Arm', 'Domain',
+    'Arm', 'Domain', 'DomainCodec',
     'ModelBuilder', 'Evaluator', 'TEvaluator', 'OptimisationGoals', 'Evaluation',
+    'EvaluationHistory', 'get_best_n_indices',
+    'EvaluationExecutor', 'SerialExecutor', 'ThreadExecutor', 'ProcessExecutor',
     'Optimiser', 'optimisation_metric_user', 'ShapeFamilyScheduler', 'RoundRobinShapeFamilyScheduler', 'ShapeFamily',
-    'EvaluatorParams', 'UniformShapeFamilyScheduler', 'SimulationEvaluator'
+    'EvaluatorParams', 'UniformShapeFamilyScheduler', 'SimulationEvaluator', 'simulate_batch', 'CommonRandomNumbers',
+    'CurveBank'
 ]
@@ -1,7 +1,10 @@
 from __future__ import annotations
 
+from hashlib import blake2b
 from types import SimpleNamespace
-from typing import Tuple, cast
+from typing import Any, Optional, Tuple, cast
+
+import numpy as np
 
 from autotune.core.hyperparams_domain import Domain
 
@@ -14,8 +17,14 @@ class Arm(SimpleNamespace):
     arm.learning_rate = 0.123
     These attributes are set dynamically in draw_hp_val but, for type consistency reasons,it is recommended to inherit
     from this class and to set the hyperparameters as None attributes (Eg. CNNArm, LogisticRegressionArm)
+
+    The digest of an arm (hence its hash and its arm_id) only depends on the names and values of its hyperparameters,
+    it is computed once and cached in slots (outside of __dict__, which only holds the hyperparameters) until the arm
+    is modified. Hyperparameters stay in __dict__ since their names are only known at run time.
     """
 
+    __slots__ = ('_digest', '_arm_id')
+
     def __init__(self, **kwargs: float):  # pylint: disable=useless-super-delegation  # Used for type hints only
         """If a custom arm is needed, the hyperparameter values can be set from a dictionary. For example, for all
         informed optimisation methods creating Arm this way is required. If one needs random values for each hyperparam,
@@ -41,17 +50,19 @@ class Arm(SimpleNamespace):
                     raise ValueError(f"No default value for param {hp_name} was supplied")
                 setattr(self, hp_name, hp_val)
 
-    def draw_hp_val(self, *, domain: Domain, hyperparams_to_opt: Tuple[str, ...]) -> None:
+    def draw_hp_val(self, *, domain: Domain, hyperparams_to_opt: Tuple[str, ...],
+                    rng: Optional[np.random.Generator] = None) -> None:
         """Draws random values for the hyperparameters that we want to optimise.
 
         :param domain: domain of hyperparameters with names, ranges, distributions etc
                        Eg. Domain(momentum=Param(...), learning_rate=Param(...))
         :param hyperparams_to_opt: hyperparameters to optimise
+        :param rng: random generator to draw from, if None the global numpy random state is used
         """
         self.set_default_values(domain=domain, hyperparams_to_opt=hyperparams_to_opt)
         for hp_name in domain.hyperparams_names():
             if hp_name in hyperparams_to_opt:  # draw random value if we need to optimise the current hyperparameter
-                hp_val = domain[hp_name].get_param_range(1, stochastic=True)[0]
+                hp_val = domain[hp_name].get_param_range(1, stochastic=True, rng=rng)[0]
                 setattr(self, hp_name, hp_val)
 
     @staticmethod
@@ -81,8 +92,51 @@ class Arm(SimpleNamespace):
         return '\n'.join(
             [f"   - {hp_name}:{' '*padding(hp_name)}{hp_val}" for hp_name, hp_val in self.__dict__.items()])
 
-    def __hash__(self) -> int:
-        return hash(str(self))
+    def __setattr__(self, hp_name: str, hp_val: Any) -> None:
+        super().__setattr__(hp_name, hp_val)
+        if hp_name not in Arm.__slots__:
+            self._reset_digest()
+
+    def __delattr__(self, hp_name: str) -> None:
+        super().__delattr__(hp_name)
+        self._reset_digest()
+
+    def _reset_digest(self) -> None:
+        super().__setattr__('_digest', None)
+        super().__setattr__('_arm_id', None)
+
+    @property
+    def digest(self) -> bytes:
+        """
+        :return: 16 byte digest that only depends on the names and values of the hyperparameters of the arm (eg. an arm
+                 drawn at random and the same arm suggested by TPE have the same digest, no matter their numeric types)
+        """
+        digest = getattr(self, '_digest', None)
+        if digest is None:
+            def encode(value: object) -> str:
+                try:
+                    return float(value).hex()  # type: ignore
+                except (TypeError, ValueError):
+                    return repr(value)
+
+            items = ';'.join(f"{hp_name}={encode(hp_val)}" for hp_name, hp_val in sorted(self.__dict__.items()))
+            digest = blake2b(items.encode(), digest_size=16).digest()
+            super().__setattr__('_digest', digest)
+        return digest
+
+    @property
+    def arm_id(self) -> int:
+        """
+        :return: stable numeric id of the arm (the same in every process and run), 63 bits
+        """
+        arm_id = getattr(self, '_arm_id', None)
+        if arm_id is None:
+            arm_id = int.from_bytes(self.digest[:8], 'little') >> 1
+            super().__setattr__('_arm_id', arm_id)
+        return arm_id
+
+    def __hash__(self) -> int:  # type: ignore  # SimpleNamespace is unhashable, arms hash by their arm id
+        return self.arm_id
 
     def __getitem__(self, hyperparam_name: str) -> float:
         """Allow dictionary-like access to attributes.
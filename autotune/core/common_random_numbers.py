@@ -0,0 +1,63 @@
+from typing import Optional, Tuple, Union
+
+import numpy as np
+
+from autotune.core.arm import Arm
+
+ARMS_STREAM = 0      # random arms, in the order in which they are drawn
+FAMILIES_STREAM = 1  # shape families, in the order in which they are scheduled
+CURVES_STREAM = 2    # loss function of an arm (initial noise and Gamma process), keyed by the values of the arm
+
+
+def derive_seed_sequence(seed_sequence: np.random.SeedSequence, *key: int) -> np.random.SeedSequence:
+    """
+    :param seed_sequence: parent seed
+    :param key: key of the child stream
+    :return: seed of the child stream, which only depends on the parent seed and on the key (unlike spawn)
+    """
+    return np.random.SeedSequence(seed_sequence.entropy, spawn_key=tuple(seed_sequence.spawn_key) + key)
+
+
+def get_root_seed(seed: Optional[int] = None) -> int:
+    """
+    :param seed: root seed of random streams
+    :return: seed, or if it is None a seed drawn from the global numpy random state (so that np.random.seed reproduces
+             the streams)
+    """
+    return seed if seed is not None else int(np.random.randint(2 ** 32, dtype=np.int64))
+
+
+def get_arm_key(arm: Arm) -> Tuple[int, ...]:
+    """
+    :param arm: arm
+    :return: key that only depends on the names and values of the hyperparameters of the arm (eg. an arm drawn at
+             random and the same arm suggested by TPE have the same key, no matter their numeric types)
+    """
+    digest = arm.digest
+    return tuple(int.from_bytes(digest[i:i + 4], 'little') for i in range(0, len(digest), 4))
+
+
+class CommonRandomNumbers:
+    """Random streams of a simulation run that are shared by all optimisers (common random numbers). Run i of every
+    optimiser draws its random arms, its shape families and the loss function of each arm from the same streams, so
+    the same arm gets the same simulated loss function under every optimiser and the differences between optimisers
+    can be paired by run."""
+
+    def __init__(self, seed: Union[int, np.random.SeedSequence]):
+        """
+        :param seed: seed of the run
+        """
+        self.seed_sequence = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+        self.arms_rng = np.random.default_rng(derive_seed_sequence(self.seed_sequence, ARMS_STREAM))
+
+    @property
+    def families_seed(self) -> int:
+        """Seed for the shape family scheduler (eg. UniformShapeFamilyScheduler(..., seed=crn.families_seed))"""
+        return int(derive_seed_sequence(self.seed_sequence, FAMILIES_STREAM).generate_state(1)[0])
+
+    def get_curve_rng(self, arm: Arm) -> np.random.Generator:
+        """
+        :param arm: arm whose loss function will be simulated
+        :return: fresh random generator for the loss function of the arm
+        """
+        return np.random.default_rng(derive_seed_sequence(self.seed_sequence, CURVES_STREAM, *get_arm_key(arm)))
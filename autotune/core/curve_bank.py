@@ -0,0 +1,158 @@
+import os
+from functools import lru_cache
+from os.path import join as join_path
+from typing import Any, Callable, Optional, Tuple
+
+import numpy as np
+from numpy.lib.format import open_memmap
+from scipy.signal import savgol_filter
+
+from autotune.core.shape_family_scheduler import ShapeFamily
+from autotune.core.simulation_evaluator import ZERO_AGGRESSIVENESS_MODE, get_gamma_process_schedule, get_savgol_window
+from autotune.util.files import ensure_dir
+
+CHUNK_SIZE = 10000  # number of curves simulated at once while filling a bank
+
+
+def simulate_shapes(ml_aggressiveness: float, necessary_aggressiveness: float, up_spikiness: float,
+                    max_resources: int, n_curves: int, is_smooth: bool = False,
+                    rng: Optional[np.random.Generator] = None) -> np.ndarray:
+    """Simulates loss functions independently of their end points. The simulation (see simulate_batch) is affine in
+    f(1) and f(n), that is every simulated loss function is f(t) = alpha(t) * f(1) + (1 - alpha(t)) * f(n) + gamma(t),
+    where alpha and gamma only depend on the Gamma process (and smoothing is linear, so it applies to alpha and gamma).
+
+    :param ml_aggressiveness: ML aggressiveness
+    :param necessary_aggressiveness: necessary aggressiveness
+    :param up_spikiness: up spikiness
+    :param max_resources: number of points of each simulated loss function
+    :param n_curves: number of loss functions to simulate
+    :param is_smooth: whether to apply Savitzky-Golay smoothing
+    :param rng: random generator to draw from, if None the global numpy random state is used
+    :return: shapes, array of shape (2, n_curves, max_resources) of alphas and gammas
+    """
+    k = ZERO_AGGRESSIVENESS_MODE
+    n = max_resources
+    agg_levels = get_gamma_process_schedule(n + 1, k).draw(1, n, size=(n_curves, n - 1), rng=rng)
+
+    # f(t) - f(n) = alpha(t) * (f(1) - f(n)) + gamma(t), follow the same steps as simulate_batch in terms of f(t) - f(n)
+    alphas, gammas = np.empty((n_curves, n)), np.empty((n_curves, n))
+    alphas[:, 0], gammas[:, 0] = 1, 0
+    for t in range(1, n):
+        agg_level = agg_levels[:, t - 1]
+        down = (1 - (agg_level - k) * ml_aggressiveness / 100) * (1 - (t / (n - 1)) ** necessary_aggressiveness)
+        up = 0 if n - t == 1 else 1 - (t / (n - 1)) ** (1.1 * necessary_aggressiveness)
+        up_shift = up_spikiness * 1 / (1 + agg_level)
+        is_down, is_up = agg_level > k, agg_level < k  # == k: be neutral
+        alphas[:, t] = np.where(is_down, down, np.where(is_up, up, 1)) * alphas[:, t - 1]
+        gammas[:, t] = np.where(is_down, down * gammas[:, t - 1],
+                                np.where(is_up, up * (gammas[:, t - 1] + up_shift), gammas[:, t - 1]))
+
+    if is_smooth:
+        window = get_savgol_window(max_resources)
+        alphas, gammas = savgol_filter(alphas, window, 3, axis=1), savgol_filter(gammas, window, 3, axis=1)
+    return np.stack([alphas, gammas])
+
+
+class CurveBank:
+    """Bank of pre-simulated loss functions of a shape family, stored as their shapes (see simulate_shapes) in a
+    (memory-mapped) .npy file, so that any number of experiments can sample loss functions from it without simulating.
+    Note that start_shift and end_shift only move f(1) and f(n), so they are not part of the shapes."""
+
+    def __init__(self, shapes: np.ndarray):
+        """
+        :param shapes: array of shape (2, n_curves, max_resources) of alphas and gammas
+        """
+        self.shapes = shapes
+        self.path: Optional[str] = None  # .npy file the bank was loaded from, if any
+
+    def __reduce__(self) -> Tuple[Callable[..., 'CurveBank'], Tuple[Any, ...]]:
+        if self.path is not None:  # processes which get the bank map the file rather than receiving a copy
+            return _load_curve_bank, (self.path,)
+        return type(self), (np.asarray(self.shapes),)
+
+    def __len__(self) -> int:
+        return int(self.shapes.shape[1])
+
+    @property
+    def max_resources(self) -> int:
+        return int(self.shapes.shape[2])
+
+    def get_loss_function(self, index: int, f_1: float, f_n: float) -> np.ndarray:
+        """
+        :param index: index of the loss function in the bank
+        :param f_1: first value of f
+        :param f_n: target, last value of f
+        :return: the loss function with given end points (already smoothed if the bank is smooth)
+        """
+        alphas, gammas = self.shapes[0, index], self.shapes[1, index]
+        return np.asarray(f_n + alphas * (f_1 - f_n) + gammas)
+
+    @staticmethod
+    def get_file_name(shape_family: ShapeFamily, max_resources: int, n_curves: int, seed: int) -> str:
+        """
+        :param shape_family: shape family (arm, start_shift and end_shift are ignored)
+        :param max_resources: number of points of each loss function
+        :param n_curves: number of loss functions in the bank
+        :param seed: seed of the simulation
+        :return: name of the file of the bank
+        """
+        return (f"curve-bank-{shape_family.ml_agg}-{shape_family.necessary_agg}-{shape_family.up_spikiness}-"
+                f"{'smooth' if shape_family.is_smooth else 'non-smooth'}-{max_resources}-{n_curves}-{seed}.npy")
+
+    @classmethod
+    def create(cls, path: str, shape_family: ShapeFamily, max_resources: int, n_curves: int,
+               seed: Optional[int] = None) -> 'CurveBank':
+        """Simulates a bank (chunk by chunk, directly into a memory-mapped file).
+
+        :param path: path to the .npy file to create
+        :param shape_family: shape family (arm, start_shift and end_shift are ignored)
+        :param max_resources: number of points of each loss function
+        :param n_curves: number of loss functions in the bank
+        :param seed: seed of the simulation
+        :return: created bank
+        """
+        rng = np.random.default_rng(seed)
+        shapes = open_memmap(path, mode='w+', dtype=np.float64, shape=(2, n_curves, max_resources))
+        for start in range(0, n_curves, CHUNK_SIZE):
+            stop = min(start + CHUNK_SIZE, n_curves)
+            shapes[:, start:stop] = simulate_shapes(
+                shape_family.ml_agg, shape_family.necessary_agg, shape_family.up_spikiness, max_resources,
+                stop - start, shape_family.is_smooth, rng)
+        shapes.flush()
+        return cls(shapes)
+
+    @classmethod
+    def load(cls, path: str) -> 'CurveBank':
+        """
+        :param path: path to the .npy file of the bank
+        :return: bank, memory-mapped read-only (cached, so every process maps a file once)
+        """
+        return _load_curve_bank(path)
+
+    @classmethod
+    def get_or_create(cls, directory: str, shape_family: ShapeFamily, max_resources: int, n_curves: int,
+                      seed: int = 0) -> 'CurveBank':
+        """
+        :param directory: directory of the banks
+        :param shape_family: shape family (arm, start_shift and end_shift are ignored)
+        :param max_resources: number of points of each loss function
+        :param n_curves: number of loss functions in the bank
+        :param seed: seed of the simulation
+        :return: bank of the shape family, simulated the first time it is requested
+        """
+        path = join_path(ensure_dir(directory), cls.get_file_name(shape_family, max_resources, n_curves, seed))
+        try:
+            return cls.load(path)
+        except FileNotFoundError:
+            # several processes may create the same bank at once, they create identical files and the last one wins
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            cls.create(tmp_path, shape_family, max_resources, n_curves, seed)
+            os.replace(tmp_path, path)
+            return cls.load(path)
+
+
+@lru_cache(maxsize=None)
+def _load_curve_bank(path: str) -> CurveBank:
+    bank = CurveBank(np.load(path, mmap_mode='r'))
+    bank.path = path
+    return bank
@@ -0,0 +1,152 @@
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from scipy.stats import norm
+
+from autotune.core.arm import Arm
+from autotune.core.hyperparams_domain import Domain
+from autotune.core.params import IntParam, Param
+
+
+class DomainCodec:
+    """Vectorized codec of (numeric) hyperparameters: maps points of the unit cube, as an (N, d) array, to the native
+    values of d hyperparameters (as Param.get_param_range(stochastic=True) does for a single value) and back, so that N
+    arms are drawn, encoded or normalized with a handful of array operations instead of one Param call per value.
+
+    Column j of a unit point u is mapped to a native value by:
+    - uniform: x = u * (max_val - min_val) + min_val, normal: x = ppf(u) * max_val + min_val (max_val is sigma)
+    - log scale: x = logbase ** x
+    - interval: x = floor(x / interval) * interval (integer dtype), IntParam: x = floor(u * (1 + max - min) + min)
+    Quantized values are encoded to the middle of their bin so that decode(encode(values)) == values.
+    """
+
+    def __init__(self, domain: Domain, hyperparams_names: Optional[Sequence[str]] = None):
+        """
+        :param domain: domain of hyperparameters with names, ranges, distributions etc
+        :param hyperparams_names: hyperparameters to encode (columns), if None all hyperparameters of the domain
+        """
+        self.domain = domain
+        self.hyperparams_names = tuple(domain.hyperparams_names() if hyperparams_names is None else hyperparams_names)
+        params = [domain[hp_name] for hp_name in self.hyperparams_names]
+        unsupported = [param.name for param in params if not self.supports(param)]
+        if unsupported:
+            raise ValueError(f"Hyperparameters {unsupported} are not numeric (Param or IntParam) so cannot be encoded")
+
+        def as_array(values: Sequence[float]) -> np.ndarray:
+            return np.array(values, dtype=float)
+
+        self.min_vals = as_array([param.min_val for param in params])
+        self.max_vals = as_array([param.max_val for param in params])
+        self.is_int_param = np.array([isinstance(param, IntParam) for param in params], dtype=bool)
+        self.is_normal = np.array([param.distrib == 'normal' and not isinstance(param, IntParam) for param in params],
+                                  dtype=bool)
+        self.is_log = np.array([param.scale == 'log' and not isinstance(param, IntParam) for param in params],
+                               dtype=bool)
+        self.logbases = as_array([param.logbase for param in params])
+        self.intervals = as_array([param.interval if param.interval and not isinstance(param, IntParam) else 0
+                                   for param in params])
+        self.is_integer = self.is_int_param | (self.intervals > 0)
+
+    @staticmethod
+    def supports(param: object) -> bool:
+        """
+        :param param: parameter of a domain
+        :return: whether the parameter can be encoded (numeric parameters, ie. Param and IntParam)
+        """
+        return isinstance(param, Param)
+
+    @property
+    def n_dimensions(self) -> int:
+        return len(self.hyperparams_names)
+
+    def _check_shape(self, values: np.ndarray) -> np.ndarray:
+        values = np.asarray(values, dtype=float)
+        if values.ndim != 2 or values.shape[1] != self.n_dimensions:
+            raise ValueError(f"Expected an array of shape (N, {self.n_dimensions}), got {values.shape}")
+        return values
+
+    def decode(self, unit: np.ndarray) -> np.ndarray:
+        """
+        :param unit: points of the unit cube, shape (N, d)
+        :return: native hyperparameter values, shape (N, d) (float array, integer columns hold whole numbers)
+        """
+        unit = self._check_shape(unit)
+        values = unit * (self.max_vals - self.min_vals) + self.min_vals
+        values[:, self.is_normal] = norm.ppf(unit[:, self.is_normal]) * self.max_vals[self.is_normal] + \
+            self.min_vals[self.is_normal]
+        values[:, self.is_log] = np.power(self.logbases[self.is_log], values[:, self.is_log])
+        is_interval = self.intervals > 0
+        values[:, is_interval] = np.floor(values[:, is_interval] / self.intervals[is_interval]) * \
+            self.intervals[is_interval]
+        values[:, self.is_int_param] = np.floor(unit[:, self.is_int_param] * (
+            1 + self.max_vals[self.is_int_param] - self.min_vals[self.is_int_param]) + self.min_vals[self.is_int_param])
+        return np.asarray(values)
+
+    def encode(self, values: np.ndarray) -> np.ndarray:
+        """
+        :param values: native hyperparameter values, shape (N, d)
+        :return: points of the unit cube that decode to the values, shape (N, d)
+        """
+        values = self._check_shape(values)
+        x = values + self.intervals / 2  # quantized values are encoded to the middle of their bin
+        x[:, self.is_log] = np.log(x[:, self.is_log]) / np.log(self.logbases[self.is_log])
+        unit = (x - self.min_vals) / (self.max_vals - self.min_vals)
+        unit[:, self.is_normal] = norm.cdf((x[:, self.is_normal] - self.min_vals[self.is_normal]) /
+                                           self.max_vals[self.is_normal])
+        unit[:, self.is_int_param] = (values[:, self.is_int_param] - self.min_vals[self.is_int_param] + 0.5) / (
+            1 + self.max_vals[self.is_int_param] - self.min_vals[self.is_int_param])
+        return np.asarray(np.clip(unit, 0, np.nextafter(1, 0)))
+
+    def normalize(self, values: np.ndarray) -> np.ndarray:
+        """
+        :param values: native hyperparameter values, shape (N, d)
+        :return: values normalized as in Arm.normalize, that is (value - min_val) / (max_val - min_val), shape (N, d)
+        """
+        return np.asarray((self._check_shape(values) - self.min_vals) / (self.max_vals - self.min_vals))
+
+    def sample_unit(self, n: int, rng: Optional[np.random.Generator] = None) -> np.ndarray:
+        """Draws the unit points from the same stream as n consecutive calls of Arm.draw_hp_val (for uniform params).
+
+        :param n: number of points
+        :param rng: random generator to draw from, if None the global numpy random state is used
+        :return: uniform points of the unit cube, shape (n, d)
+        """
+        return np.random.rand(n, self.n_dimensions) if rng is None else rng.random((n, self.n_dimensions))
+
+    def sample_values(self, n: int, rng: Optional[np.random.Generator] = None) -> np.ndarray:
+        """
+        :param n: number of points
+        :param rng: random generator to draw from, if None the global numpy random state is used
+        :return: random native hyperparameter values, shape (n, d)
+        """
+        return self.decode(self.sample_unit(n, rng))
+
+    def sample(self, n: int, rng: Optional[np.random.Generator] = None,
+               defaults: Optional[Dict[str, float]] = None) -> List[Arm]:
+        """
+        :param n: number of arms
+        :param rng: random generator to draw from, if None the global numpy random state is used
+        :param defaults: values of other hyperparameters, set on every arm (before the hyperparameters of the codec)
+        :return: n random arms
+        """
+        return self.to_arms(self.sample_values(n, rng), defaults)
+
+    def to_arms(self, values: np.ndarray, defaults: Optional[Dict[str, float]] = None) -> List[Arm]:
+        """
+        :param values: native hyperparameter values, shape (N, d)
+        :param defaults: values of other hyperparameters, set on every arm (before the hyperparameters of the codec)
+        :return: N arms, integer hyperparameters are ints and the others floats
+        """
+        values = self._check_shape(values)
+        columns = [values[:, j].astype(np.int64).tolist() if self.is_integer[j] else values[:, j].tolist()
+                   for j in range(self.n_dimensions)]
+        defaults = defaults if defaults is not None else {}
+        return [Arm(**defaults, **dict(zip(self.hyperparams_names, arm_values))) for arm_values in zip(*columns)]
+
+    def from_arms(self, arms: Sequence[Arm]) -> np.ndarray:
+        """
+        :param arms: arms with values for all hyperparameters of the codec
+        :return: native hyperparameter values, shape (len(arms), d)
+        """
+        values = np.array([[float(arm[hp_name]) for hp_name in self.hyperparams_names] for arm in arms], dtype=float)
+        return values.reshape(len(arms), self.n_dimensions)
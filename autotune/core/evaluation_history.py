@@ -0,0 +1,139 @@
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Union, overload
+
+import numpy as np
+
+from autotune.core.evaluation import Evaluation
+from autotune.core.optimisation_goals import OptimisationGoals
+from autotune.util.typing import MinOrMax
+
+INITIAL_CAPACITY = 1024  # initial length of the arrays of a history, doubled whenever they are full
+
+
+def get_best_n_indices(values: np.ndarray, n: int, min_or_max: MinOrMax) -> np.ndarray:
+    """Equivalent to sorting the values (stably, reversed for max) and keeping the first n indices, but in O(len(values)
+    + n log n) thanks to argpartition.
+
+    :param values: values of the optimisation function, shape (N,)
+    :param n: number of indices to keep
+    :param min_or_max: min/max (built in functions) - whether smaller or greater values are better
+    :return: indices of the best n values, best first (ties are broken by index, as a stable sort would)
+    """
+    keys = -np.asarray(values, dtype=float) if min_or_max == max else np.asarray(values, dtype=float)
+    n = max(min(n, len(keys)), 0)
+    if n == 0:
+        return np.empty(0, dtype=np.int64)
+    if n < len(keys):
+        threshold = keys[np.argpartition(keys, n - 1)[n - 1]]
+        better, equal = np.flatnonzero(keys < threshold), np.flatnonzero(keys == threshold)
+        candidates = np.concatenate([better, equal[:n - len(better)]])
+    else:
+        candidates = np.arange(len(keys))
+    return candidates[np.lexsort((candidates, keys[candidates]))]
+
+
+class EvaluationHistory(Sequence[Evaluation]):
+    """History of the evaluations of an optimiser, a sequence of Evaluations (like the list it replaces) whose arm ids,
+    resources, timestamps and values of the optimisation function are also kept in growable numpy arrays. The
+    incumbent (best evaluation so far, the first one in case of ties) is updated on every append, so that finding the
+    best evaluation takes constant time and top-k queries do not evaluate the optimisation function again."""
+
+    def __init__(self, optimisation_func: Callable[[OptimisationGoals], float], min_or_max: MinOrMax):
+        """
+        :param optimisation_func: function in terms of which optimisation is performed (applied once per evaluation)
+        :param min_or_max: min/max (built in functions) - whether to minimize or to maximize the optimisation_func
+        """
+        self.optimisation_func = optimisation_func
+        self.min_or_max = min_or_max
+        self.evaluations: List[Evaluation] = []
+        self._arm_ids = np.empty(INITIAL_CAPACITY, dtype=np.int64)
+        self._resources = np.empty(INITIAL_CAPACITY, dtype=float)
+        self._timestamps = np.empty(INITIAL_CAPACITY, dtype=float)
+        self._values = np.empty(INITIAL_CAPACITY, dtype=float)
+        self.incumbent_index: Optional[int] = None
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # the optimisation function may not be picklable (eg. a lambda), values are already computed
+        return {**self.__dict__, 'optimisation_func': None}
+
+    def __len__(self) -> int:
+        return len(self.evaluations)
+
+    @overload
+    def __getitem__(self, index: int) -> Evaluation: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> List[Evaluation]: ...
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[Evaluation, List[Evaluation]]:
+        return self.evaluations[index]
+
+    def __iter__(self) -> Iterator[Evaluation]:
+        return iter(self.evaluations)
+
+    def _grow(self) -> None:
+        capacity = 2 * len(self._values)
+        for name in ('_arm_ids', '_resources', '_timestamps', '_values'):
+            column = getattr(self, name)
+            grown = np.empty(capacity, dtype=column.dtype)
+            grown[:len(column)] = column
+            setattr(self, name, grown)
+
+    def append(self, evaluation: Evaluation, n_resources: float = np.nan, timestamp: Optional[float] = None) -> None:
+        """
+        :param evaluation: evaluation to record
+        :param n_resources: resources the evaluation was given (NaN if unknown)
+        :param timestamp: time of the evaluation, by default now
+        """
+        i = len(self.evaluations)
+        if i == len(self._values):
+            self._grow()
+        value = self.optimisation_func(evaluation.optimisation_goals)
+        self.evaluations.append(evaluation)
+        self._arm_ids[i] = evaluation.evaluator.arm.arm_id
+        self._resources[i] = n_resources
+        self._timestamps[i] = time.time() if timestamp is None else timestamp
+        self._values[i] = value
+        if self.incumbent_index is None or self._is_better(value, self._values[self.incumbent_index]):
+            self.incumbent_index = i
+
+    def _is_better(self, value: float, other_value: float) -> bool:
+        return bool(value > other_value if self.min_or_max == max else value < other_value)
+
+    @property
+    def arm_ids(self) -> np.ndarray:
+        return self._arm_ids[:len(self)]
+
+    @property
+    def resources(self) -> np.ndarray:
+        return self._resources[:len(self)]
+
+    @property
+    def timestamps(self) -> np.ndarray:
+        return self._timestamps[:len(self)]
+
+    @property
+    def values(self) -> np.ndarray:
+        """Values of the optimisation function of every evaluation."""
+        return self._values[:len(self)]
+
+    @property
+    def incumbent(self) -> Evaluation:
+        """Best evaluation so far (the first one in case of ties), as min_or_max over the history would give."""
+        if self.incumbent_index is None:
+            raise ValueError("The evaluation history is empty, there is no best evaluation")
+        return self.evaluations[self.incumbent_index]
+
+    @property
+    def best_value(self) -> float:
+        """Value of the optimisation function of the incumbent."""
+        if self.incumbent_index is None:
+            raise ValueError("The evaluation history is empty, there is no best value")
+        return float(self._values[self.incumbent_index])
+
+    def top_k(self, k: int) -> List[Evaluation]:
+        """
+        :param k: number of evaluations
+        :return: best k evaluations, best first
+        """
+        return [self.evaluations[i] for i in get_best_n_indices(self.values, k, self.min_or_max)]
@@ -86,4 +86,4 @@ class Evaluator:
         return isinstance(other, Evaluator) and self.arm == other.arm
 
     def __hash__(self) -> int:
-        return hash(str(self))
+        return self.arm.arm_id
@@ -0,0 +1,152 @@
+import os
+import random
+from abc import abstractmethod
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import Queue
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from autotune.core.common_random_numbers import get_root_seed
+from autotune.core.evaluator import Evaluator
+from autotune.core.optimisation_goals import OptimisationGoals
+
+
+def _evaluate(evaluator: Evaluator, n_resources: int) -> Tuple[Evaluator, OptimisationGoals]:
+    """Evaluates an evaluator (in a worker process) and sends it back together with its optimisation goals, since the
+    evaluation changes its state (eg. resources used so far, progress of the loss function, random streams)."""
+    return evaluator, evaluator.evaluate(n_resources=n_resources)
+
+
+def _seed_worker(seeds: 'Queue[int]') -> None:
+    """Seeds the global random states of a new worker process with the next seed (otherwise all forked workers would
+    draw the same values)."""
+    seed = seeds.get()
+    random.seed(seed)
+    np.random.seed(seed)
+
+
+def _copy_state(source: object, target: object) -> None:
+    """
+    :param source: evaluated copy of target (as sent back by a worker process)
+    :param target: evaluator to update in place, so that all references to it see the state of source
+    """
+    for cls in type(source).__mro__:
+        slots = cls.__dict__.get('__slots__', ())
+        for name in (slots,) if isinstance(slots, str) else slots:
+            if name not in ('__dict__', '__weakref__') and hasattr(source, name):
+                setattr(target, name, getattr(source, name))
+    if hasattr(source, '__dict__'):
+        target.__dict__.update(source.__dict__)
+
+
+class EvaluationExecutor:
+    """Evaluates the evaluators of a rung (independent arms, each with the same resources) and returns their
+    optimisation goals in the order of the evaluators, so that halving ranks them exactly as a serial loop would.
+    Executors with a pool of workers keep it between calls, use them as context managers or call shutdown()."""
+
+    @abstractmethod
+    def evaluate(self, evaluators: Sequence[Evaluator], n_resources: int) -> List[OptimisationGoals]:
+        """
+        :param evaluators: evaluators to evaluate, their state is updated as if evaluate was called on each of them
+        :param n_resources: resources allocated to each evaluator
+        :return: optimisation goals of every evaluator, the same as evaluator.evaluate(n_resources)
+        """
+
+    def shutdown(self) -> None:
+        """Releases the workers of the executor (if any)."""
+
+    def __enter__(self) -> 'EvaluationExecutor':
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.shutdown()
+
+
+class SerialExecutor(EvaluationExecutor):
+    """Evaluates the evaluators one after another in the calling thread (default of all optimisers)."""
+
+    def evaluate(self, evaluators: Sequence[Evaluator], n_resources: int) -> List[OptimisationGoals]:
+        return [evaluator.evaluate(n_resources=n_resources) for evaluator in evaluators]
+
+
+class PoolExecutor(EvaluationExecutor):
+    """Base class of executors backed by a pool of workers from concurrent.futures, started on first use."""
+
+    def __init__(self, max_workers: Optional[int] = None):
+        """
+        :param max_workers: number of workers, by default the number of CPUs
+        """
+        if max_workers is not None and max_workers < 1:
+            raise ValueError(f"max_workers must be a positive integer, instead {max_workers} was supplied")
+        self.max_workers: int = max_workers if max_workers is not None else (os.cpu_count() or 1)
+        self._pool: Optional[Executor] = None
+
+    @abstractmethod
+    def _create_pool(self) -> Executor:
+        """Creates the pool of self.max_workers workers."""
+
+    @property
+    def pool(self) -> Executor:
+        if self._pool is None:
+            self._pool = self._create_pool()
+        return self._pool
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # pools cannot be pickled (eg. along with an optimiser), a new one is started on first use
+        return {**self.__dict__, '_pool': None}
+
+
+class ThreadExecutor(PoolExecutor):
+    """Evaluates the evaluators concurrently in a pool of threads. This suits evaluators which release the GIL (eg.
+    numpy, torch, I/O or remote calls), their state is updated in place."""
+
+    def _create_pool(self) -> Executor:
+        return ThreadPoolExecutor(max_workers=self.max_workers)
+
+    def evaluate(self, evaluators: Sequence[Evaluator], n_resources: int) -> List[OptimisationGoals]:
+        if len(evaluators) <= 1:
+            return [evaluator.evaluate(n_resources=n_resources) for evaluator in evaluators]
+        return list(self.pool.map(lambda evaluator: evaluator.evaluate(n_resources=n_resources), evaluators))
+
+
+class ProcessExecutor(PoolExecutor):
+    """Evaluates the evaluators concurrently in a pool of processes. Evaluators (which must be picklable) are sent to
+    the workers in chunks and sent back once evaluated, then their state is copied onto the original evaluators.
+    This suits CPU bound evaluators whose state is cheap to pickle. Every worker seeds its global random states (numpy
+    and python random) with its own seed spawned from seed, so evaluators that draw from them get different values in
+    different workers (which values depends on how evaluators are split among workers). Evaluators with their own
+    random streams (eg. from CommonRandomNumbers) give the same results as with SerialExecutor."""
+
+    def __init__(self, max_workers: Optional[int] = None, chunks_per_worker: int = 4, seed: Optional[int] = None):
+        """
+        :param max_workers: number of worker processes, by default the number of CPUs
+        :param chunks_per_worker: evaluators of a rung are split in about max_workers * chunks_per_worker chunks (fewer
+                                  chunks mean less overhead, more chunks balance uneven evaluation times better)
+        :param seed: root seed of the seeds of the workers, by default drawn from the global numpy random state
+        """
+        super().__init__(max_workers)
+        self.chunks_per_worker = chunks_per_worker
+        self.seed = seed
+
+    def _create_pool(self) -> Executor:
+        seeds: 'Queue[int]' = Queue()
+        for seed_sequence in np.random.SeedSequence(get_root_seed(self.seed)).spawn(self.max_workers):
+            seeds.put(int(seed_sequence.generate_state(1)[0]))
+        return ProcessPoolExecutor(max_workers=self.max_workers, initializer=_seed_worker, initargs=(seeds,))
+
+    def evaluate(self, evaluators: Sequence[Evaluator], n_resources: int) -> List[OptimisationGoals]:
+        if len(evaluators) <= 1:
+            return [evaluator.evaluate(n_resources=n_resources) for evaluator in evaluators]
+        chunksize = max(1, len(evaluators) // (self.max_workers * self.chunks_per_worker))
+        results = self.pool.map(_evaluate, evaluators, [n_resources] * len(evaluators), chunksize=chunksize)
+        opt_goals = []
+        for evaluator, (evaluated, goals) in zip(evaluators, results):
+            _copy_state(evaluated, evaluator)
+            opt_goals.append(goals)
+        return opt_goals
@@ -1,9 +1,12 @@
 from dataclasses import dataclass
 from types import SimpleNamespace
-from typing import KeysView, cast
+from typing import TYPE_CHECKING, KeysView, Optional, Sequence, cast
 
 from autotune.core.params import Param
 
+if TYPE_CHECKING:
+    from autotune.core.domain_codec import DomainCodec  # pylint: disable=cyclic-import
+
 # ParamType = Union[Param, PairParam, CategoricalParam]
 ParamType = Param
 
@@ -36,3 +39,11 @@ class Domain(SimpleNamespace):
         :return: generator over all hyperparameter names from the domain
         """
         return self.__dict__.keys()
+
+    def compile(self, hyperparams_names: Optional[Sequence[str]] = None) -> 'DomainCodec':
+        """
+        :param hyperparams_names: hyperparameters to encode (columns), if None all hyperparameters of the domain
+        :return: vectorized codec of the (numeric) hyperparameters, see DomainCodec
+        """
+        from autotune.core.domain_codec import DomainCodec  # pylint: disable=import-outside-toplevel,cyclic-import
+        return DomainCodec(self, hyperparams_names)
@@ -1,12 +1,14 @@
 import time
 from abc import abstractmethod
-from typing import Callable, List, Optional, Union, cast
+from typing import Callable, List, Optional, Sequence, Union, cast
 
 import numpy as np
 from colorama import Fore, Style
 
 from autotune.core.evaluation import Evaluation
+from autotune.core.evaluation_history import EvaluationHistory, get_best_n_indices
 from autotune.core.evaluator import Evaluator
+from autotune.core.executor import EvaluationExecutor, SerialExecutor
 from autotune.core.optimisation_goals import OptimisationGoals
 from autotune.core.problem_def import HyperparameterOptimisationProblem, SimulationProblem
 from autotune.core.shape_family_scheduler import ShapeFamilyScheduler
@@ -31,7 +33,7 @@ class Optimiser:
             min_or_max: MinOrMax = cast(MinOrMax, min),
             optimisation_func: Callable[[OptimisationGoals], float] = default_optimisation_func,
             is_simulation: bool = False, scheduler: Optional[ShapeFamilyScheduler] = None,
-            plot_simulation: bool = False
+            plot_simulation: bool = False, executor: Optional[EvaluationExecutor] = None
     ):
         """
         :param max_iter: max iteration (considered infinity if None) - stopping condition
@@ -42,6 +44,7 @@ class Optimiser:
         :param is_simulation: flag if the problem under optimisation is a real machine learning problem or a simulation
         :param scheduler: if the problem is a simulation, the scheduler provides the parameters for families of shapes
         :param plot_simulation: each simulated loss function will be added to plt.plot, use plt.show() to see results
+        :param executor: evaluates the arms of a batch/rung (eg. concurrently), by default one after another
         """
         # stop conditions
         if (max_iter is None) and (max_time is None):
@@ -51,21 +54,68 @@ class Optimiser:
 
         if min_or_max not in [min, max]:
             raise ValueError(f"optimization must be a built in function: min or max, instead {min_or_max} was supplied")
-        self.min_or_max = min_or_max
+        self.min_or_max: MinOrMax = cast(MinOrMax, min_or_max)
         self.optimisation_func = optimisation_func
 
-        self.eval_history: List[Evaluation] = []
+        self.eval_history = EvaluationHistory(optimisation_func, self.min_or_max)
 
         # Simulation-specific attributes
         self.is_simulation = is_simulation
         self.scheduler = scheduler
         self.plot_simulation = plot_simulation
 
-    def _update_evaluation_history(self, evaluator: Evaluator, opt_goals: OptimisationGoals) -> None:
-        self.eval_history.append(Evaluation(evaluator, opt_goals))
+        self.executor = executor if executor is not None else SerialExecutor()
+
+    def _update_evaluation_history(self, evaluator: Evaluator, opt_goals: OptimisationGoals,
+                                   n_resources: float = np.nan, timestamp: Optional[float] = None) -> None:
+        """
+        :param evaluator: evaluator of the evaluated arm
+        :param opt_goals: result of the evaluation
+        :param n_resources: resources the evaluation was given (NaN if unknown)
+        :param timestamp: time of the evaluation, by default now
+        """
+        self.eval_history.append(Evaluation(evaluator, opt_goals), n_resources, timestamp)
+
+    @staticmethod
+    def _get_random_evaluators(problem: Union[HyperparameterOptimisationProblem, SimulationProblem],
+                               n: int) -> List[Evaluator]:
+        """
+        :param problem: problem to get evaluators of
+        :param n: number of evaluators
+        :return: evaluators of n random arms (drawn at once if the problem is a HyperparameterOptimisationProblem)
+        """
+        if isinstance(problem, HyperparameterOptimisationProblem):
+            return [problem.get_evaluator(arm) for arm in problem.draw_arms(n)]
+        return [problem.get_evaluator() for _ in range(n)]
+
+    def _evaluate_batch(self, problem: Union[HyperparameterOptimisationProblem, SimulationProblem],
+                        evaluators: Sequence[Evaluator], n_resources: int) -> List[Evaluation]:
+        """
+        :param problem: problem of the evaluators
+        :param evaluators: evaluators to evaluate with the same resources
+        :param n_resources: resources allocated to each evaluator
+        :return: evaluation of every evaluator (at once if the problem supports it, otherwise with self.executor)
+        """
+        if isinstance(problem, HyperparameterOptimisationProblem) and problem.supports_batch_evaluation:
+            opt_goals = problem.evaluate_batch(evaluators, n_resources)
+        else:
+            opt_goals = self.executor.evaluate(evaluators, n_resources)
+        return [Evaluation(evaluator, goals) for evaluator, goals in zip(evaluators, opt_goals)]
 
     def _get_best_evaluation(self) -> Evaluation:
-        return self.min_or_max(self.eval_history, key=lambda e: self.optimisation_func(e.optimisation_goals))
+        return self.eval_history.incumbent
+
+    def _get_best_n_evaluations(self, n: int, evaluations: Sequence[Evaluation]) -> List[Evaluation]:
+        """Note that for minimization the best evaluations are those with the smallest values of the optimisation_func
+        while for maximization they are those with the greatest values.
+
+        :param n: number of top "best evaluations" to retrieve
+        :param evaluations: evaluations (eg. of a rung of Hyperband)
+        :return: best n evaluations, best first (in case of ties, in the given order, as a stable sort would)
+        """
+        values = np.array([self.optimisation_func(evaluation.optimisation_goals) for evaluation in evaluations],
+                          dtype=float)
+        return [evaluations[i] for i in get_best_n_indices(values, n, self.min_or_max)]
 
     @abstractmethod
     def run_optimisation(self, problem: HyperparameterOptimisationProblem, verbosity: bool) -> Evaluation:
@@ -126,9 +176,7 @@ class Optimiser:
         :param opt_func_value: value of the optimisation_func for a certain evaluation
         """
         num_spaces = 8
-        best_so_far = self.min_or_max(
-            [self.optimisation_func(evaluation.optimisation_goals) for evaluation in self.eval_history]
-        )
+        best_so_far = self.eval_history.best_value
 
         print(f"{Fore.GREEN if opt_func_value == best_so_far else Fore.RED}"
               f"\n> SUMMARY: iteration number: {self.num_iterations},{num_spaces * ' '}"
@@ -27,13 +27,15 @@ class Param:
         return "%s (%f,%f,%s)" % (self.name, self.min_val, self.max_val,
                                   self.scale)
 
-    def get_param_range(self, num_vals, stochastic=False):
+    def get_param_range(self, num_vals, stochastic=False, rng=None):
+        # rng: numpy.random.Generator to draw from (if stochastic), by default the global numpy random state
         if stochastic:
             if self.distrib == 'normal':
                 # bad design but here min_val is mean and max_val is sigma
-                val = numpy.random.normal(self.min_val, self.max_val, num_vals)
+                val = (numpy.random if rng is None else rng).normal(self.min_val, self.max_val, num_vals)
             else:
-                val = numpy.random.rand(num_vals)*(self.max_val - self.min_val) + self.min_val
+                uniform = numpy.random.rand(num_vals) if rng is None else rng.random(num_vals)
+                val = uniform*(self.max_val - self.min_val) + self.min_val
             if self.scale == "log":
                 val = numpy.array([self.logbase ** v for v in val])
         else:
@@ -75,11 +77,12 @@ class IntParam(Param):
         super(IntParam, self).__init__(name, min_val, max_val, init_val=init_val)
         self.param_type = "integer"
 
-    def get_param_range(self, num_vals, stochastic=False):
+    def get_param_range(self, num_vals, stochastic=False, rng=None):
         # If num_vals greater than range of integer param then constrain to the range and if stochastic param results in
         # duplicates, only keep unique entries
         if stochastic:
-            return numpy.unique(int(numpy.random.rand(num_vals)*(1 + self.max_val - self.min_val) + self.min_val))
+            uniform = numpy.random.rand(num_vals) if rng is None else rng.random(num_vals)
+            return numpy.unique(int(uniform*(1 + self.max_val - self.min_val) + self.min_val))
 
         return range(self.min_val, self.max_val+1, max(1, (self.max_val-self.min_val)/num_vals))
 
@@ -94,9 +97,9 @@ class CategoricalParam:
         self.num_vals = len(self.val_list)
         self.param_type = 'categorical'
 
-    def get_param_range(self, num_vals, stochastic=False):
+    def get_param_range(self, num_vals, stochastic=False, rng=None):
         if stochastic:
-            return random_combinations(self.val_list, num_vals)
+            return random_combinations(self.val_list, num_vals, rng=rng)
         if num_vals >= self.num_vals:
             return self.val_list
         # Return random subset, but include default value
@@ -106,12 +109,14 @@ class CategoricalParam:
         return [self.default] + tmp[0:num_vals-1]
 
 
-def random_indices(high, size):
-    return numpy.random.randint(high, size=size)
+def random_indices(high, size, rng=None):
+    if rng is None:
+        return numpy.random.randint(high, size=size)
+    return rng.integers(high, size=size)
 
 
-def random_combinations(val_list, num_vals, unique=True):
-    rand_indices = random_indices(len(val_list), num_vals)
+def random_combinations(val_list, num_vals, unique=True, rng=None):
+    rand_indices = random_indices(len(val_list), num_vals, rng)
     if unique:
         indices = numpy.unique(rand_indices)
     else:
@@ -144,10 +149,10 @@ class DenseCategoricalParam:
         self.num_vals = len(self.val_list)
         self.param_type = 'densecategorical'
 
-    def get_param_range(self, num_vals, stochastic=False):
+    def get_param_range(self, num_vals, stochastic=False, rng=None):
         if stochastic:
             # return random subset, but include mandatory values in place
-            values = random_combinations(self.val_list, num_vals - 1, unique=False)
+            values = random_combinations(self.val_list, num_vals - 1, unique=False, rng=rng)
             return self.mandatory_elements + values
         return (self.mandatory_elements + self.val_list)[:num_vals]
 
@@ -165,11 +170,11 @@ class PairParam:
         self.init_val = default
         self.param_type = 'pair'
 
-    def get_param_range(self, unused_num_vals, stochastic=False):
+    def get_param_range(self, unused_num_vals, stochastic=False, rng=None):
 
         # get from input param key, get a corresponding set of random values
         val_p1 = self.get_param1_val(self.current_arm, self.param1_key)
-        vals_p2 = self.param2.get_param_range(val_p1, stochastic)
+        vals_p2 = self.param2.get_param_range(val_p1, stochastic, rng=rng)
 
         # FIXME yet another trick so that generate_random_arm in problem_def.py
         # takes the whole list if any
@@ -204,7 +209,7 @@ class FactoredParam:
         self.multipliers = multipliers
         self.param_type = 'factored'
 
-    def get_param_range(self, num_vals, stochastic=False):
+    def get_param_range(self, num_vals, stochastic=False, rng=None):
         first_val = self.first_value_generator(self.first_val_upper_bound)
         values = generate_factors(first_val, self.multipliers, [first_val], num_vals, self.upper_bound)
         # if stochastic:
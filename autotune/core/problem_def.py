@@ -1,15 +1,17 @@
 # pylint: disable=assigning-non-slot  # Probably a pylint bug
 from abc import abstractmethod
 from pprint import PrettyPrinter
-from typing import Dict, List, Optional, Tuple, Union
+from typing import Dict, List, Optional, Sequence, Tuple, Union
 
 import numpy as np
 from hyperopt import hp
 from hyperopt.pyll import Apply
 
 from autotune.core.arm import Arm
+from autotune.core.domain_codec import DomainCodec
 from autotune.core.evaluator import Evaluator
 from autotune.core.hyperparams_domain import Domain
+from autotune.core.optimisation_goals import OptimisationGoals
 from autotune.core.params import Param
 from autotune.datasets.dataset_loader import DatasetLoader
 from autotune.util.logging import Logger
@@ -17,7 +19,9 @@ from autotune.util.logging import Logger
 
 class HyperparameterOptimisationProblem(Logger):
 
-    __slots__ = 'domain', 'hyperparams_to_opt', 'dataset_loader', 'output_dir'
+    __slots__ = 'domain', 'hyperparams_to_opt', 'dataset_loader', 'output_dir', 'codec'
+
+    supports_batch_evaluation = False  # whether evaluate_batch is cheaper than evaluating arms one by one
 
     def __init__(self, hyperparams_domain: Domain, hyperparams_to_opt: Tuple[str, ...] = (),
                  dataset_loader: Optional[DatasetLoader] = None, output_dir: Optional[str] = None):
@@ -38,6 +42,12 @@ class HyperparameterOptimisationProblem(Logger):
 
         self.dataset_loader = dataset_loader
         self.output_dir = output_dir
+        # codec of the hyperparameters to optimise (in domain order), None if some of them are not numeric
+        hyperparams_to_opt_names = [hp_name for hp_name in self.domain.hyperparams_names()
+                                    if hp_name in self.hyperparams_to_opt]
+        self.codec: Optional[DomainCodec] = \
+            self.domain.compile(hyperparams_to_opt_names) \
+            if all(DomainCodec.supports(self.domain[hp_name]) for hp_name in hyperparams_to_opt_names) else None
 
     def log_domain(self) -> None:
         """Pretty prints the domain of the problem."""
@@ -56,6 +66,33 @@ class HyperparameterOptimisationProblem(Logger):
         :return: evaluator
         """
 
+    def draw_arms(self, n: int, rng: Optional[np.random.Generator] = None) -> List[Arm]:
+        """Draws n random arms at once, the same arms as n calls of Arm.draw_hp_val (for uniform hyperparameters).
+
+        :param n: number of arms
+        :param rng: random generator to draw from, if None the global numpy random state is used
+        :return: random arms (hyperparameters that are not optimised are set to their default values)
+        """
+        if self.codec is None:  # some hyperparameters are not numeric, draw arm by arm
+            arms = [Arm() for _ in range(n)]
+            for arm in arms:
+                arm.draw_hp_val(domain=self.domain, hyperparams_to_opt=self.hyperparams_to_opt, rng=rng)
+            return arms
+        defaults = Arm()  # same order of hyperparameters as draw_hp_val
+        defaults.set_default_values(domain=self.domain, hyperparams_to_opt=self.hyperparams_to_opt)
+        return self.codec.sample(n, rng, defaults.__dict__)
+
+    def evaluate_batch(self, evaluators: Sequence[Evaluator], n_resources: int) -> List[OptimisationGoals]:
+        """Evaluates several evaluators of this problem with the same resources. Problems that can evaluate many arms at
+        once (eg. vectorized functions) override this and set supports_batch_evaluation, by default evaluators are
+        evaluated one after another.
+
+        :param evaluators: evaluators of this problem (as given by get_evaluator)
+        :param n_resources: resources allocated to each evaluator
+        :return: optimisation goals of every evaluator, the same as evaluator.evaluate(n_resources)
+        """
+        return [evaluator.evaluate(n_resources=n_resources) for evaluator in evaluators]
+
     def get_hyperopt_space_from_hyperparams_to_opt(self) -> Dict[str, Apply]:
         """ Converts the problem's domain to hyperopt format
         :return: dict {hyperparameter_name: Apply (hyperparameter space from hyperopt)}
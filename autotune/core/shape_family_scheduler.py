@@ -2,7 +2,8 @@ from __future__ import annotations
 
 import random
 from abc import abstractmethod
-from typing import NamedTuple, Optional, Tuple
+from types import ModuleType
+from typing import NamedTuple, Optional, Tuple, Union
 
 from autotune.core import Arm
 
@@ -67,11 +68,23 @@ class RoundRobinShapeFamilyScheduler(ShapeFamilyScheduler):
 
 class UniformShapeFamilyScheduler(ShapeFamilyScheduler):
 
+    def __init__(self, shape_families: Tuple[ShapeFamily, ...], max_resources: int, init_noise: float,
+                 seed: Optional[int] = None):
+        """
+        :param shape_families:
+        :param max_resources:
+        :param init_noise:
+        :param seed: if given, families are drawn from a random stream of their own (eg. for common random numbers)
+                     rather than from the global python random state
+        """
+        super().__init__(shape_families, max_resources, init_noise)
+        self.random: Union[ModuleType, random.Random] = random if seed is None else random.Random(seed)
+
     def get_family(self, arm: Optional[Arm] = None) -> EvaluatorParams:
         """
         :param arm: if not None replaces the default arm that has been supplied in self.shape_families
         :return: parameters ready to be passed to OptFunctionSimulationProblem.get_evaluator
         """
-        default_arm, *rest_family = random.choice(self.shape_families)
+        default_arm, *rest_family = self.random.choice(self.shape_families)
         arm = arm if arm is not None else default_arm
         return EvaluatorParams(arm, *rest_family, self.max_resources, self.init_noise)  # type: ignore
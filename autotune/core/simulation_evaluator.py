@@ -1,10 +1,14 @@
-from typing import List
+from functools import lru_cache
+from types import ModuleType
+from typing import List, Optional, Tuple, Union
 
 import matplotlib.pyplot as plt
 import numpy as np
 import scipy.stats as stats
 from scipy.signal import savgol_filter
 
+ZERO_AGGRESSIVENESS_MODE = 2  # mode of all gamma distributions - corresponds to 0 aggressiveness
+
 
 def _plot_gamma_process_distribs(n: int, k: int) -> None:
     """Overlaps all Gamma distributions of the Gamma process on which the simulation is based.
@@ -33,36 +37,137 @@ def _plot_gamma_process_distribs(n: int, k: int) -> None:
     plt.show()
 
 
-def get_aggressiveness_from_gamma_distrib(time: int, n: int, k: int) -> float:
-    sqrt_beta_component = np.sqrt(k**2 + 4 * (n - time))
-    beta_t = (k + sqrt_beta_component) / (2*(n-time))  # beta is increasing in terms of time so variance is decreasing
-    alpha_t = k * beta_t + 1  # mode is always k (threshold for 0 aggressiveness)
+class GammaProcessSchedule:
+    """Shapes and scales of the Gamma distributions of the Gamma process on which the simulation is based, for all
+    times 0, ..., n-1. These only depend on (n, k), so they are computed once (see get_gamma_process_schedule) and all
+    the aggressiveness levels of a simulated loss function are drawn from them in a single vectorized call."""
+
+    __slots__ = 'n', 'k', 'shapes', 'scales'
+
+    def __init__(self, n: int, k: int):
+        """
+        :param n: number of distributions
+        :param k: mode of all distributions (threshold for 0 aggressiveness)
+        """
+        self.n, self.k = n, k
+        time_left = n - np.arange(n)
+        sqrt_beta_component = np.sqrt(k**2 + 4 * time_left)
+        beta = (k + sqrt_beta_component) / (2*time_left)  # beta increases in terms of time so variance decreases
+        alpha = k * beta + 1  # mode is always k (threshold for 0 aggressiveness)
+
+        self.shapes = alpha
+        self.scales = 1 / beta
+        self.shapes.flags.writeable = self.scales.flags.writeable = False  # shared by all evaluators
+
+    def draw(self, start: int, stop: int, size: Optional[Tuple[int, ...]] = None,
+             rng: Optional[np.random.Generator] = None) -> np.ndarray:
+        """
+        :param start: first time (inclusive)
+        :param stop: last time (exclusive)
+        :param size: output shape, the last dimension must be stop - start, by default (stop - start,)
+        :param rng: random generator to draw from, if None the global numpy random state is used
+        :return: levels of aggressiveness for all times in [start, stop)
+        """
+        random_state: Union[ModuleType, np.random.Generator] = np.random if rng is None else rng
+        return random_state.gamma(self.shapes[start:stop], self.scales[start:stop], size)
+
+
+@lru_cache(maxsize=None)
+def get_gamma_process_schedule(n: int, k: int) -> GammaProcessSchedule:
+    """
+    :param n: number of distributions
+    :param k: mode of all distributions
+    :return: cached Gamma process schedule for (n, k)
+    """
+    return GammaProcessSchedule(n, k)
 
-    shape = alpha_t
-    scale = 1 / beta_t
 
-    aggresiveness: float = np.random.gamma(shape, scale)
-    # x = np.linspace(0, 20, 200)
-    # y = stats.gamma.pdf(x, a=shape, scale=scale)
-    # plt.plot(x, y, "y-", label=r'$\alpha=29, \beta=3$')
+def get_aggressiveness_from_gamma_distrib(time: int, n: int, k: int) -> float:
+    schedule = get_gamma_process_schedule(n, k)
+    aggresiveness: float = np.random.gamma(schedule.shapes[time], schedule.scales[time])
     return aggresiveness
 
 
+def get_savgol_window(max_resources: int) -> int:
+    """
+    :param max_resources: length of the simulated loss functions
+    :return: (odd) window length of the Savitzky-Golay filter used to smooth simulated loss functions
+    """
+    window = int(0.17 * max_resources + 6)
+    window += 1 if window % 2 == 0 else 0
+    return window
+
+
+def simulate_batch(f_1: np.ndarray, f_n: np.ndarray, ml_aggressiveness: Union[float, np.ndarray],
+                   necessary_aggressiveness: Union[float, np.ndarray], up_spikiness: Union[float, np.ndarray],
+                   max_resources: int, is_smooth: Union[bool, np.ndarray] = False) -> np.ndarray:
+    """Vectorized counterpart of SimulationEvaluator.simulate that simulates the loss functions of several arms at
+    once. The Gamma process is sampled in one call (row by row, so for the same seed, the i-th row is the loss
+    function that the i-th of several sequentially simulated evaluators would get) and the time loop is vectorized
+    across arms.
+
+    :param f_1: first value of f for each arm, shape (n_arms,)
+    :param f_n: target, last value of f for each arm, shape (n_arms,)
+    :param ml_aggressiveness: ML aggressiveness, scalar or one per arm
+    :param necessary_aggressiveness: necessary aggressiveness, scalar or one per arm
+    :param up_spikiness: up spikiness, scalar or one per arm
+    :param max_resources: number of points of each simulated loss function
+    :param is_smooth: whether to apply Savitzky-Golay smoothing, scalar or one per arm
+    :return: simulated loss functions, shape (n_arms, max_resources)
+    """
+    k = ZERO_AGGRESSIVENESS_MODE
+    n = max_resources
+    f_1, f_n = np.asarray(f_1, dtype=float), np.asarray(f_n, dtype=float)
+    n_arms = f_1.shape[0]
+    ml_agg, necessary_agg, up_spikiness = [
+        np.broadcast_to(np.asarray(param, dtype=float), (n_arms,))
+        for param in (ml_aggressiveness, necessary_aggressiveness, up_spikiness)]
+
+    agg_levels = get_gamma_process_schedule(n + 1, k).draw(1, n, size=(n_arms, n - 1))
+
+    fs = np.empty((n_arms, n))
+    fs[:, 0] = f_1
+    for t in range(1, n):
+        agg_level = agg_levels[:, t - 1]
+        f_time = fs[:, t - 1]
+
+        # be aggressive - go down with different aggressivenesses
+        ml_aggressed = f_time + (agg_level - k) * ml_agg * (f_n - f_time) / 100
+        down = ml_aggressed + (f_n - ml_aggressed) * ((t / (n - 1)) ** necessary_agg)
+
+        # aggressiveness < k - go up
+        up_aggressed = f_time + up_spikiness * 1 / (1 + agg_level)
+        up = f_n if n - t == 1 else up_aggressed + (f_n - up_aggressed) * ((t / (n - 1)) ** (1.1 * necessary_agg))
+
+        fs[:, t] = np.where(agg_level > k, down, np.where(agg_level < k, up, f_time))  # == k: be neutral
+
+    is_smooth = np.broadcast_to(np.asarray(is_smooth, dtype=bool), (n_arms,))
+    if is_smooth.any():
+        fs[is_smooth] = savgol_filter(fs[is_smooth], get_savgol_window(max_resources), 3, axis=1)
+    return fs
+
+
 class SimulationEvaluator:
 
     def __init__(self, ml_aggressiveness: float, necessary_aggressiveness: float, up_spikiness: float,
-                 max_resources: int, is_smooth: bool = True):
+                 max_resources: int, is_smooth: bool = True, rng: Optional[np.random.Generator] = None):
         """
         :param ml_aggressiveness:
         :param necessary_aggressiveness:
         :param up_spikiness:
         :param max_resources:
         :param is_smooth:
+        :param rng: random stream of this evaluator, if None the global numpy random state is used. Since a simulation
+                    draws from its own stream in order of time, the loss function does not depend on whether it is
+                    simulated at once or in several increments (see simulate).
         """
         self.max_resources = max_resources
+        self.rng = rng
 
         self.non_smooth_fs: List[float] = []
         self.is_smooth = is_smooth
+        self._smooth_fs: List[float] = []                     # cache of fs (if is_smooth)
+        self._smooth_fs_source: Optional[List[float]] = None  # non_smooth_fs from which the cache was computed
 
         # Curve shape parameters DEPEND ON self.max_resources - feel free to add a schedule to them if you want
         # - ml aggressiveness = the higher h1 the more it bites from function debt - especially at the beginning
@@ -75,11 +180,14 @@ class SimulationEvaluator:
 
     @property
     def fs(self) -> List[float]:
+        """The smoothed loss function is cached and only recomputed when non_smooth_fs grows (or is replaced)."""
         if not self.is_smooth:
             return self.non_smooth_fs
-        window = int(0.17 * self.max_resources + 6)
-        window += 1 if window % 2 == 0 else 0
-        return list(savgol_filter(self.non_smooth_fs, window, 3))  # Throws FutureWarning: Using a non-tuple ...
+        if self._smooth_fs_source is not self.non_smooth_fs or len(self._smooth_fs) != len(self.non_smooth_fs):
+            window = get_savgol_window(self.max_resources)
+            self._smooth_fs = list(savgol_filter(self.non_smooth_fs, window, 3))
+            self._smooth_fs_source = self.non_smooth_fs
+        return self._smooth_fs
 
     def simulate(self, time: int, n: int, f_n: float) -> None:
         """
@@ -91,11 +199,11 @@ class SimulationEvaluator:
         :param n: the last point that the simulated function will be evaluated at
         :param f_n: target, f(n), last value of f, usually = branin - 200
         """
-        k = 2  # mode of all gamma distributions - corresponds to 0 aggressiveness
+        k = ZERO_AGGRESSIVENESS_MODE
 
         prev_time = len(self.non_smooth_fs)
-        for t in range(prev_time, time):
-            agg_level = get_aggressiveness_from_gamma_distrib(t, n + 1, k)
+        agg_levels = get_gamma_process_schedule(n + 1, k).draw(prev_time, time, rng=self.rng)
+        for t, agg_level in zip(range(prev_time, time), agg_levels.tolist()):
             f_time = self.non_smooth_fs[-1]
             if agg_level == k:  # be neutral
                 f_next_time = f_time
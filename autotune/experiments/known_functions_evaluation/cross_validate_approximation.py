@@ -1,17 +1,19 @@
 import argparse
 from argparse import Namespace
-from typing import Dict, List, Tuple
+from typing import Dict, List, Tuple, Union
 
 import matplotlib.animation as animation
 import matplotlib.pyplot as plt
 import numpy as np
 
-from autotune.benchmarks import KnownFnProblem
+from autotune.benchmarks import KnownFnStore
+from autotune.benchmarks.known_loss_fn_problem import get_known_fn_index
 from autotune.core import Arm, HyperparameterOptimisationProblem
 from autotune.experiments.run_closest_loss_fn_approximation import get_known_functions, get_real_problem
 
 PROBLEM = "mnist"
 N_FOLDS = 10
+CHUNK_SIZE = 2 ** 22  # number of entries of the distance matrix computed at once
 
 KNOWN_FUNCTIONS_DIR = "../../../loss_functions/"
 INPUT_DIR = "D:/datasets/"
@@ -33,48 +35,79 @@ def _get_args() -> Namespace:
     return arguments
 
 
-def get_normalization_factors(min_loss_fn_len: int, all_known_fns: Dict[Arm, List[float]]) -> np.array:
-    normalization_factors = []
-    for i in range(min_loss_fn_len):
-        fn_values = [loss_fn[i] for _, loss_fn in all_known_fns.items()]
-        normalization_factors.append(max(fn_values) - min(fn_values))
-    return np.array(normalization_factors)
-
-
-def get_errors(expected_loss_fn: List[float], actual_loss_fn: List[float], min_loss_fn_len: int) -> np.array:
-    return np.array([abs(actual_loss_fn[i] - expected_loss_fn[i]) for i in range(min_loss_fn_len)])
-
-
-def cross_validate(n_folds: int, all_known_fns: Dict[Arm, List[float]],
-                   real_problem: HyperparameterOptimisationProblem) -> Tuple[np.array, int]:
-    fold_size = len(all_known_fns) // n_folds
-    arms = list(all_known_fns.keys())
-    min_loss_fn_len = min(len(all_known_fns[arm]) for arm in arms)
-
-    normalization_factors = get_normalization_factors(min_loss_fn_len, all_known_fns)
-
-    res = []
-    for i in range(0, len(all_known_fns), fold_size):
-        test_arms = arms[i: i + fold_size]           # arms set apart for validation
-        db_arms = arms[0: i] + arms[i + fold_size:]  # arms that are considered as part of the database
-
-        db_loss_fns = {arm: all_known_fns[arm] for arm in db_arms}
-        problem = KnownFnProblem(known_fs=db_loss_fns, real_problem=real_problem)
-
-        for arm in test_arms:
-            opt_goals = problem.get_evaluator(arm=arm).evaluate(n_resources=min_loss_fn_len)
-
-            expected_loss_fn = all_known_fns[arm]
-            actual_loss_fn = opt_goals.fvals
-
-            # differences at each point
-            raw_errors = get_errors(expected_loss_fn, actual_loss_fn, min_loss_fn_len)
-            res.append(np.divide(raw_errors, normalization_factors))
-
-    return np.array(res), min_loss_fn_len
-
-
-def update_hist(epoch: int, cross_validation_res: np.array, percent: float = 0.1) -> None:
+def get_normalization_factors(loss_fns: np.ndarray) -> np.ndarray:
+    """
+    :param loss_fns: known loss functions, shape (n_loss_fns, n_epochs)
+    :return: range (max - min) of the known loss functions at each epoch
+    """
+    return np.ptp(loss_fns, axis=0)
+
+
+def get_errors(expected_loss_fns: np.ndarray, actual_loss_fns: np.ndarray) -> np.ndarray:
+    """
+    :param expected_loss_fns: loss functions, shape (n_loss_fns, n_epochs)
+    :param actual_loss_fns: approximated loss functions, shape (n_loss_fns, n_epochs)
+    :return: absolute errors at each epoch
+    """
+    return np.abs(actual_loss_fns - expected_loss_fns)
+
+
+def get_closest_known_fns(normalized_arms: np.ndarray, folds: np.ndarray) -> np.ndarray:
+    """For every arm, finds the closest arm (in terms of square error of normalized hyperparameter values) out of the
+    arms of the other folds, the same one as KnownFnProblem would find if given the loss functions of the other folds.
+
+    :param normalized_arms: normalized hyperparameter values of the arms, shape (n_arms, n_hyperparams)
+    :param folds: fold of every arm, shape (n_arms,)
+    :return: index of the closest arm of every arm
+    """
+    n_arms = len(normalized_arms)
+    closest = np.empty(n_arms, dtype=np.int64)
+    chunk_size = max(1, CHUNK_SIZE // max(n_arms, 1))  # rows of the distance matrix computed at once
+    for start in range(0, n_arms, chunk_size):
+        stop = min(start + chunk_size, n_arms)
+        # summed hyperparameter by hyperparameter, as in KnownFnIndex, so that ties are broken in the same way
+        sq_errors = sum((normalized_arms[start:stop, c, None] - normalized_arms[None, :, c]) ** 2
+                        for c in range(normalized_arms.shape[1]))
+        sq_errors = np.broadcast_to(sq_errors, (stop - start, n_arms)).copy()
+        sq_errors[folds[start:stop, None] == folds[None, :]] = np.inf  # arms of the same fold are not in the database
+        closest[start:stop] = np.argmin(sq_errors, axis=1)
+    return closest
+
+
+def cross_validate(n_folds: int, all_known_fns: Union[Dict[Arm, List[float]], KnownFnStore],
+                   real_problem: HyperparameterOptimisationProblem) -> Tuple[np.ndarray, int]:
+    """Every fold of consecutive known loss functions is approximated by the closest known loss functions of the other
+    folds (as in KnownFnProblem). Any number of folds is supported, n_folds >= number of known loss functions is
+    leave-one-out cross validation.
+
+    :param n_folds: number of cross validation folds
+    :param all_known_fns: known loss functions by arm (or store of known loss functions)
+    :param real_problem: problem whose domain is used to normalize hyperparameter values
+    :return: normalized errors of the approximated loss functions, shape (n_loss_fns, min_loss_fn_len), and
+             min_loss_fn_len (the length of the shortest known loss function)
+    """
+    if n_folds < 2:
+        raise ValueError(f"At least 2 folds are needed to cross validate, instead {n_folds} was supplied")
+    index = get_known_fn_index(all_known_fns, real_problem.domain)
+    if isinstance(all_known_fns, KnownFnStore):
+        min_loss_fn_len = int(np.min(all_known_fns.lengths))
+        loss_fns = np.asarray(all_known_fns.curves[:, :min_loss_fn_len], dtype=float)
+    else:
+        min_loss_fn_len = min(len(loss_fn) for loss_fn in all_known_fns.values())
+        loss_fns = np.array([loss_fn[:min_loss_fn_len] for loss_fn in all_known_fns.values()], dtype=float)
+    n_loss_fns = len(loss_fns)
+    if n_loss_fns < 2:
+        raise ValueError(f"At least 2 known loss functions are needed to cross validate, {n_loss_fns} were supplied")
+
+    fold_size = max(n_loss_fns // n_folds, 1)
+    folds = np.arange(n_loss_fns) // fold_size
+    closest = get_closest_known_fns(index.normalize(np.asarray(index.arm_values), index.columns), folds)
+
+    raw_errors = get_errors(loss_fns, loss_fns[closest])
+    return np.divide(raw_errors, get_normalization_factors(loss_fns)), min_loss_fn_len
+
+
+def update_hist(epoch: int, cross_validation_res: np.ndarray, percent: float = 0.1) -> None:
     res = cross_validation_res
     print(f'epoch: {epoch} error level: {100 * percent}%', sum(res[:, epoch] < percent), 'out of', len(res))
     print(f'epoch: {epoch} error level: {100 * percent}% confidence:', sum(res[:, epoch] < percent) / len(res))
@@ -0,0 +1,326 @@
+"""Runs many independent (simulated) optimisations in parallel, with reproducible per-run seeds.
+
+Every run gets its own seed spawned from one root seed (np.random.SeedSequence), so the result of a run only depends
+on the root seed and on the index of the run, no matter how many processes are used or in which order runs finish.
+Optimums are streamed to a text file as runs finish, so a partially finished batch can be resumed.
+
+Instead of a fixed number of runs, a StoppingRule can stop the batch as soon as the statistic of interest is known
+precisely enough. The rule is checked on the longest prefix of finished runs (by run index), so the number of runs used
+is the same as if the runs were run one after another.
+"""
+import pickle
+import random
+from abc import abstractmethod
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from os.path import exists
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Set, TextIO, Tuple
+
+import numpy as np
+from scipy.stats import ks_2samp
+from scipy.stats import t as student_t
+
+ENTROPY_HEADER = "# entropy="
+MIN_RUNS = 30  # the confidence intervals below are not trusted on fewer runs
+N_BOOTSTRAP = 200  # resamples of the bootstrap confidence interval of the KS distance
+
+
+def seed_run(seed_sequence: np.random.SeedSequence) -> None:
+    """Seeds the global random states used by problems, optimisers and schedulers (numpy and python random).
+
+    :param seed_sequence: seed of the run (spawned from the root seed)
+    """
+    np_seed, py_seed = seed_sequence.generate_state(2)
+    np.random.seed(int(np_seed))
+    random.seed(int(py_seed))
+
+
+def _seeded_run(run: Callable[[np.random.SeedSequence], float], seed_sequence: np.random.SeedSequence) -> float:
+    seed_run(seed_sequence)
+    return run(seed_sequence)
+
+
+class OptimumsFile:
+    """Text file of optimums, one "<run index> <optimum>" line per finished run, preceded by the root entropy."""
+
+    def __init__(self, path: str):
+        """
+        :param path: path to the file, it does not need to exist
+        """
+        self.path = path
+
+    def read(self) -> Dict[int, float]:
+        """
+        :return: optimums of finished runs by run index ({} if the file does not exist)
+        """
+        optimums = {}
+        if not exists(self.path):
+            return optimums
+        with open(self.path) as f:
+            for line in f:
+                if line.startswith("#") or not line.strip():
+                    continue
+                run_index, optimum = line.split()
+                optimums[int(run_index)] = float(optimum)
+        return optimums
+
+    def read_entropy(self) -> Optional[int]:
+        """
+        :return: entropy of the root seed of the runs in the file (None if the file does not exist)
+        """
+        if not exists(self.path):
+            return None
+        with open(self.path) as f:
+            header = f.readline()
+        if not header.startswith(ENTROPY_HEADER):
+            raise ValueError(f"{self.path} is not an optimums file (missing '{ENTROPY_HEADER}' header)")
+        return int(header[len(ENTROPY_HEADER):])
+
+    def open_for_append(self, entropy: int) -> TextIO:
+        """
+        :param entropy: entropy of the root seed, written as header if the file is new
+        :return: file opened for appending
+        """
+        is_new = not exists(self.path)
+        f = open(self.path, "a")
+        if is_new:
+            f.write(f"{ENTROPY_HEADER}{entropy}\n")
+            f.flush()
+        return f
+
+
+def load_optimums(path: str) -> List[float]:
+    """
+    :param path: optimums file or pickled histogram (as output by run_simulation.py or
+                 run_closest_loss_fn_approximation.py)
+    :return: optimums of all runs in the file
+    """
+    optimums_file = OptimumsFile(path)
+    try:
+        optimums_file.read_entropy()
+    except (ValueError, UnicodeDecodeError):
+        with open(path, "rb") as f:
+            histogram = pickle.load(f)
+        return list(histogram["all_optimums"] if "all_optimums" in histogram else histogram["all_norm_optimums"])
+    optimums = optimums_file.read()
+    return [optimums[i] for i in sorted(optimums)]
+
+
+class StoppingRule:
+    """Decides whether enough runs were run, given the optimums of the first runs."""
+
+    def __init__(self, tolerance: float, confidence: float = 0.95, min_runs: int = MIN_RUNS):
+        """
+        :param tolerance: stop when the half-width of the confidence interval is at most tolerance
+        :param confidence: confidence level of the interval
+        :param min_runs: never stop before min_runs runs
+        """
+        if not 0 < confidence < 1:
+            raise ValueError(f"Confidence must be in (0, 1), instead {confidence} was supplied")
+        self.tolerance = tolerance
+        self.confidence = confidence
+        self.min_runs = max(min_runs, 2)
+
+    def should_stop(self, optimums: Sequence[float]) -> bool:
+        """
+        :param optimums: optimums of the first len(optimums) runs
+        :return: whether to stop
+        """
+        return len(optimums) >= self.min_runs and self.get_half_width(optimums) <= self.tolerance
+
+    @abstractmethod
+    def get_half_width(self, optimums: Sequence[float]) -> float:
+        """
+        :param optimums: optimums of the first len(optimums) runs
+        :return: half-width of the confidence interval of the statistic
+        """
+
+    @abstractmethod
+    def describe(self, optimums: Sequence[float]) -> str:
+        """
+        :param optimums: optimums of the first len(optimums) runs
+        :return: statistic with its confidence interval
+        """
+
+
+class MeanOfeStoppingRule(StoppingRule):
+    """Stops when the Student t confidence interval of the mean OFE (optimum final error) is narrow enough."""
+
+    def get_half_width(self, optimums: Sequence[float]) -> float:
+        n = len(optimums)
+        sample_std = np.std(optimums, ddof=1)
+        return float(student_t.ppf((1 + self.confidence) / 2, n - 1) * sample_std / np.sqrt(n))
+
+    def describe(self, optimums: Sequence[float]) -> str:
+        return f"mean OFE: {np.mean(optimums)} ± {self.get_half_width(optimums)} ({self.confidence:.0%} confidence)"
+
+
+class KsDistanceStoppingRule(StoppingRule):
+    """Stops when the KS distance between the OFEs of this method and the OFEs of a reference method is known precisely
+    enough. The confidence interval of the KS distance is a percentile bootstrap interval (both samples are resampled),
+    so it depends on the optimums themselves and not only on their number. The bootstrap is seeded, so the half-width
+    of a given prefix of runs is always the same (and the batch stops at the same run whatever the number of
+    processes)."""
+
+    def __init__(self, reference_optimums: Sequence[float], tolerance: float, confidence: float = 0.95,
+                 min_runs: int = MIN_RUNS, n_bootstrap: int = N_BOOTSTRAP, seed: int = 0):
+        """
+        :param reference_optimums: optimums of the reference method (eg. load_optimums(<histogram of Hyperband>))
+        :param tolerance: stop when the half-width of the confidence interval is at most tolerance
+        :param confidence: confidence level of the interval
+        :param min_runs: never stop before min_runs runs
+        :param n_bootstrap: number of bootstrap resamples
+        :param seed: seed of the bootstrap resamples
+        """
+        super().__init__(tolerance, confidence, min_runs)
+        if len(reference_optimums) < self.min_runs:
+            raise ValueError(f"At least {self.min_runs} reference optimums are needed, "
+                             f"instead {len(reference_optimums)} were supplied")
+        self.n_bootstrap = n_bootstrap
+        self.seed = seed
+        self.reference_optimums = np.sort(np.asarray(reference_optimums, dtype=float))
+        # cumulative counts of the bootstrap resamples of the reference, drawn once, shape (n_bootstrap, n_ref + 1)
+        self._reference_cum_counts = self._draw_cum_counts(len(self.reference_optimums), np.random.default_rng(seed))
+
+    def _draw_cum_counts(self, n: int, rng: np.random.Generator) -> np.ndarray:
+        """
+        :param n: size of a sorted sample
+        :param rng: random generator of the resamples
+        :return: number of values of each bootstrap resample of the sample below each position of the sorted sample
+        """
+        counts = rng.multinomial(n, np.full(n, 1 / n), size=self.n_bootstrap)
+        return np.hstack([np.zeros((self.n_bootstrap, 1), dtype=np.int32), np.cumsum(counts, axis=1, dtype=np.int32)])
+
+    def _get_bootstrap_distances(self, optimums: Sequence[float]) -> np.ndarray:
+        """The KS distance is the largest difference between the two empirical distributions at (or just below) the
+        values of one of the samples, so both distributions are only evaluated at the values of optimums.
+
+        :param optimums: optimums of the first len(optimums) runs
+        :return: KS distances between the bootstrap resamples of optimums and of the reference optimums
+        """
+        sample = np.sort(np.asarray(optimums, dtype=float))
+        values = np.unique(sample)
+        cum_counts = self._draw_cum_counts(len(sample), np.random.default_rng(self.seed + len(sample)))
+        distances = np.zeros(self.n_bootstrap)
+        for side in ('left', 'right'):  # just below the values and at the values
+            cdf = cum_counts[:, np.searchsorted(sample, values, side)] / len(sample)
+            reference_cdf = (self._reference_cum_counts[:, np.searchsorted(self.reference_optimums, values, side)] /
+                             len(self.reference_optimums))
+            distances = np.maximum(distances, np.abs(cdf - reference_cdf).max(axis=1))
+        return distances
+
+    def get_half_width(self, optimums: Sequence[float]) -> float:
+        lower, upper = np.quantile(self._get_bootstrap_distances(optimums),
+                                   [(1 - self.confidence) / 2, (1 + self.confidence) / 2])
+        return float(upper - lower) / 2
+
+    def describe(self, optimums: Sequence[float]) -> str:
+        ks_distance = ks_2samp(optimums, self.reference_optimums).statistic
+        return f"KS distance: {ks_distance} ± {self.get_half_width(optimums)} ({self.confidence:.0%} confidence)"
+
+
+def get_stopping_rule(tolerance: Optional[float], confidence: float = 0.95,
+                      ks_reference_path: Optional[str] = None) -> Optional[StoppingRule]:
+    """
+    :param tolerance: half-width of the confidence interval at which to stop, if None runs are never stopped early
+    :param confidence: confidence level of the interval
+    :param ks_reference_path: if given, stop on the KS distance to the optimums in this file (see load_optimums),
+                              otherwise stop on the mean OFE
+    :return: stopping rule (None if tolerance is None)
+    """
+    if tolerance is None:
+        return None
+    if ks_reference_path is not None:
+        return KsDistanceStoppingRule(load_optimums(ks_reference_path), tolerance, confidence)
+    return MeanOfeStoppingRule(tolerance, confidence)
+
+
+def run_monte_carlo(run: Callable[[np.random.SeedSequence], float], n_runs: int, seed: Optional[int] = None,
+                    n_processes: int = 1, optimums_path: Optional[str] = None,
+                    on_result: Optional[Callable[[int, float], None]] = None,
+                    stopping_rule: Optional[StoppingRule] = None, initializer: Optional[Callable[..., None]] = None,
+                    initargs: Tuple[Any, ...] = ()) -> List[float]:
+    """Runs n_runs independent runs, each seeded with a seed spawned from the root seed. If a stopping rule is given,
+    n_runs is the maximum number of runs and the batch stops at the first number of runs at which the rule is satisfied.
+
+    :param run: given the seed of a run (with which the global random states are already seeded), returns the optimum
+                of the run. Must be picklable if n_processes > 1 (eg. a module level function or a functools.partial of
+                one). The seed of run i is the same for all callers with the same root seed, so it can be used to share
+                random streams across optimisers (see CommonRandomNumbers).
+    :param n_runs: number of runs
+    :param seed: root seed, if None fresh entropy is used (and recorded in the optimums file, if any)
+    :param n_processes: number of worker processes, 1 runs everything in the current process
+    :param optimums_path: if given, optimums are appended to this file as runs finish and the runs already in the file
+                          are not run again (the file must have been created with the same root seed)
+    :param on_result: called with (run index, optimum) as soon as a run finishes (in the current process)
+    :param stopping_rule: if given, stop as soon as the optimums of the first runs satisfy it
+    :param initializer: called with initargs once in every process which runs runs (in the current process if
+                        n_processes is 1), eg. to share a large problem with all the runs of a worker process rather
+                        than pickling it along with every run
+    :param initargs: arguments of initializer
+    :return: optimums ordered by run index (of the first runs, up to where the batch was stopped)
+    """
+    optimums_file = OptimumsFile(optimums_path) if optimums_path is not None else None
+    previous_entropy = optimums_file.read_entropy() if optimums_file is not None else None
+    if previous_entropy is not None and seed is not None and np.random.SeedSequence(seed).entropy != previous_entropy:
+        raise ValueError(f"Cannot resume {optimums_path} with seed {seed}, "
+                         f"it was created with entropy {previous_entropy}")
+    root = np.random.SeedSequence(seed if previous_entropy is None else previous_entropy)
+    seed_sequences = root.spawn(n_runs)
+
+    optimums: Dict[int, float] = optimums_file.read() if optimums_file is not None else {}
+    to_run: Iterator[int] = (i for i in range(n_runs) if i not in optimums)
+    out = optimums_file.open_for_append(root.entropy) if optimums_file is not None else None
+    prefix: List[float] = []  # optimums of runs 0, 1, ..., len(prefix) - 1 (all finished)
+    is_stopped = False
+
+    def update_prefix() -> bool:
+        """:return: whether the batch is finished (stopped by the stopping rule or all n_runs runs finished)"""
+        nonlocal is_stopped
+        while not is_stopped and len(prefix) < n_runs and len(prefix) in optimums:
+            prefix.append(optimums[len(prefix)])
+            is_stopped = stopping_rule is not None and stopping_rule.should_stop(prefix)
+        return is_stopped or len(prefix) == n_runs
+
+    def record(run_index: int, optimum: float) -> None:
+        optimums[run_index] = optimum
+        if out is not None:
+            out.write(f"{run_index} {optimum!r}\n")
+            out.flush()
+        if on_result is not None:
+            on_result(run_index, optimum)
+
+    try:
+        if n_processes == 1:
+            if initializer is not None:
+                initializer(*initargs)
+            for i in to_run:
+                if update_prefix():
+                    break
+                record(i, _seeded_run(run, seed_sequences[i]))
+        else:
+            with ProcessPoolExecutor(max_workers=n_processes, initializer=initializer, initargs=initargs) as executor:
+                # runs are submitted as others finish (rather than all at once) so that the batch can stop early
+                futures: Dict[Future, int] = {}
+                pending: Set[Future] = set()
+                for i in to_run:
+                    if update_prefix():
+                        break
+                    future = executor.submit(_seeded_run, run, seed_sequences[i])
+                    futures[future] = i
+                    pending.add(future)
+                    if len(pending) >= 2 * n_processes:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            record(futures[future], future.result())
+                if update_prefix():
+                    for future in pending:
+                        future.cancel()
+                for future in pending:  # runs that already started are recorded too, a resumed batch can use them
+                    if not future.cancelled():
+                        record(futures[future], future.result())
+    finally:
+        if out is not None:
+            out.close()
+
+    update_prefix()
+    return prefix
@@ -1,20 +1,27 @@
-"""Note this experiment is sequential only since it is really fast and hence there is no need for parallelization."""
+"""Each simulation is sequential since it is really fast, simulations are run in parallel (see -proc). The real problem
+is built once (only its domain and hyperparameters to optimise are needed) and the known loss functions are shared by
+all simulations: the problem is sent once to every worker process (not with every simulation), and a store of known loss
+functions (see -store) is shared by worker processes as read-only memory maps."""
 
 import argparse
 import pickle
 from argparse import Namespace
+from functools import partial
+from os.path import exists
 from os.path import join as join_path
-from typing import Dict, List
+from typing import Dict, List, Optional, Union
 
 import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
 
 from autotune.benchmarks import (
-    AVAILABLE_OPT_FUNCTIONS, CifarProblem, KnownFnProblem, MnistProblem, MrbiProblem, OptFunctionProblem, SvhnProblem)
+    AVAILABLE_OPT_FUNCTIONS, CifarProblem, KnownFnProblem, KnownFnStore, MnistProblem, MrbiProblem, OptFunctionProblem,
+    SvhnProblem)
 # Problems
 # Optimisers
 from autotune.core import Arm, HyperparameterOptimisationProblem, OptimisationGoals, Optimiser
+from autotune.experiments.monte_carlo import get_stopping_rule, run_monte_carlo
 from autotune.optimisers import (
     HybridHyperbandSigoptOptimiser, HybridHyperbandTpeNoTransferOptimiser, HybridHyperbandTpeOptimiser,
     HybridHyperbandTpeTransferAllOptimiser, HybridHyperbandTpeTransferLongestOptimiser,
@@ -38,6 +45,8 @@ N_SIMULATIONS = 7000
 
 PLOT_EACH = False
 
+_known_fn_problem: Optional[KnownFnProblem] = None  # problem of the simulations of this process (see set_problem)
+
 
 def optimisation_func(opt_goals: OptimisationGoals) -> float:
     """fval."""
@@ -60,6 +69,17 @@ def _get_args() -> Namespace:
     parser.add_argument('-opt', '--min-or-max', default=MIN_OR_MAX, type=str, help="min or max")
     parser.add_argument('-res', '--n-resources', default=N_RESOURCES, type=int, help='n_resources', required=False)
     parser.add_argument('-eta', default=ETA, type=int, help='halving rate for Hyperband', required=False)
+    parser.add_argument('-n', '--n-simulations', default=N_SIMULATIONS, type=int,
+                        help='number of simulations (maximum number if --tolerance is given)')
+    parser.add_argument('-seed', '--seed', default=None, type=int, help='root seed of all simulations')
+    parser.add_argument('-tol', '--tolerance', default=None, type=float,
+                        help='stop once the confidence interval of the mean OFE (or KS distance) is this narrow')
+    parser.add_argument('-conf', '--confidence', default=0.95, type=float, help='confidence level for --tolerance')
+    parser.add_argument('-ks', '--ks-reference', default=None, type=str,
+                        help='stop on the KS distance to the optimums of another method (histogram or optimums file)')
+    parser.add_argument('-proc', '--n-processes', default=1, type=int, help='number of worker processes')
+    parser.add_argument('-store', '--known-fns-store', default=None, type=str,
+                        help='directory of the store of known loss functions (created from the pickles if missing)')
     arguments = parser.parse_args()
     print(f"""\n
     Problem:          {arguments.problem.upper()}
@@ -129,6 +149,20 @@ def get_known_functions(arguments: Namespace, known_functions_dir: str = KNOWN_F
         raise ValueError(f"Supplied problem {problem_name} does not exist")
 
 
+def load_known_functions(arguments: Namespace) -> Union[Dict[Arm, List[float]], KnownFnStore]:
+    """
+    :param arguments: command line arguments
+    :return: store of known loss functions if --known-fns-store is given (created the first time), otherwise the known
+             loss functions by arm
+    """
+    store_dir = arguments.known_fns_store
+    if store_dir is None:
+        return get_known_functions(arguments)
+    if not exists(store_dir):
+        KnownFnStore.from_known_fs(get_known_functions(arguments)).save(store_dir)
+    return KnownFnStore.load(store_dir)
+
+
 def get_sequential_optimiser(args: Namespace) -> Optimiser:
     method = args.method.lower()
     min_or_max = min if args.min_or_max == 'min' else max
@@ -172,28 +206,55 @@ def get_sequential_optimiser(args: Namespace) -> Optimiser:
         raise ValueError(f"Supplied problem {method} does not exist in SEQUENTIAL mode")
 
 
+def set_problem(problem: KnownFnProblem) -> None:
+    """Sets the problem of the simulations of the current process (run once per worker process, see run_monte_carlo).
+
+    :param problem: problem of the known loss functions, shared by all simulations
+    """
+    global _known_fn_problem  # pylint: disable=global-statement
+    _known_fn_problem = problem
+
+
+def run_known_fn_simulation(arguments: Namespace,
+                            seed_sequence: np.random.SeedSequence) -> float:  # pylint: disable=unused-argument
+    """Runs one (seeded) optimisation on the closest known loss functions of the problem set by set_problem.
+
+    :param arguments: command line arguments
+    :param seed_sequence: seed of the run (the global random states are already seeded with it)
+    :return: optimum found
+    """
+    if _known_fn_problem is None:
+        raise ValueError("The problem of the simulations was not set, see set_problem")
+    optimiser = get_sequential_optimiser(arguments)
+    optimum_evaluation = optimiser.run_optimisation(_known_fn_problem, verbosity=True)
+    print(f"Best hyperparams:\n{optimum_evaluation.evaluator.arm}\n"
+          f"with:\n"
+          f"  - {optimisation_func.__doc__}: {optimisation_func(optimum_evaluation.optimisation_goals)}\n"
+          f"Total time:\n  - {optimiser.checkpoints[-1]} seconds")
+    if PLOT_EACH:
+        plt.show()
+    return optimisation_func(optimum_evaluation.optimisation_goals)
+
+
 if __name__ == "__main__":
     args_ = _get_args()
-    optimums = []
-    known_fns = get_known_functions(args_)
+    N_SIMULATIONS = args_.n_simulations
+    known_fns = load_known_functions(args_)
 
     # plt.hist([loss_fn[-1] for arm, loss_fn in known_fns.items()])
     # plt.show()
 
-    for _ in range(N_SIMULATIONS):
-        print("********iteration:", _, "avg so far:", np.mean(optimums))
-        real_problem = get_real_problem(args_)
-        problem = KnownFnProblem(known_fs=known_fns, real_problem=real_problem)
-        optimiser = get_sequential_optimiser(args_)
-        optimum_evaluation = optimiser.run_optimisation(problem, verbosity=True)
-        print(f"Best hyperparams:\n{optimum_evaluation.evaluator.arm}\n"
-              f"with:\n"
-              f"  - {optimisation_func.__doc__}: {optimisation_func(optimum_evaluation.optimisation_goals)}\n"
-              f"Total time:\n  - {optimiser.checkpoints[-1]} seconds")
-        res = optimisation_func(optimum_evaluation.optimisation_goals)
-        optimums.append(res)
-        if PLOT_EACH:
-            plt.show()
+    known_fn_problem = KnownFnProblem(known_fs=known_fns, real_problem=get_real_problem(args_))
+
+    stopping_rule = get_stopping_rule(args_.tolerance, args_.confidence, args_.ks_reference)
+    optimums = run_monte_carlo(
+        partial(run_known_fn_simulation, args_), N_SIMULATIONS, seed=args_.seed, n_processes=args_.n_processes,
+        on_result=lambda run_index, _: print("********iteration:", run_index), stopping_rule=stopping_rule,
+        initializer=set_problem, initargs=(known_fn_problem,))
+    if stopping_rule is not None:
+        print(f"Stopped after {len(optimums)} of at most {N_SIMULATIONS} simulations: "
+              f"{stopping_rule.describe(optimums)}")
+        N_SIMULATIONS = len(optimums)
 
     print(f"""\n\n------------- OPTIMUM STATISTICS OVER {N_SIMULATIONS} SIMULATIONS -------------
     average optimum: {np.mean(optimums)}
@@ -216,7 +277,9 @@ if __name__ == "__main__":
             "avg_top_25%": np.mean(sorted(optimums)[:int(N_SIMULATIONS / 4)]),
         }, f)
 
-    increasing_errors = sorted([fn[-1] for arm, fn in known_fns.items()])
+    increasing_errors = sorted(
+        [known_fns.get_loss_function(i)[-1] for i in range(len(known_fns))] if isinstance(known_fns, KnownFnStore)
+        else [fn[-1] for arm, fn in known_fns.items()])
     step_size = increasing_errors[1] - increasing_errors[0]
     bins = [0.074 + i * 0.001 for i in range(50)]
 
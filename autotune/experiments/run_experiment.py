@@ -49,6 +49,8 @@ def _get_args() -> Namespace:
     parser.add_argument('-i', '--input-dir', default=INPUT_DIR, type=str, help='input dir')
     parser.add_argument('-o', '--output-dir', default=OUTPUT_DIR, type=str, help='output dir')
     parser.add_argument('-pll', '--is-parallel', default=IS_PARALLEL, type=bool, help='run in parallel mode')
+    parser.add_argument('-workers', '--n-workers', default=None, type=int,
+                        help='number of brackets run at the same time in parallel mode (by default one per CPU)')
     parser.add_argument('-time', '--max-time', default=MAX_TIME, type=int, help='max time (stop if exceeded)')
     parser.add_argument('-iter', '--max-iter', default=MAX_ITER, type=int, help='max iterations (stop if exceeded')
     parser.add_argument('-p', '--problem', default=PROBLEM, type=str, help='problem (eg. cifar, mnist, svhn)')
@@ -132,7 +134,8 @@ def get_parallel_optimiser(args: Namespace) -> Optimiser:
 
     if method == "hyperband":
         return ParallelHyperbandOptimiser(eta=args.eta, max_iter=args.max_iter, max_time=args.max_time,
-                                          min_or_max=min_or_max, optimisation_func=optimisation_func)
+                                          min_or_max=min_or_max, optimisation_func=optimisation_func,
+                                          n_workers=args.n_workers)
     else:
         raise ValueError(f"Supplied problem {method} does not exist in PARALLEL mode")
 
@@ -1,7 +1,9 @@
 import argparse
 import pickle
 from argparse import Namespace
+from functools import partial
 from os.path import join as join_path
+from typing import Optional
 
 import matplotlib.pyplot as plt
 import numpy as np
@@ -10,8 +12,9 @@ from autotune.benchmarks import OptFunctionSimulationProblem
 # Problems
 # Optimisers
 from autotune.core import (
-    HyperparameterOptimisationProblem, OptimisationGoals, Optimiser, RoundRobinShapeFamilyScheduler, ShapeFamily,
-    UniformShapeFamilyScheduler)
+    CommonRandomNumbers, HyperparameterOptimisationProblem, OptimisationGoals, Optimiser,
+    RoundRobinShapeFamilyScheduler, ShapeFamily, UniformShapeFamilyScheduler)
+from autotune.experiments.monte_carlo import get_stopping_rule, run_monte_carlo
 from autotune.optimisers import (
     HybridHyperbandSigoptOptimiser, HybridHyperbandTpeNoTransferOptimiser, HybridHyperbandTpeOptimiser,
     HybridHyperbandTpeTransferAllOptimiser, HybridHyperbandTpeTransferLongestOptimiser,
@@ -31,6 +34,9 @@ MIN_OR_MAX = "min"
 N_SIMULATIONS = 7000
 INIT_NOISE = 10
 
+N_PROCESSES = 1
+SEED = None
+
 PLOT_EACH = False
 
 families_of_shapes_egg = (
@@ -71,6 +77,21 @@ def _get_args() -> Namespace:
     parser.add_argument('-opt', '--min-or-max', default=MIN_OR_MAX, type=str, help="min or max")
     parser.add_argument('-res', '--n-resources', default=N_RESOURCES, type=int, help='n_resources', required=False)
     parser.add_argument('-eta', default=ETA, type=int, help='halving rate for Hyperband', required=False)
+    parser.add_argument('-n', '--n-simulations', default=N_SIMULATIONS, type=int,
+                        help='number of simulations (maximum number if --tolerance is given)')
+    parser.add_argument('-proc', '--n-processes', default=N_PROCESSES, type=int, help='number of processes')
+    parser.add_argument('-seed', '--seed', default=SEED, type=int, help='root seed of all simulations')
+    parser.add_argument('-resume', '--optimums-file', default=None, type=str,
+                        help='file to which optimums are streamed, runs already in it are not run again')
+    parser.add_argument('-crn', '--common-random-numbers', action='store_true',
+                        help='run i of every method sees the same random arms and loss functions (use the same seed)')
+    parser.add_argument('-bank', '--curve-bank-dir', default=None, type=str,
+                        help='draw loss functions from banks of pre-simulated loss functions in this directory')
+    parser.add_argument('-tol', '--tolerance', default=None, type=float,
+                        help='stop once the confidence interval of the mean OFE (or KS distance) is this narrow')
+    parser.add_argument('-conf', '--confidence', default=0.95, type=float, help='confidence level for --tolerance')
+    parser.add_argument('-ks', '--ks-reference', default=None, type=str,
+                        help='stop on the KS distance to the optimums of another method (histogram or optimums file)')
     arguments = parser.parse_args()
     print(f"""\n
     Problem:          {arguments.problem.upper()}
@@ -80,7 +101,7 @@ def _get_args() -> Namespace:
     return arguments
 
 
-def get_problem(arguments: Namespace) -> HyperparameterOptimisationProblem:
+def get_problem(arguments: Namespace, crn: Optional[CommonRandomNumbers] = None) -> HyperparameterOptimisationProblem:
     problem_name = arguments.problem.lower()
     problem_instance = OptFunctionSimulationProblem(
         func_name={
@@ -89,16 +110,17 @@ def get_problem(arguments: Namespace) -> HyperparameterOptimisationProblem:
             'sim-camel': 'camel',
             'sim-wave': 'wave',
             'sim-rastrigin': 'rastrigin',
-        }[problem_name])
+        }[problem_name],
+        crn=crn, curve_bank_dir=arguments.curve_bank_dir)
     problem_instance.log_domain()
     return problem_instance
 
 
-def get_optimiser() -> Optimiser:
+def get_optimiser(args: Namespace, crn: Optional[CommonRandomNumbers] = None) -> Optimiser:
     method = args.method.lower()
     min_or_max = min if args.min_or_max == 'min' else max
     scheduler = {
-        'uniform': UniformShapeFamilyScheduler,
+        'uniform': partial(UniformShapeFamilyScheduler, seed=crn.families_seed if crn is not None else None),
         'round-robin': RoundRobinShapeFamilyScheduler
     }[SCHEDULING](shape_families=SHAPE_FAMILIES, max_resources=args.max_iter, init_noise=INIT_NOISE)
 
@@ -141,22 +163,44 @@ def get_optimiser() -> Optimiser:
         raise ValueError(f"Supplied problem {method} does not exist")
 
 
+def run_simulation(arguments: Namespace, seed_sequence: np.random.SeedSequence) -> float:
+    """Runs one (seeded) optimisation on a fresh simulation problem.
+
+    :param arguments: command line arguments
+    :param seed_sequence: seed of the run
+    :return: optimum found
+    """
+    crn = CommonRandomNumbers(seed_sequence) if arguments.common_random_numbers else None
+    problem = get_problem(arguments, crn)
+    optimiser = get_optimiser(arguments, crn)
+    optimum_evaluation = optimiser.run_optimisation(problem, verbosity=True)
+    print(f"Best hyperparams:\n{optimum_evaluation.evaluator.arm}\n"
+          f"with:\n"
+          f"  - {optimisation_func.__doc__}: {optimisation_func(optimum_evaluation.optimisation_goals)}\n"
+          f"Total time:\n  - {optimiser.checkpoints[-1]} seconds")
+    if PLOT_EACH:
+        plt.show()
+    return optimisation_func(optimum_evaluation.optimisation_goals)
+
+
 if __name__ == "__main__":
-    args = _get_args()
-    optimums = []
-    for _ in range(N_SIMULATIONS):
-        print("********iteration:", _, "avg so far:", 200 + np.mean(optimums))
-        problem = get_problem(args)
-        optimiser = get_optimiser()
-        optimum_evaluation = optimiser.run_optimisation(problem, verbosity=True)
-        print(f"Best hyperparams:\n{optimum_evaluation.evaluator.arm}\n"
-              f"with:\n"
-              f"  - {optimisation_func.__doc__}: {optimisation_func(optimum_evaluation.optimisation_goals)}\n"
-              f"Total time:\n  - {optimiser.checkpoints[-1]} seconds")
-        res = optimisation_func(optimum_evaluation.optimisation_goals)
-        optimums.append(res)
-        if PLOT_EACH:
-            plt.show()
+    args_ = _get_args()
+    N_SIMULATIONS = args_.n_simulations
+    running_sum, n_finished = 0., 0
+
+    def _print_progress(run_index: int, optimum: float) -> None:
+        global running_sum, n_finished  # pylint: disable=global-statement
+        running_sum, n_finished = running_sum + optimum, n_finished + 1
+        print("********iteration:", run_index, "finished:", n_finished, "avg so far:", 200 + running_sum / n_finished)
+
+    stopping_rule = get_stopping_rule(args_.tolerance, args_.confidence, args_.ks_reference)
+    optimums = run_monte_carlo(partial(run_simulation, args_), N_SIMULATIONS, seed=args_.seed,
+                               n_processes=args_.n_processes, optimums_path=args_.optimums_file,
+                               on_result=_print_progress, stopping_rule=stopping_rule)
+    if stopping_rule is not None:
+        print(f"Stopped after {len(optimums)} of at most {N_SIMULATIONS} simulations: "
+              f"{stopping_rule.describe(optimums)}")
+        N_SIMULATIONS = len(optimums)
 
     average_optimum = sum(optimums) / len(optimums)
     print(optimums)
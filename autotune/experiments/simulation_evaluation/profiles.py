@@ -5,10 +5,11 @@ import matplotlib.pyplot as plt
 import numpy as np
 from matplotlib.axes import Axes
 
-from autotune.benchmarks.opt_function_simulation_problem import (
-    OptFunctionSimulationEvaluator, OptFunctionSimulationProblem)
+from autotune.benchmarks.opt_function_simulation_problem import OptFunctionSimulationProblem
 from autotune.core import Arm, Evaluator, RoundRobinShapeFamilyScheduler, ShapeFamily, ShapeFamilyScheduler
 
+CHUNK_SIZE = 2 ** 22  # maximum number of (loss function, epoch) pairs of which order scores are computed at once
+
 
 def get_evaluator_by_arm(arm: Arm, evaluators: List[Evaluator]) -> Evaluator:
     return [e for e in evaluators if e.arm == arm][0]
@@ -26,59 +27,100 @@ def get_std_profile(loss_functions_per_fam: np.ndarray) -> np.ndarray:
     return np.std(loss_functions_per_fam, axis=0)  # over columns (average at each epoch)
 
 
-def get_dynamic_order_profile(loss_functions_per_fam: np.ndarray) -> List[float]:
-    relativity = []
-    num_func, max_time = loss_functions_per_fam.shape
-    for t in range(1, max_time):
-        function_scores = []
-        for i in range(num_func):
-            less_i_t, less_i_prev_t = [], []
-            great_i_t, great_i_prev_t = [], []
-            for j in range(num_func):
-                if loss_functions_per_fam[j, t] < loss_functions_per_fam[i, t]:
-                    less_i_t.append(j)
-                elif loss_functions_per_fam[j, t] > loss_functions_per_fam[i, t]:
-                    great_i_t.append(j)
-
-                if loss_functions_per_fam[j, t-1] < loss_functions_per_fam[i, t-1]:
-                    less_i_prev_t.append(j)
-                elif loss_functions_per_fam[j, t-1] > loss_functions_per_fam[i, t-1]:
-                    great_i_prev_t.append(j)
-
-            still_less = set(less_i_t) & set(less_i_prev_t)
-            still_great = set(great_i_t) & set(great_i_prev_t)
-
-            function_score = (len(still_less) + len(still_great)) / (num_func - 1)
-            function_scores.append(function_score)
-        relativity.append(sum(function_scores) / len(function_scores))
-
-    return relativity
+def _get_dense_ranks(values: np.ndarray) -> np.ndarray:
+    """
+    :param values: array of shape (n, n_columns)
+    :return: 1-based dense ranks of the values within each column (equal values have equal ranks)
+    """
+    order = np.argsort(values, axis=0, kind='stable')
+    sorted_values = np.take_along_axis(values, order, axis=0)
+    is_new_value = np.ones(values.shape, dtype=bool)
+    is_new_value[1:] = sorted_values[1:] != sorted_values[:-1]
+    ranks = np.empty(values.shape, dtype=np.int64)
+    np.put_along_axis(ranks, order, np.cumsum(is_new_value, axis=0), axis=0)
+    return ranks
+
+
+def _count_strictly_dominated(before: np.ndarray, after: np.ndarray) -> np.ndarray:
+    """For every column, counts the points that are strictly lower than each point both before and after. Points are
+    visited in increasing order of before (and decreasing order of after for equal before) while a Fenwick tree over
+    the ranks of after counts the visited points with a strictly lower after. All columns are processed at once.
+
+    :param before: array of shape (n, n_columns)
+    :param after: array of shape (n, n_columns)
+    :return: counts[i, c] = #{j: before[j, c] < before[i, c] and after[j, c] < after[i, c]}, 0 where there are NaNs
+    """
+    n, n_columns = before.shape
+    columns = np.arange(n_columns)
+    is_valid = ~(np.isnan(before) | np.isnan(after))  # NaNs are never lower or greater than anything
+    after_ranks = _get_dense_ranks(after)
+    order = np.lexsort((-after, before), axis=0)
+    n_bits = n.bit_length() + 1
+
+    tree = np.zeros((n + 2, n_columns), dtype=np.int64)  # row 0 is always 0, row n + 1 collects overflowing updates
+    counts = np.empty((n, n_columns), dtype=np.int64)
+    for rows in order:
+        ranks, valid = after_ranks[rows, columns], is_valid[rows, columns]
+
+        index, count = ranks - 1, np.zeros(n_columns, dtype=np.int64)
+        for _ in range(n_bits):  # prefix sum of tree up to rank - 1
+            count += tree[index, columns]
+            index -= index & -index
+        counts[rows, columns] = count * valid
+
+        index = ranks.copy()
+        for _ in range(n_bits):  # add valid points at rank
+            tree[index, columns] += valid
+            index += index & -index
+            index[index > n] = n + 1
+    return counts
+
+
+def get_order_scores(before: np.ndarray, after: np.ndarray) -> np.ndarray:
+    """
+    :param before: values of n loss functions in several columns (eg. epochs), array of shape (n, n_columns)
+    :param after: values of the same loss functions in the same number of columns (eg. next epochs)
+    :return: array of shape (n, n_columns), the number of other loss functions that are strictly lower (or strictly
+             greater) than the i-th one both before and after, divided by n - 1
+    """
+    num_func = before.shape[0]
+    if num_func < 2:
+        raise ValueError(f"Order profiles need at least 2 loss functions, instead {num_func} were supplied")
+    chunk = max(1, CHUNK_SIZE // num_func)
+    counts = np.empty(before.shape, dtype=np.int64)
+    for start in range(0, before.shape[1], chunk):
+        columns = slice(start, start + chunk)
+        counts[:, columns] = _count_strictly_dominated(before[:, columns], after[:, columns]) + \
+            _count_strictly_dominated(-before[:, columns], -after[:, columns])
+    return counts / (num_func - 1)
 
 
-def get_ends_order_profile(loss_functions_per_fam: np.ndarray) -> float:
-    num_func, max_time = loss_functions_per_fam.shape
+def _average(function_scores: np.ndarray) -> float:
+    # summed one after another like the sum of a list, so that profiles do not depend on the implementation
+    return sum(function_scores.tolist()) / len(function_scores)
+
 
-    function_scores = []
-    for i in range(num_func):
-        less_i_t, less_i_prev_t = [], []
-        great_i_t, great_i_prev_t = [], []
-        for j in range(num_func):
-            if loss_functions_per_fam[j, max_time - 1] < loss_functions_per_fam[i, max_time - 1]:
-                less_i_t.append(j)
-            elif loss_functions_per_fam[j, max_time - 1] > loss_functions_per_fam[i, max_time - 1]:
-                great_i_t.append(j)
+def get_dynamic_order_profile(loss_functions_per_fam: np.ndarray) -> List[float]:
+    """For every time t (but the first), the average over loss functions of the fraction of other loss functions that
+    are on the same side (strictly lower or strictly greater) at both t - 1 and t.
 
-            if loss_functions_per_fam[j, 0] < loss_functions_per_fam[i, 0]:
-                less_i_prev_t.append(j)
-            elif loss_functions_per_fam[j, 0] > loss_functions_per_fam[i, 0]:
-                great_i_prev_t.append(j)
+    :param loss_functions_per_fam: array of shape (num_func, max_time)
+    :return: dynamic order profile, of length max_time - 1
+    """
+    loss_functions_per_fam = np.asarray(loss_functions_per_fam, dtype=float)
+    scores = get_order_scores(loss_functions_per_fam[:, :-1], loss_functions_per_fam[:, 1:])
+    return [_average(scores[:, t]) for t in range(scores.shape[1])]
 
-        still_less = set(less_i_t) & set(less_i_prev_t)
-        still_great = set(great_i_t) & set(great_i_prev_t)
 
-        function_score = (len(still_less) + len(still_great)) / (num_func - 1)
-        function_scores.append(function_score)
-    return sum(function_scores) / len(function_scores)
+def get_ends_order_profile(loss_functions_per_fam: np.ndarray) -> float:
+    """
+    :param loss_functions_per_fam: array of shape (num_func, max_time)
+    :return: average over loss functions of the fraction of other loss functions that are on the same side (strictly
+             lower or strictly greater) at both the first and the last time
+    """
+    loss_functions_per_fam = np.asarray(loss_functions_per_fam, dtype=float)
+    scores = get_order_scores(loss_functions_per_fam[:, :1], loss_functions_per_fam[:, -1:])
+    return _average(scores[:, 0])
 
 
 def plot_simulated(func_name: str, n_simulations: int, max_resources: int = 81, n_resources: Optional[int] = None,
@@ -103,13 +145,13 @@ def plot_simulated(func_name: str, n_simulations: int, max_resources: int = 81,
     assert n_resources <= max_resources
     scheduler = scheduler(shape_families, max_resources, init_noise)
 
-    loss_functions = []
-    for i in range(n_simulations):
-        evaluator: OptFunctionSimulationEvaluator = simulator.get_evaluator(*scheduler.get_family(), should_plot=True)
-        evaluator.evaluate(n_resources=n_resources)
-        loss_functions.append(evaluator.fs)
+    loss_functions = simulator.simulate_batch([scheduler.get_family() for _ in range(n_simulations)])
+    for loss_function in loss_functions:
+        plt.plot(list(range(n_resources)), loss_function[:n_resources], linewidth=1.5)
+    plt.xlabel("time/epoch/resources")
+    plt.ylabel("error/loss")
 
-    return loss_functions
+    return loss_functions.tolist()
 
 
 def plot_profiles(loss_functions: List[List[float]], ax1: Axes, ax2: Axes, ax4: Axes,
@@ -0,0 +1,189 @@
+"""Schedule of Hyperband: brackets of Successive Halving and their rungs (n_i arms with r_i resources each), computed in
+exact integer (and rational, for resources) arithmetic, with the resource cost of every bracket and a dry-run estimate
+of the wall time of a run given the measured cost of one unit of resource.
+
+Dry-run, eg. to size a cluster before launching a run:
+python -m autotune.optimisers.hyperband_schedule -iter 81 -eta 3 -cost 120 -workers 16
+"""
+import argparse
+from fractions import Fraction
+from math import ceil
+from typing import Iterator, List, NamedTuple, Optional, Tuple
+
+
+def floor_log(x: int, base: int) -> int:
+    """
+    :param x: positive integer
+    :param base: integer greater than 1
+    :return: floor(log_base(x)), that is the greatest s such that base ** s <= x
+    """
+    s, power = 0, base
+    while power <= x:
+        s, power = s + 1, power * base
+    return s
+
+
+class Rung(NamedTuple):
+    """Round i of Successive Halving: n_i arms are evaluated with r_i resources each and the best n_keep of them are
+    promoted to the next rung."""
+    i: int
+    n_i: int
+    r_i: Fraction
+    n_keep: int
+
+    @property
+    def resources(self) -> float:
+        """Resources allocated to each arm, as given to Evaluator.evaluate."""
+        return float(self.r_i)
+
+
+class Bracket(NamedTuple):
+    """Execution of Successive Halving, starting with n arms with r resources each."""
+    s: int
+    rungs: Tuple[Rung, ...]
+
+    @property
+    def n(self) -> int:
+        return self.rungs[0].n_i
+
+    @property
+    def r(self) -> Fraction:
+        return self.rungs[0].r_i
+
+    def get_rung_resources(self, with_reuse: bool = False) -> List[Fraction]:
+        """
+        :param with_reuse: whether evaluators resume from their previous rung (eg. from checkpoints), so that a promoted
+                           arm only needs r_i - r_(i-1) more resources
+        :return: resources per arm needed by every rung
+        """
+        previous_r = [Fraction(0)] + [rung.r_i for rung in self.rungs[:-1]]
+        return [rung.r_i - prev_r if with_reuse else rung.r_i for rung, prev_r in zip(self.rungs, previous_r)]
+
+    def get_cost(self, with_reuse: bool = False) -> Fraction:
+        """
+        :param with_reuse: whether evaluators resume from their previous rung (see get_rung_resources)
+        :return: total resources used by the bracket
+        """
+        return sum((rung.n_i * r for rung, r in zip(self.rungs, self.get_rung_resources(with_reuse))), Fraction(0))
+
+
+class HyperbandSchedule:
+    """Brackets of Hyperband for a maximum of R resources per arm and a halving rate eta (in the order in which they are
+    run, from the most exploratory one s = s_max down to s = s_min):
+
+    s_max = floor(log_eta(R)), B = (s_max + 1) * R
+    n = floor(B / R / (s + 1)) * eta ** s, r = R * eta ** -s
+    n_i = n * eta ** -i, r_i = r * eta ** i, and the best n_i // eta arms are kept after rung i
+
+    n_i is always an integer and r_i is an exact fraction (an integer if R is a power of eta)."""
+
+    def __init__(self, max_iter: int, eta: int, s_min: Optional[int] = None):
+        """
+        :param max_iter: maximum resources R that can be allocated to a single arm
+        :param eta: halving rate
+        :param s_min: last bracket to run, by default 2 (skipping the least exploratory brackets) if s_max >= 2 else 0
+        """
+        if int(eta) != eta or eta < 2:
+            raise ValueError(f"The halving rate eta must be an integer greater than 1, instead {eta} was supplied")
+        if int(max_iter) != max_iter or max_iter < 1:
+            raise ValueError(f"max_iter must be a positive integer, instead {max_iter} was supplied")
+        self.max_iter = R = int(max_iter)
+        self.eta = eta = int(eta)
+        self.s_max = floor_log(R, eta)  # number of unique executions of Successive Halving (minus one)
+        self.s_min = (2 if self.s_max >= 2 else 0) if s_min is None else s_min
+        if not 0 <= self.s_min <= self.s_max:
+            raise ValueError(f"s_min must be between 0 and s_max = {self.s_max}, instead {self.s_min} was supplied")
+        self.budget = (self.s_max + 1) * R  # total/max resources (without reuse) per execution of Successive Halving
+
+        self.brackets: List[Bracket] = []
+        for s in reversed(range(self.s_min, self.s_max + 1)):
+            n = (self.budget // R // (s + 1)) * eta ** s  # initial number of evaluators/configurations/arms
+            r = Fraction(R, eta ** s)                    # initial resources allocated to each evaluator/arm
+            rungs = tuple(Rung(i=i, n_i=n // eta ** i, r_i=r * eta ** i, n_keep=n // eta ** (i + 1))
+                          for i in range(s + 1))
+            self.brackets.append(Bracket(s, rungs))
+
+    def __iter__(self) -> Iterator[Bracket]:
+        return iter(self.brackets)
+
+    def __len__(self) -> int:
+        return len(self.brackets)
+
+    def get_total_cost(self, with_reuse: bool = False) -> Fraction:
+        """
+        :param with_reuse: whether evaluators resume from their previous rung (see Bracket.get_rung_resources)
+        :return: total resources used by all brackets
+        """
+        return sum((bracket.get_cost(with_reuse) for bracket in self.brackets), Fraction(0))
+
+    @property
+    def n_evaluations(self) -> int:
+        """Number of evaluations (evaluate calls) of all brackets."""
+        return sum(rung.n_i for bracket in self.brackets for rung in bracket.rungs)
+
+    def get_peak_concurrent_arms(self, concurrent_brackets: bool = False) -> int:
+        """
+        :param concurrent_brackets: whether brackets run at the same time (eg. ParallelHyperbandOptimiser's workers)
+        :return: greatest number of arms that can be evaluated at the same time (ie. useful number of workers)
+        """
+        first_rungs = [bracket.n for bracket in self.brackets]
+        return sum(first_rungs) if concurrent_brackets else max(first_rungs)
+
+    def estimate_wall_time(self, cost_per_resource: float, n_workers: int = 1, concurrent_brackets: bool = False,
+                           with_reuse: bool = False) -> float:
+        """Dry-run estimate of the wall time of the schedule, assuming that evaluations of a rung are spread evenly over
+        the workers and that a rung starts when the previous rung of its bracket has finished.
+
+        :param cost_per_resource: measured time to evaluate one arm with one unit of resource (eg. seconds per epoch)
+        :param n_workers: number of arms evaluated at the same time
+        :param concurrent_brackets: whether brackets run at the same time, then the estimate is the greatest of the
+                                    total work divided by the number of workers and of the longest bracket
+        :param with_reuse: whether evaluators resume from their previous rung (see Bracket.get_rung_resources)
+        :return: estimated wall time (in the unit of cost_per_resource)
+        """
+        if n_workers < 1:
+            raise ValueError(f"At least one worker is needed, instead {n_workers} was supplied")
+
+        def get_bracket_time(bracket: Bracket) -> Fraction:
+            return sum((ceil(Fraction(rung.n_i, n_workers)) * r
+                        for rung, r in zip(bracket.rungs, bracket.get_rung_resources(with_reuse))), Fraction(0))
+
+        if concurrent_brackets:
+            longest_bracket = max(get_bracket_time(bracket) for bracket in self.brackets)
+            return float(max(self.get_total_cost(with_reuse) / n_workers, longest_bracket) * cost_per_resource)
+        return float(sum(get_bracket_time(bracket) for bracket in self.brackets) * cost_per_resource)
+
+    def __str__(self) -> str:
+        """
+        :return: table of the brackets and their rungs (n_i arms x r_i resources)
+        """
+        lines = [f"Hyperband schedule: R = {self.max_iter}, eta = {self.eta}, s_max = {self.s_max}, "
+                 f"s_min = {self.s_min}, B = {self.budget}"]
+        for bracket in self.brackets:
+            rungs = ', '.join(f"{rung.n_i} x {rung.resources:.2f}" for rung in bracket.rungs)
+            lines.append(f"  bracket s = {bracket.s}: {rungs} (cost {float(bracket.get_cost()):.2f})")
+        lines.append(f"  total cost {float(self.get_total_cost()):.2f} ({float(self.get_total_cost(True)):.2f} with "
+                     f"reuse), {self.n_evaluations} evaluations, "
+                     f"peak concurrent arms {self.get_peak_concurrent_arms()}")
+        return '\n'.join(lines)
+
+
+def _get_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Dry run of a Hyperband schedule')
+    parser.add_argument('-iter', '--max-iter', type=int, default=81, help='maximum resources per arm (R)')
+    parser.add_argument('-eta', type=int, default=3, help='halving rate')
+    parser.add_argument('-cost', type=float, default=1, help='measured time per arm per unit of resource')
+    parser.add_argument('-workers', type=int, default=1, help='number of workers')
+    parser.add_argument('-concurrent', action='store_true', help='whether brackets run at the same time')
+    parser.add_argument('-reuse', action='store_true', help='whether evaluators resume from their previous rung')
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    arguments = _get_args()
+    hyperband_schedule = HyperbandSchedule(arguments.max_iter, arguments.eta)
+    print(hyperband_schedule)
+    print(f"Peak concurrent arms: {hyperband_schedule.get_peak_concurrent_arms(arguments.concurrent)}")
+    wall_time = hyperband_schedule.estimate_wall_time(arguments.cost, arguments.workers, arguments.concurrent,
+                                                      arguments.reuse)
+    print(f"Estimated wall time: {wall_time:.2f}")
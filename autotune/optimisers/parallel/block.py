@@ -1,4 +1,5 @@
 from dataclasses import dataclass
+from fractions import Fraction
 from typing import Optional, Sequence
 
 from colorama import Fore, Style
@@ -13,11 +14,18 @@ END = Style.RESET_ALL
 class Block:
     """To be consumed by workers.
 
-    Corresponds to (Ni, Ri) pairs of a bracket.
+    Corresponds to (Ni, Ri) pairs of a bracket (or to part of them if rungs are split, see Master.max_block_size).
     """
     bracket: int
     i: int
     max_i: int
     n_i: int
-    r_i: int
+    r_i: Fraction  # exact resources of each arm (see HyperbandSchedule)
     evaluations: Optional[Sequence[Evaluation]] = None  # one evaluator for each arm
+    part: int = 0     # index of this part of the rung
+    n_parts: int = 1  # number of parts of the rung, it is halved once all of them have been evaluated
+
+    @property
+    def cost(self) -> Fraction:
+        """Resources needed to consume the block."""
+        return self.n_i * self.r_i
@@ -1,19 +1,21 @@
-from math import ceil
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from os.path import join as path_join
-from typing import Callable, List, Optional
+from typing import Callable, List, Optional, Tuple
 
-import mpmath
+import numpy as np
 import pandas as pd
 from colorama import Fore, Style
 
 from autotune.core import (
-    Evaluation, Evaluator, HyperparameterOptimisationProblem, OptimisationGoals, Optimiser, ShapeFamilyScheduler,
-    SimulationProblem, optimisation_metric_user)
+    Evaluation, EvaluationExecutor, Evaluator, HyperparameterOptimisationProblem, OptimisationGoals, Optimiser,
+    ShapeFamilyScheduler, SimulationProblem, optimisation_metric_user)
+from autotune.core.common_random_numbers import get_root_seed
+from autotune.optimisers.hyperband_schedule import Bracket, HyperbandSchedule
 
 COL = Fore.MAGENTA
 
-mpmath.mp.dps = 64
-
 
 class ParallelHyperbandOptimiser(Optimiser):
     """Examples of resources:
@@ -25,7 +27,8 @@ class ParallelHyperbandOptimiser(Optimiser):
     def __init__(self, eta: int, max_iter: int = None, max_time: int = None, min_or_max: Callable = min,
                  optimisation_func: Callable[[OptimisationGoals], float] = Optimiser.default_optimisation_func,
                  is_simulation: bool = False, scheduler: Optional[ShapeFamilyScheduler] = None,
-                 plot_simulation: bool = False):
+                 plot_simulation: bool = False, executor: Optional[EvaluationExecutor] = None,
+                 n_workers: Optional[int] = None, seed: Optional[int] = None):
         """
         :param eta: halving rate
         :param max_iter: max iteration (considered infinity if None) - stopping condition
@@ -36,69 +39,108 @@ class ParallelHyperbandOptimiser(Optimiser):
         :param is_simulation: flag if the problem under optimisation is a real machine learning problem or a simulation
         :param scheduler: if the problem is a simulation, the scheduler provides the parameters for families of shapes
         :param plot_simulation: each simulated loss function will be added to plt.plot, use plt.show() to see results
+        :param executor: evaluates the arms of a rung (eg. concurrently), by default one after another
+        :param n_workers: number of brackets that run at the same time (in worker processes), by default as many as
+                          there are brackets and CPUs. With more than one worker, the problem, its evaluators and the
+                          optimisation_func must be picklable
+        :param seed: root seed of the seeds of the brackets, by default drawn from the global numpy random state
         """
-        super().__init__(max_iter, max_time, min_or_max, optimisation_func, is_simulation, scheduler, plot_simulation)
+        super().__init__(max_iter, max_time, min_or_max, optimisation_func, is_simulation, scheduler, plot_simulation,
+                         executor)
         if max_iter is None:
             raise ValueError("For Hyperband max_iter cannot be None")
         self.eta = eta
+        self.schedule = HyperbandSchedule(max_iter, eta)  # brackets of Successive Halving
+        if n_workers is not None and n_workers < 1:
+            raise ValueError(f"n_workers must be a positive integer, instead {n_workers} was supplied")
+        self.n_workers = n_workers if n_workers is not None else max(1, min(len(self.schedule), os.cpu_count() or 1))
+        self.seed = seed
 
     def _get_optimisation_func_val(self, evaluation: Evaluation) -> float:
         return self.optimisation_func(evaluation.optimisation_goals)
 
     def _get_best_n_evaluators(self, n: int, evaluations: List[Evaluation]) -> List[Evaluator]:
-        """Note that for minimization we sort in ascending order while for maximization we sort in descending order by
-        the value of the optimisation_func applied on evaluations.
+        """Note that for minimization the best evaluators are those with the smallest values of the optimisation_func
+        while for maximization they are those with the greatest values (see _get_best_n_evaluations).
 
         :param n: number of top "best evaluators" to retrieve
         :param evaluations: A list of ordered pairs (evaluator, result of evaluator's evaluate() method)
         :return: best n evaluators (those evaluators that gave the best n values on self.optimisation_goal)
         """
-        is_descending = self.min_or_max == max
-        sorted_evaluations_by_res = sorted(evaluations, key=self._get_optimisation_func_val, reverse=is_descending)
-        sorted_evaluators = [evaluation.evaluator for evaluation in sorted_evaluations_by_res]
-        return sorted_evaluators[:n]
+        return [evaluation.evaluator for evaluation in self._get_best_n_evaluations(n, evaluations)]
 
     @optimisation_metric_user
     def run_optimisation(self, problem: HyperparameterOptimisationProblem, verbosity: bool = False) -> Evaluation:
-        """
+        """Brackets are independent so they all run at the same time (up to n_workers of them), each in a worker
+        process which goes through its rungs on its own. Arms of all brackets are drawn beforehand by this process, then
+        the best evaluation of every rung is merged into the evaluation history (and the incumbent) as brackets finish.
+        Every bracket seeds the global random states with its own seed spawned from self.seed (by default drawn from the
+        global numpy random state), so results do not depend on n_workers.
+
         :param problem: optimisation problem (eg. CIFAR, MNIST, SVHN, MRBI problems)
         :param verbosity: whether to print the results of every single evaluation/iteration
         :return: Evaluation of best arm (evaluator, optimisation_goals)
         """
-        R = self.max_iter  # maximum amount of resource that can be allocated to a single hyperparameter configuration
-        eta = self.eta     # halving rate
-
-        def log_eta(x: int) -> int: return int(mpmath.log(x)/mpmath.log(eta))
-        s_max = log_eta(R)              # number of unique executions of Successive Halving (minus one)
-        s_min = 2 if s_max >= 2 else 0  # skip the rest of the brackets after s_min
-        B = (s_max + 1) * R             # total/max resources (without reuse) per execution of Successive Halving
-
-        # Exploration-exploitation trade-off management outer loop
-        for s in reversed(range(s_min, s_max + 1)):
-            self._run_bracket(problem, B, R, eta, s, verbosity)
+        brackets = [(bracket, self._get_arms_for_bracket(problem, bracket.n)) for bracket in self.schedule]
+        seed_sequences = np.random.SeedSequence(get_root_seed(self.seed)).spawn(len(brackets))
+
+        if self.n_workers == 1:
+            for seed_sequence, (bracket, evaluators) in zip(seed_sequences, brackets):
+                self._merge_bracket(self._run_seeded_bracket(seed_sequence, problem, bracket, evaluators), verbosity)
+        else:
+            with ProcessPoolExecutor(max_workers=self.n_workers) as pool:
+                futures = [pool.submit(self._run_seeded_bracket, seed_sequence, problem, bracket, evaluators)
+                           for seed_sequence, (bracket, evaluators) in zip(seed_sequences, brackets)]
+                for future in as_completed(futures):
+                    self._merge_bracket(future.result(), verbosity)
 
         return self._get_best_evaluation()
 
-    def _run_bracket(
-            self, problem: HyperparameterOptimisationProblem, B: int, R: int, eta: float, s: int, verbosity: bool
-    ) -> None:
-        n = int(ceil(int(B / R / (s + 1)) * eta ** s))  # initial number of evaluators/configurations/arms
-        r = R * eta ** (-s)  # initial resources allocated to each evaluator/arm
-
-        evaluators = self._get_arms_for_bracket(problem, n)
+    def _run_seeded_bracket(self, seed_sequence: np.random.SeedSequence, problem: HyperparameterOptimisationProblem,
+                            bracket: Bracket, evaluators: List[Evaluator]) -> List[Tuple[Evaluation, float]]:
+        """Runs a bracket after seeding the global random states (numpy and python random), otherwise all forked
+        workers would draw the same values (eg. simulated loss functions without CRN).
 
-        # Successive halving with rate eta - based on values of self.optimisation_func(opt goals of each evaluation)
-        for i in range(s + 1):
-            n_i = n * eta ** (-i)  # evaluate n_i evaluators/configurations/arms
-            r_i = r * eta ** i  # each with r_i resources
-            evaluations = [Evaluation(evaluator, evaluator.evaluate(n_resources=r_i)) for evaluator in evaluators]
-            print(f"{COL}** Evaluated {int(n_i)} arms, each with {r_i:.2f} resources {Style.RESET_ALL}")
+        :param seed_sequence: seed of the bracket
+        :param problem: optimisation problem
+        :param bracket: bracket to run
+        :param evaluators: evaluators of the first rung of the bracket
+        :return: best evaluation of every rung with the resources it was given
+        """
+        np_seed, py_seed = seed_sequence.generate_state(2)
+        np.random.seed(int(np_seed))
+        random.seed(int(py_seed))
+        return self._run_bracket(problem, bracket, evaluators)
+
+    def _run_bracket(self, problem: HyperparameterOptimisationProblem, bracket: Bracket,
+                     evaluators: List[Evaluator]) -> List[Tuple[Evaluation, float]]:
+        """Successive halving with rate eta - based on values of self.optimisation_func(opt goals of each evaluation).
+
+        :param problem: optimisation problem
+        :param bracket: bracket to run
+        :param evaluators: evaluators of the first rung of the bracket
+        :return: best evaluation of every rung with the resources it was given
+        """
+        best_evaluations = []
+        for rung in bracket.rungs:
+            n_i = rung.n_i  # evaluate n_i evaluators/configurations/arms
+            r_i = rung.resources  # each with r_i resources
+            evaluations = self._evaluate_batch(problem, evaluators, n_resources=r_i)
+            print(f"{COL}** Evaluated {n_i} arms, each with {r_i:.2f} resources {Style.RESET_ALL}")
 
             # Halving: keep best 1/eta of them, which will be allocated more resources/iterations
-            evaluators = self._get_best_n_evaluators(n=int(n_i / eta), evaluations=evaluations)
+            ranked_evaluations = self._get_best_n_evaluations(max(rung.n_keep, 1), evaluations)
+            evaluators = [evaluation.evaluator for evaluation in ranked_evaluations[:rung.n_keep]]
+            best_evaluations.append((ranked_evaluations[0], r_i))
+        return best_evaluations
 
-            best_evaluation_in_round = self.min_or_max(evaluations, key=self._get_optimisation_func_val)
-            self._update_evaluation_history(*best_evaluation_in_round)
+    def _merge_bracket(self, best_evaluations: List[Tuple[Evaluation, float]], verbosity: bool) -> None:
+        """
+        :param best_evaluations: best evaluation of every rung of a finished bracket with the resources it was given
+        :param verbosity: whether to print the results of every single evaluation/iteration
+        """
+        for best_evaluation_in_round, r_i in best_evaluations:
+            self._update_evaluation_history(*best_evaluation_in_round, n_resources=r_i)
 
             self._update_optimiser_metrics()
             if verbosity:
@@ -106,7 +148,7 @@ class ParallelHyperbandOptimiser(Optimiser):
 
     def _get_arms_for_bracket(self, problem: HyperparameterOptimisationProblem, n: int) -> List[Evaluator]:
         if not self.is_simulation:
-            evaluators = [problem.get_evaluator() for _ in range(n)]
+            evaluators = self._get_random_evaluators(problem, n)
             self._bracket_population_of_arms_to_csv(evaluators, n_arms=n)
         else:  # is simulation
             problem: SimulationProblem
@@ -118,13 +160,14 @@ class ParallelHyperbandOptimiser(Optimiser):
 
     @staticmethod
     def _bracket_population_of_arms_to_csv(evaluators: List[Evaluator], n_arms: int) -> None:
-        if evaluators:
+        if evaluators and evaluators[0].output_dir is not None:  # arms are only saved along with checkpoints
             assert all(evaluator.output_dir == evaluators[0].output_dir for evaluator in evaluators)
             file_path = path_join(evaluators[0].output_dir, f'bracket-with-{n_arms}-arms.csv')
             pd.DataFrame(evaluator.arm.__dict__ for evaluator in evaluators).to_csv(file_path)
 
     def __str__(self) -> str:
-        return f"\n> Starting Hyperband optimisation\n" \
+        return f"\n> Starting parallel Hyperband optimisation\n" \
                f"    Max iterations (R)      = {self.max_iter}\n" \
                f"    Halving rate (eta)      = {self.eta}\n" \
+               f"    Workers (brackets)      = {self.n_workers}\n" \
                f"  Optimizing ({self.min_or_max.__name__}) {self.optimisation_func.__doc__}"
@@ -0,0 +1,131 @@
+"""Local harness of the HTTP protocol: launches worker servers (see worker_server.py) as processes on localhost ports,
+eg. to test a master (see master_server.py) on a single machine before spreading its workers across machines.
+
+python -m autotune.optimisers.parallel.local_harness -workers 4
+"""
+import argparse
+import json
+import os
+import secrets
+import socket
+import subprocess
+import sys
+import time
+from types import TracebackType
+from typing import Any, List, Optional, Type
+from urllib.error import URLError
+from urllib.request import urlopen
+
+from autotune.benchmarks import OptFunctionSimulationProblem
+from autotune.core import OptimisationGoals
+from autotune.optimisers import RandomOptimiser
+from autotune.optimisers.parallel.master_server import HttpMaster
+from autotune.optimisers.parallel.protocol import SECRET_ENV_VAR, post
+from autotune.optimisers.parallel.worker_server import MAX_BLOCKS
+
+HOST = '127.0.0.1'
+STARTUP_TIMEOUT = 60  # seconds to wait for a worker server to answer
+
+
+def get_free_port(host: str = HOST) -> int:
+    """
+    :param host: host of the port
+    :return: a port that is free at the time of the call
+    """
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind((host, 0))
+        return sock.getsockname()[1]
+
+
+def _get_json(url: str, timeout: float = 10) -> Any:
+    with urlopen(url, timeout=timeout) as reply:
+        return json.loads(reply.read())
+
+
+class LocalHarness:
+    """Context manager which launches n_workers worker servers on free localhost ports and terminates them on exit. The
+    master must be given the secret of the harness (see protocol.py)."""
+
+    def __init__(self, n_workers: int, host: str = HOST, secret: Optional[str] = None):
+        """
+        :param n_workers: number of worker servers (processes)
+        :param host: host of the worker servers
+        :param secret: secret shared by the workers and the master, by default a random one
+        """
+        if n_workers < 1:
+            raise ValueError(f"n_workers must be a positive integer, instead {n_workers} was supplied")
+        self.n_workers = n_workers
+        self.host = host
+        self.secret = secret if secret is not None else secrets.token_hex(16)
+        self.worker_urls: List[str] = []
+        self._processes: List[subprocess.Popen] = []
+
+    def __enter__(self) -> 'LocalHarness':
+        for _ in range(self.n_workers):
+            port = get_free_port(self.host)
+            self._processes.append(subprocess.Popen(
+                [sys.executable, '-m', 'autotune.optimisers.parallel.worker_server', '-host', self.host,
+                 '-port', str(port)], env={**os.environ, SECRET_ENV_VAR: self.secret}))
+            self.worker_urls.append(f'http://{self.host}:{port}')
+        for worker_url, process in zip(self.worker_urls, self._processes):
+            self._wait_until_up(worker_url, process)
+        return self
+
+    @staticmethod
+    def _wait_until_up(worker_url: str, process: subprocess.Popen) -> None:
+        deadline = time.time() + STARTUP_TIMEOUT
+        while True:
+            try:
+                _get_json(f'{worker_url}/status')
+                return
+            except (URLError, ConnectionError):
+                if process.poll() is not None or time.time() > deadline:
+                    raise RuntimeError(f"Worker server {worker_url} did not start")
+                time.sleep(0.1)
+
+    def start_workers(self, master_url: str, max_blocks: int = MAX_BLOCKS) -> None:
+        """
+        :param master_url: url of the master the workers work for
+        :param max_blocks: maximum number of (small) blocks leased at once by a worker
+        """
+        for worker_url in self.worker_urls:
+            post(worker_url, 'start', {'master_url': master_url, 'max_blocks': max_blocks}, self.secret)
+
+    def get_status(self) -> List[Any]:
+        """
+        :return: status of the WorkerClients of every worker server
+        """
+        return [_get_json(f'{worker_url}/status') for worker_url in self.worker_urls]
+
+    def __exit__(self, exc_type: Optional[Type[BaseException]], exc_value: Optional[BaseException],
+                 traceback: Optional[TracebackType]) -> None:
+        for process in self._processes:
+            process.terminate()
+        for process in self._processes:
+            process.wait()
+
+
+def _get_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Hyperband with a master and worker servers on localhost')
+    parser.add_argument('-workers', '--n-workers', type=int, default=2, help='number of worker servers')
+    parser.add_argument('-iter', '--max-iter', type=int, default=81, help='maximum resources per arm (R)')
+    parser.add_argument('-eta', type=int, default=3, help='halving rate')
+    parser.add_argument('-block', '--max-block-size', type=int, default=9, help='maximum number of arms per block')
+    return parser.parse_args()
+
+
+def optimisation_func(opt_goals: OptimisationGoals) -> float:
+    """fval."""
+    return opt_goals.fval
+
+
+if __name__ == '__main__':
+    arguments = _get_args()
+    with LocalHarness(arguments.n_workers) as harness:
+        master = HttpMaster(n_workers=arguments.n_workers, eta=arguments.eta, sampler=RandomOptimiser,
+                            max_iter=arguments.max_iter, optimisation_func=optimisation_func,
+                            max_block_size=arguments.max_block_size, secret=harness.secret)
+        harness.start_workers(master.start(OptFunctionSimulationProblem('branin')))
+        best_evaluation = master.wait()
+        print(harness.get_status())
+    print(best_evaluation.evaluator.arm, best_evaluation.optimisation_goals)
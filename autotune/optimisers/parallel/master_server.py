@@ -1,18 +1,22 @@
+import argparse
+import threading
+import time
+from collections import deque
 from dataclasses import dataclass, field
-from queue import Queue
-from typing import Callable, List, Optional, Type, Union
+from typing import Any, Dict, List, Optional, Tuple
 
-import mpmath
+import numpy as np
 from colorama import Fore, Style
-from flask import Flask
+from flask import Flask, Response, abort, jsonify, request
+from werkzeug.serving import BaseWSGIServer, make_server
 
-from autotune.core import (
-    Evaluation, HyperparameterOptimisationProblem, OptimisationGoals, Optimiser, ShapeFamily, ShapeFamilyScheduler,
-    UniformShapeFamilyScheduler)
+from autotune.core import Evaluation, HyperparameterOptimisationProblem, ShapeFamily, UniformShapeFamilyScheduler
+from autotune.core.common_random_numbers import get_root_seed
+from autotune.optimisers.hyperband_schedule import HyperbandSchedule
 from autotune.optimisers.parallel.block import Block
-from autotune.optimisers.parallel.worker_server import Worker
-from autotune.optimisers.sequential.random_optimiser import RandomOptimiser
-from autotune.optimisers.sequential.sigopt_optimiser import SigOptimiser
+from autotune.optimisers.parallel.master_worker_block import SPLIT_ACROSS_WORKERS, Master
+from autotune.optimisers.parallel.protocol import (
+    CONTENT_TYPE, BlockResult, Lease, LeaseReply, Registration, decode, encode, get_secret)
 from autotune.optimisers.sequential.tpe_optimiser import TpeOptimiser
 
 COL = Fore.MAGENTA
@@ -20,68 +24,218 @@ END = Style.RESET_ALL
 
 
 @dataclass
-class Master:
-    n_workers: int
-    eta: int
-    sampler: Type[Union[TpeOptimiser, SigOptimiser, RandomOptimiser]]
-    max_iter: Optional[int] = None
-    max_time: Optional[int] = None
-    min_or_max: Callable = min
-    optimisation_func: Callable[[OptimisationGoals], float] = Optimiser.default_optimisation_func
-    is_simulation: bool = False
-    scheduler: Optional[ShapeFamilyScheduler] = None
-    plot_simulation: bool = False
+class HttpMaster(Master):
+    """Master whose workers (see worker_server.py) connect over HTTP, possibly from other machines: they register, lease
+    blocks, send their results back block by block and send heartbeats while they consume their blocks (see
+    protocol.py). Blocks are dealt to the queues of n_workers expected workers and stolen by idle workers as in Master,
+    workers that register beyond n_workers get an empty queue (they only steal). If a lease is not renewed by a
+    heartbeat within lease_timeout seconds (eg. the worker died), its block is queued again and given to another
+    worker. Messages are authenticated with a secret shared with the workers (see protocol.py)."""
+    lease_timeout: float = 60       # seconds after which a lease that was not renewed expires
+    heartbeat_interval: float = 10  # seconds between the heartbeats of a worker
+    max_batch_cost: Optional[float] = None  # small blocks are leased together up to this cost (by default max_iter)
+    secret: Optional[str] = None            # shared with the workers, by default AUTOTUNE_SECRET (see get_secret)
 
-    _queue: 'Queue[Block]' = field(init=False, default_factory=Queue)
-    _workers: List[Worker] = field(init=False)
+    _leases: Dict[int, Tuple[int, Block, float]] = field(init=False, default_factory=dict)  # worker id, block, deadline
+    _n_leases: int = field(init=False, default=0)
+    _n_registered: int = field(init=False, default=0)
+    _lock: threading.Lock = field(init=False, default_factory=threading.Lock)
+    _done: threading.Event = field(init=False, default_factory=threading.Event)
+    _error: Optional[str] = field(init=False, default=None)
+    _server: Optional[BaseWSGIServer] = field(init=False, default=None)
+    _problem: Optional[HyperparameterOptimisationProblem] = field(init=False, default=None)
+    _root_seed: int = field(init=False, default=0)  # seed of the workers, drawn once the master starts (see seed)
 
-    def __post_init__(self) -> None:
-        self._workers = [Worker(self.eta, self.optimisation_func, self.sampler, self.min_or_max,
-                         self.is_simulation, self.scheduler) for _ in range(self.n_workers)]
+    def start(self, problem: HyperparameterOptimisationProblem, host: str = '127.0.0.1', port: int = 0) -> str:
+        """Queues the first blocks of all brackets and starts serving workers (in a background thread).
 
-    def run_optimisation(self, problem: HyperparameterOptimisationProblem) -> None:
-        R = self.max_iter  # maximum amount of resource that can be allocated to a single hyperparameter configuration
-        eta = self.eta  # halving rate
+        :param problem: optimisation problem (the problem, its evaluators and optimisation_func are sent to the workers)
+        :param host: host to listen on (eg. 0.0.0.0 for workers on other machines)
+        :param port: port to listen on, by default a free port
+        :return: url of the master
+        """
+        secret = get_secret(self.secret)
+        self._problem = problem
+        self._root_seed = get_root_seed(self.seed)
+        for j, bracket in enumerate(HyperbandSchedule(self.max_iter, self.eta)):  # initial blocks
+            block = Block(bracket=bracket.s, i=1, max_i=bracket.s+1, n_i=bracket.n, r_i=bracket.r)
+            self._queues[j % self.n_workers].extend(self._split(block))
+        self._server = make_server(host, port, create_master_app(self, secret), threaded=True)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return f'http://{host}:{self._server.server_port}'
 
-        def log_eta(x: int) -> int:
-            return int(mpmath.log(x) / mpmath.log(eta))
+    def wait(self, poll_interval: float = 0.5) -> Evaluation:
+        """
+        :param poll_interval: seconds between checks of expired leases
+        :return: best evaluation of all brackets, once all of them have finished
+        """
+        try:
+            while not self._done.wait(poll_interval):
+                with self._lock:
+                    self._expire_leases()
+        finally:
+            if self._server is not None:
+                self._server.shutdown()
+        if self._error is not None:
+            raise RuntimeError(self._error)
+        return self.min_or_max(self.best_evaluations.values(), key=self._get_optimisation_func_val)
 
-        s_max = log_eta(R)  # number of unique executions of Successive Halving (minus one)
-        s_min = 2 if s_max >= 2 else 0  # skip the rest of the brackets after s_min
-        B = (s_max + 1) * R  # total/max resources (without reuse) per execution of Successive Halving
+    def run_optimisation(self, problem: HyperparameterOptimisationProblem, host: str = '127.0.0.1',
+                         port: int = 0) -> Evaluation:
+        """
+        :param problem: optimisation problem
+        :param host: host to listen on (eg. 0.0.0.0 for workers on other machines)
+        :param port: port to listen on
+        :return: best evaluation of all brackets
+        """
+        url = self.start(problem, host, port)
+        print(f"{COL}Master listening on {url}, waiting for workers{END}")
+        return self.wait()
 
-        for s in reversed(range(s_min, s_max + 1)):
-            n = int(mpmath.ceil(int(B / R / (s + 1)) * eta ** s))  # initial number of evaluators/configurations/arms
-            r = R * eta ** (-s)  # initial resources allocated to each evaluator/arm
-            self._queue.put(Block(bracket=s, i=1, max_i=s+1, n_i=n, r_i=r))  # initial blocks
+    def register(self) -> Registration:
+        """
+        :return: id of the new worker, the Worker (sampler, optimisation_func etc) and the problem
+        """
+        with self._lock:
+            worker_id = self._n_registered
+            self._n_registered += 1
+            if worker_id >= len(self._queues):
+                self._queues.append(deque())
+            seed = int(np.random.SeedSequence(self._root_seed).generate_state(worker_id + 1)[worker_id])
+            return Registration(worker_id=worker_id, worker=self._workers[0], problem=self._problem,
+                                heartbeat_interval=self.heartbeat_interval, seed=seed)
 
-        worker = self._workers[0]
-        while not self._queue.empty():
-            block = self._queue.get()
-            new_block = worker.consume_block(block, problem)
-            if new_block.i <= new_block.max_i:
-                self._queue.put(new_block)
-            else:
-                best_in_bracket = self.min_or_max(block.evaluations, key=self._get_optimisation_func_val)
-                print(f'Finished bracket {block.bracket}:\n{block}\n',
-                      best_in_bracket.evaluator.arm, best_in_bracket.optimisation_goals)
+    def lease(self, worker_id: int, max_blocks: int = 1) -> LeaseReply:
+        """
+        :param worker_id: id of the worker (see register)
+        :param max_blocks: maximum number of blocks to lease
+        :return: next block of the worker (see Master._get_next_block) and further ones while they fit in max_batch_cost
+        """
+        max_batch_cost = self.max_batch_cost if self.max_batch_cost is not None else self.max_iter
+        with self._lock:
+            self._expire_leases()
+            leases: List[Lease] = []
+            batch_cost = 0
+            while len(leases) < max_blocks and not self._done.is_set():
+                block = self._get_next_block(worker_id)
+                if block is None:
+                    break
+                if leases and batch_cost + block.cost > max_batch_cost:
+                    self._queues[worker_id].appendleft(block)
+                    break
+                batch_cost += block.cost
+                self._n_leases += 1
+                self._leases[self._n_leases] = (worker_id, block, time.time() + self.lease_timeout)
+                leases.append(Lease(self._n_leases, block))
+            return LeaseReply(leases=leases, is_done=self._done.is_set())
 
-    def _get_optimisation_func_val(self, evaluation: Evaluation) -> float:
-        return self.optimisation_func(evaluation.optimisation_goals)
+    def report(self, worker_id: int, results: List[BlockResult]) -> bool:
+        """
+        :param worker_id: id of the worker (see register)
+        :param results: results of leased blocks, results of expired leases are ignored (their blocks were queued again)
+        :return: whether the optimisation is done
+        """
+        with self._lock:
+            for result in results:
+                if result.lease_id not in self._leases:
+                    continue
+                _, block, _ = self._leases.pop(result.lease_id)
+                if result.error is not None:
+                    self._error = f"Worker {worker_id} failed to consume {block}:\n{result.error}"
+                    self._done.set()
+                    break
+                self._collect(worker_id, block, result.evaluations)
+            if not any(self._queues) and not self._leases:
+                self._done.set()
+            return self._done.is_set()
 
+    def heartbeat(self, worker_id: int, lease_ids: List[int]) -> None:
+        """
+        :param worker_id: id of the worker (see register)
+        :param lease_ids: leases the worker is still consuming
+        """
+        with self._lock:
+            deadline = time.time() + self.lease_timeout
+            for lease_id in lease_ids:
+                if lease_id in self._leases and self._leases[lease_id][0] == worker_id:
+                    self._leases[lease_id] = (worker_id, self._leases[lease_id][1], deadline)
 
-app = Flask(__name__)
+    def _expire_leases(self) -> None:
+        now = time.time()
+        for lease_id, (worker_id, block, deadline) in reversed(list(self._leases.items())):  # keeps their order
+            if deadline < now:
+                del self._leases[lease_id]
+                self._queues[worker_id].appendleft(block)  # stolen by other workers if this one is gone
+                print(f"{COL}Lease {lease_id} of worker {worker_id} expired, queued again: {block}{END}")
 
+    def get_status(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'n_registered_workers': self._n_registered,
+                'n_pending_blocks': sum(len(queue) for queue in self._queues),
+                'n_leased_blocks': len(self._leases),
+                'finished_brackets': sorted(self.best_evaluations),
+                'is_done': self._done.is_set(),
+                'error': self._error,
+            }
 
-MASTER: Master
-PROBLEM: HyperparameterOptimisationProblem
 
+def create_master_app(master: HttpMaster, secret: str) -> Flask:
+    """
+    :param master: master serving the requests
+    :param secret: secret shared with the workers, requests which were not encoded with it are rejected (403)
+    :return: Flask app of the protocol (see protocol.py)
+    """
+    app = Flask(__name__)
 
-@app.route('/set-master/n-workers=<n_workers>/eta=<eta>/max-iter=<max_iter>/sampler=<sampler>')
-def set_master(n_workers: str = '2', eta: str = '3', max_iter: str = '81', _: str = ...) -> None:
+    def receive() -> Dict[str, Any]:
+        try:
+            return decode(request.get_data(), secret)
+        except ValueError:
+            abort(403)
+
+    def reply(message: Any) -> Response:
+        return Response(encode(message, secret), mimetype=CONTENT_TYPE)
+
+    @app.route('/register', methods=['POST'])
+    def register() -> Response:
+        return reply(master.register(**receive()))
+
+    @app.route('/lease', methods=['POST'])
+    def lease() -> Response:
+        return reply(master.lease(**receive()))
+
+    @app.route('/results', methods=['POST'])
+    def results() -> Response:
+        return reply(master.report(**receive()))
+
+    @app.route('/heartbeat', methods=['POST'])
+    def heartbeat() -> Response:
+        return reply(master.heartbeat(**receive()))
+
+    @app.route('/status')
+    def status() -> Response:
+        return jsonify(master.get_status())
+
+    return app
+
+
+def _get_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Master of Hyperband, workers connect with worker_server.py (the '
+                                                 'secret shared with the workers is read from AUTOTUNE_SECRET)')
+    parser.add_argument('-host', default='127.0.0.1', help='host to listen on (eg. 0.0.0.0 for remote workers)')
+    parser.add_argument('-port', type=int, default=5000, help='port to listen on')
+    parser.add_argument('-workers', '--n-workers', type=int, default=2, help='number of expected workers')
+    parser.add_argument('-iter', '--max-iter', type=int, default=81, help='maximum resources per arm (R)')
+    parser.add_argument('-eta', type=int, default=3, help='halving rate')
+    parser.add_argument('-block', '--max-block-size', type=int, default=SPLIT_ACROSS_WORKERS,
+                        help='maximum number of arms per block (by default rungs are split across the workers)')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
     from autotune.benchmarks import OptFunctionSimulationProblem
-    global PROBLEM
-    PROBLEM = OptFunctionSimulationProblem('rastrigin')
+    arguments = _get_args()
     families_of_shapes_general = (
         ShapeFamily(None, 1.5, 10, 15, False),  # with aggressive start
         ShapeFamily(None, 0.5, 7, 10, False),  # with average aggressiveness at start and at the beginning
@@ -92,16 +246,11 @@ def set_master(n_workers: str = '2', eta: str = '3', max_iter: str = '81', _: st
 
         # ShapeFamily(None, 0, 1, 0, False, 0, 0),  # flat
     )
-    global MASTER
-    MASTER = Master(n_workers=int(n_workers), eta=int(eta), sampler=TpeOptimiser, max_iter=int(max_iter),
-                    min_or_max=min, is_simulation=True,
-                    scheduler=UniformShapeFamilyScheduler(families_of_shapes_general, max_resources=81, init_noise=10))
-
-
-if __name__ == '__main__':
-    INPUT_DIR = "D:/workspace/python/datasets/"
-    OUTPUT_DIR = "D:/workspace/python/datasets/output"
-    from autotune.benchmarks import MnistProblem
-    PROBLEM = MnistProblem(INPUT_DIR, OUTPUT_DIR)
-
-    MASTER.run_optimisation(PROBLEM)
+    MASTER = HttpMaster(n_workers=arguments.n_workers, eta=arguments.eta, sampler=TpeOptimiser,
+                        max_iter=arguments.max_iter, min_or_max=min, is_simulation=True,
+                        scheduler=UniformShapeFamilyScheduler(families_of_shapes_general, max_resources=81,
+                                                              init_noise=10),
+                        max_block_size=arguments.max_block_size)
+    best_evaluation = MASTER.run_optimisation(OptFunctionSimulationProblem('rastrigin'), arguments.host,
+                                              arguments.port)
+    print(best_evaluation.evaluator.arm, best_evaluation.optimisation_goals)
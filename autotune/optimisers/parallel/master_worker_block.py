@@ -1,31 +1,24 @@
-from dataclasses import dataclass, field
-from queue import Queue
-from typing import Callable, List, Optional, Sequence, Type, Union
+import multiprocessing
+import random
+from collections import deque
+from dataclasses import dataclass, field, replace
+from queue import Empty, Queue
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple, Type, Union
 
-import mpmath
+import numpy as np
 from colorama import Fore, Style
 
 from autotune.core import (
     Evaluation, HyperparameterOptimisationProblem, OptimisationGoals, Optimiser, ShapeFamily, ShapeFamilyScheduler,
-    UniformShapeFamilyScheduler)
+    UniformShapeFamilyScheduler, get_best_n_indices)
+from autotune.core.common_random_numbers import get_root_seed
 from autotune.optimisers import RandomOptimiser, SigOptimiser, TpeOptimiser
+from autotune.optimisers.hyperband_schedule import HyperbandSchedule
+from autotune.optimisers.parallel.block import Block
 
 COL = Fore.MAGENTA
 END = Style.RESET_ALL
-
-
-@dataclass
-class Block:
-    """To be consumed by workers.
-
-    Corresponds to (Ni, Ri) pairs of a bracket.
-    """
-    bracket: int
-    i: int
-    max_i: int
-    n_i: int
-    r_i: int
-    evaluations: Optional[Sequence[Evaluation]] = None  # one evaluator for each arm
+SPLIT_ACROSS_WORKERS = 0  # max_block_size of rungs split in n_workers blocks of ceil(n_i / n_workers) arms
 
 
 @dataclass
@@ -37,45 +30,58 @@ class Worker:
     is_simulation: bool = False
     scheduler: Optional[ShapeFamilyScheduler] = None
 
-    def _get_optimisation_func_val(self, evaluation: Evaluation) -> float:
-        return self.optimisation_func(evaluation.optimisation_goals)
-
-    def _get_best_n_evaluations(self, n: int, evaluations: List[Evaluation]) -> List[Evaluation]:
-        """Note that for minimization we sort in ascending order while for maximization we sort in descending order by
-        the value of the optimisation_func applied on evaluations.
-
-        :param n: number of top "best evaluators" to retrieve
-        :param evaluations: A list of ordered pairs (evaluator, result of evaluator's evaluate() method)
-        :return: best n evaluators (those evaluators that gave the best n values on self.optimisation_goal)
+    def consume_block(self, block: Block, problem: HyperparameterOptimisationProblem) -> List[Evaluation]:
+        """
+        :param block: block to consume, its arms are drawn by the sampler if it has no evaluations yet
+        :param problem: optimisation problem
+        :return: evaluations of the n_i arms of the block, each with r_i resources
         """
-        is_descending = self.min_or_max == max
-        sorted_evaluations_by_res = sorted(evaluations, key=self._get_optimisation_func_val, reverse=is_descending)
-        return sorted_evaluations_by_res[:n]
-
-    def consume_block(self, block: Block, problem: HyperparameterOptimisationProblem) -> Block:
         if block.evaluations is None:
             optimiser = self.sampler(
-                n_resources=block.r_i, max_iter=block.n_i, optimisation_func=self.optimisation_func,
+                n_resources=float(block.r_i), max_iter=block.n_i, optimisation_func=self.optimisation_func,
                 min_or_max=self.min_or_max, is_simulation=self.is_simulation, scheduler=self.scheduler
             )
             optimiser.run_optimisation(problem, verbosity=True)
-            evaluations = optimiser.eval_history
+            evaluations = list(optimiser.eval_history)
         else:
-            evaluations = [Evaluation(e.evaluator, e.evaluator.evaluate(n_resources=block.r_i))
+            evaluations = [Evaluation(e.evaluator, e.evaluator.evaluate(n_resources=float(block.r_i)))
                            for e in block.evaluations]
         print(f"{COL}** {'Generated' if block.evaluations is None else 'Evaluated'}: {block} {END}")
-        return Block(
-            bracket=block.bracket,
-            i=block.i+1,
-            max_i=block.max_i,
-            n_i=int(block.n_i/self.eta),  # is this okay?
-            r_i=block.r_i*self.eta,
-            evaluations=self._get_best_n_evaluations(int(block.n_i / self.eta), evaluations)
-        )
+        return evaluations
+
+
+def _run_worker(worker_id: int, worker: Worker, problem: HyperparameterOptimisationProblem, seed: int,
+                blocks: 'Queue[Optional[Block]]', results: 'Queue[Tuple[int, Block, Any]]') -> None:
+    """Loop of a worker process: consumes the blocks it is given until it gets None.
+
+    :param worker_id: index of the worker (and of its queue of pending blocks in the Master)
+    :param worker: worker that consumes the blocks
+    :param problem: optimisation problem
+    :param seed: seed of the random states of the process (otherwise all workers would draw the same arms)
+    :param blocks: blocks given to this worker by the Master
+    :param results: (worker_id, block, evaluations of the block or the exception raised while consuming it)
+    """
+    random.seed(seed)
+    np.random.seed(seed)
+    for block in iter(blocks.get, None):
+        try:
+            results.put((worker_id, block, worker.consume_block(block, problem)))
+        except Exception as exception:  # pylint: disable=broad-except  # re-raised by the Master
+            results.put((worker_id, block, exception))
 
 
 @dataclass
 class Master:
+    """Runs the blocks of all brackets of Hyperband on n_workers local worker processes. Every worker has a queue of
+    pending blocks: the first blocks of the brackets are dealt to the queues round robin and the successor of a rung
+    (its best 1/eta arms with eta times more resources) is queued by the worker that finished the rung. An idle worker
+    takes the oldest block of its own queue, if it is empty it steals the newest block of the longest pending queue.
+
+    Blocks are the unit of work, so by default every rung is split across the workers (in parts of ceil(n_i /
+    n_workers) arms) to keep them all busy, or in parts of at most max_block_size arms. With max_block_size=None whole
+    rungs are blocks, then at most as many workers are busy as there are brackets. Note that the arms of every part of
+    a first rung are drawn by a separate run of the sampler. If a worker process dies, its block is queued again for
+    the remaining workers."""
     n_workers: int
     eta: int
     sampler: Type[Union[TpeOptimiser, SigOptimiser, RandomOptimiser]]
@@ -86,40 +92,158 @@ class Master:
     is_simulation: bool = False
     scheduler: Optional[ShapeFamilyScheduler] = None
     plot_simulation: bool = False
+    max_block_size: Optional[int] = SPLIT_ACROSS_WORKERS  # rungs are split in blocks of at most this many arms
+    seed: Optional[int] = None  # root seed of the worker processes, by default drawn from np.random (see get_root_seed)
+    poll_interval: float = 1    # seconds between checks that the busy worker processes are still alive
 
-    _queue: 'Queue[Block]' = field(init=False, default_factory=Queue)
+    _queues: List[Deque[Block]] = field(init=False)
     _workers: List[Worker] = field(init=False)
+    _rungs: Dict[int, List[Tuple[int, List[Evaluation]]]] = field(init=False, default_factory=dict)
+    best_evaluations: Dict[int, Evaluation] = field(init=False, default_factory=dict)  # best evaluation per bracket
 
     def __post_init__(self) -> None:
+        if self.n_workers < 1:
+            raise ValueError(f"n_workers must be a positive integer, instead {self.n_workers} was supplied")
+        self._queues = [deque() for _ in range(self.n_workers)]
         self._workers = [Worker(self.eta, self.optimisation_func, self.sampler, self.min_or_max,
                          self.is_simulation, self.scheduler) for _ in range(self.n_workers)]
 
-    def run_optimisation(self, problem: HyperparameterOptimisationProblem) -> None:
-        R = self.max_iter  # maximum amount of resource that can be allocated to a single hyperparameter configuration
-        eta = self.eta  # halving rate
-
-        def log_eta(x: int) -> int:
-            return int(mpmath.log(x) / mpmath.log(eta))
-
-        s_max = log_eta(R)  # number of unique executions of Successive Halving (minus one)
-        s_min = 2 if s_max >= 2 else 0  # skip the rest of the brackets after s_min
-        B = (s_max + 1) * R  # total/max resources (without reuse) per execution of Successive Halving
-
-        for s in reversed(range(s_min, s_max + 1)):
-            n = int(mpmath.ceil(int(B / R / (s + 1)) * eta ** s))  # initial number of evaluators/configurations/arms
-            r = R * eta ** (-s)  # initial resources allocated to each evaluator/arm
-            self._queue.put(Block(bracket=s, i=1, max_i=s+1, n_i=n, r_i=r))  # initial blocks
-
-        worker = self._workers[0]
-        while not self._queue.empty():
-            block = self._queue.get()
-            new_block = worker.consume_block(block, problem)
-            if new_block.i <= new_block.max_i:
-                self._queue.put(new_block)
-            else:
-                best_in_bracket = self.min_or_max(block.evaluations, key=self._get_optimisation_func_val)
-                print(f'Finished bracket {block.bracket}:\n{block}\n',
-                      best_in_bracket.evaluator.arm, best_in_bracket.optimisation_goals)
+    def run_optimisation(self, problem: HyperparameterOptimisationProblem) -> Evaluation:
+        """
+        :param problem: optimisation problem (the problem, its evaluators and optimisation_func must be picklable)
+        :return: best evaluation of all brackets
+        """
+        for j, bracket in enumerate(HyperbandSchedule(self.max_iter, self.eta)):  # initial blocks
+            block = Block(bracket=bracket.s, i=1, max_i=bracket.s+1, n_i=bracket.n, r_i=bracket.r)
+            self._queues[j % self.n_workers].extend(self._split(block))
+
+        context = multiprocessing.get_context()
+        results = context.Queue()
+        blocks = [context.Queue() for _ in self._workers]
+        seeds = np.random.SeedSequence(get_root_seed(self.seed)).generate_state(self.n_workers)
+        processes = [context.Process(target=_run_worker, daemon=True,
+                                     args=(worker_id, worker, problem, int(seed), blocks[worker_id], results))
+                     for worker_id, (worker, seed) in enumerate(zip(self._workers, seeds))]
+        for process in processes:
+            process.start()
+
+        idle_workers: List[int] = list(range(self.n_workers))
+        busy_workers: Dict[int, Block] = {}  # block each busy worker is consuming
+        try:
+            while True:
+                for worker_id in list(idle_workers):
+                    block = self._get_next_block(worker_id)
+                    if block is not None:
+                        blocks[worker_id].put(block)
+                        idle_workers.remove(worker_id)
+                        busy_workers[worker_id] = block
+                if not busy_workers:
+                    break
+                try:
+                    worker_id, block, evaluations = results.get(timeout=self.poll_interval)
+                except Empty:
+                    self._requeue_lost_blocks(processes, busy_workers, idle_workers)
+                    continue
+                if busy_workers.pop(worker_id, None) is None:  # late result of a block that was queued again
+                    continue
+                idle_workers.append(worker_id)
+                if isinstance(evaluations, Exception):
+                    raise evaluations
+                self._collect(worker_id, block, evaluations)
+        finally:
+            for worker_blocks in blocks:
+                worker_blocks.put(None)
+            for process in processes:
+                process.join(timeout=None if not busy_workers else 1)
+                if process.is_alive():
+                    process.terminate()
+
+        return self.min_or_max(self.best_evaluations.values(), key=self._get_optimisation_func_val)
+
+    def _requeue_lost_blocks(self, processes: List[multiprocessing.Process], busy_workers: Dict[int, Block],
+                             idle_workers: List[int]) -> None:
+        """Queues the blocks of the busy workers whose processes died again, at the front of their queues (so that other
+        workers steal them), and drops these workers.
+
+        :param processes: worker processes
+        :param busy_workers: block each busy worker is consuming (dead workers are removed)
+        :param idle_workers: workers waiting for a block (must not include dead workers)
+        :raises RuntimeError: if no worker process is alive anymore
+        """
+        for worker_id, block in list(busy_workers.items()):
+            if not processes[worker_id].is_alive():
+                del busy_workers[worker_id]
+                self._queues[worker_id].appendleft(block)
+                print(f"{COL}Worker {worker_id} died (exit code {processes[worker_id].exitcode}), "
+                      f"queued again: {block}{END}")
+        if not busy_workers and not idle_workers:
+            raise RuntimeError(f"All {len(processes)} worker processes died")
+
+    def _split(self, block: Block) -> List[Block]:
+        """
+        :param block: block of a whole rung
+        :return: parts of the block, each with at most max_block_size arms (by default ceil(n_i / n_workers) arms)
+        """
+        if self.max_block_size is None:
+            n_parts = 1
+        else:
+            max_block_size = self.max_block_size or -(-block.n_i // self.n_workers)
+            n_parts = max(1, -(-block.n_i // max(max_block_size, 1)))
+        sizes = [block.n_i // n_parts + (part < block.n_i % n_parts) for part in range(n_parts)]
+        starts = np.cumsum([0] + sizes).tolist()
+        return [replace(block, n_i=size, part=part, n_parts=n_parts, evaluations=None if block.evaluations is None
+                        else block.evaluations[starts[part]:starts[part] + size])
+                for part, size in enumerate(sizes)]
+
+    def _get_next_block(self, worker_id: int) -> Optional[Block]:
+        """
+        :param worker_id: idle worker
+        :return: oldest block of the worker's queue, else newest block of the longest pending queue (None if all empty)
+        """
+        if self._queues[worker_id]:
+            return self._queues[worker_id].popleft()
+        longest_queue = max(self._queues, key=len)
+        return longest_queue.pop() if longest_queue else None
+
+    def _collect(self, worker_id: int, block: Block, evaluations: List[Evaluation]) -> None:
+        """Halves a rung once all of its parts have been evaluated, then queues its successor on the worker's queue.
+
+        :param worker_id: worker that consumed the block
+        :param block: consumed block
+        :param evaluations: evaluations of the arms of the block
+        """
+        parts = self._rungs.setdefault(block.bracket, [])
+        parts.append((block.part, evaluations))
+        if len(parts) < block.n_parts:
+            return
+        del self._rungs[block.bracket]
+        evaluations = [evaluation for _, part_evaluations in sorted(parts, key=lambda p: p[0])
+                       for evaluation in part_evaluations]
+
+        n_keep = sum(len(part_evaluations) for _, part_evaluations in parts) // self.eta
+        ranked_evaluations = self._get_best_n_evaluations(max(n_keep, 1), evaluations)
+        best_in_rung, best_in_bracket = ranked_evaluations[0], self.best_evaluations.get(block.bracket)
+        if best_in_bracket is None or \
+                self.min_or_max([best_in_bracket, best_in_rung], key=self._get_optimisation_func_val) is best_in_rung:
+            self.best_evaluations[block.bracket] = best_in_rung
+
+        if block.i < block.max_i and n_keep > 0:
+            successor = Block(bracket=block.bracket, i=block.i+1, max_i=block.max_i, n_i=n_keep, r_i=block.r_i*self.eta,
+                              evaluations=ranked_evaluations[:n_keep])
+            self._queues[worker_id].extend(self._split(successor))
+        else:
+            best_in_bracket = self.best_evaluations[block.bracket]
+            print(f'Finished bracket {block.bracket}:\n{block}\n',
+                  best_in_bracket.evaluator.arm, best_in_bracket.optimisation_goals)
+
+    def _get_best_n_evaluations(self, n: int, evaluations: List[Evaluation]) -> List[Evaluation]:
+        """
+        :param n: number of top "best evaluations" to retrieve
+        :param evaluations: evaluations of a rung
+        :return: best n evaluations, best first (see get_best_n_indices)
+        """
+        values = np.array([self._get_optimisation_func_val(evaluation) for evaluation in evaluations], dtype=float)
+        return [evaluations[i] for i in get_best_n_indices(values, n, self.min_or_max)]
 
     def _get_optimisation_func_val(self, evaluation: Evaluation) -> float:
         return self.optimisation_func(evaluation.optimisation_goals)
@@ -0,0 +1,114 @@
+"""HTTP protocol between a Master (master_server.py) and its workers (worker_server.py), which pull work from it:
+
+- POST /register:  {}                                        -> Registration (worker id, Worker, problem, ...)
+- POST /lease:     {'worker_id': int, 'max_blocks': int}     -> LeaseReply (blocks leased to the worker or is_done)
+- POST /results:   {'worker_id': int, 'results': [BlockResult]} -> whether the optimisation is done (sent as soon as
+                   every block is consumed)
+- POST /heartbeat: {'worker_id': int, 'lease_ids': [int]}    (extends the leases, expired leases are given to others)
+- GET  /status:    JSON summary of the optimisation
+
+Bodies of POST requests and replies are objects serialized with dill (so that problems and optimisation functions
+defined on the fly can be sent as well) and compressed with zlib. Since unpickling runs arbitrary code, every body is
+prefixed with an HMAC-SHA256 of a secret shared by the master and its workers (by default the AUTOTUNE_SECRET
+environment variable), which is checked before anything is unpickled: requests and replies of parties that do not
+know the secret are rejected. Bodies are not encrypted, so masters and workers should still only be exposed to
+trusted networks.
+"""
+import hashlib
+import hmac
+import os
+import zlib
+from typing import Any, List, NamedTuple, Optional
+from urllib.request import Request, urlopen
+
+import dill
+
+from autotune.core import Evaluation, HyperparameterOptimisationProblem
+from autotune.optimisers.parallel.block import Block
+from autotune.optimisers.parallel.master_worker_block import Worker
+
+CONTENT_TYPE = 'application/octet-stream'
+COMPRESSION_LEVEL = 1  # evaluations are mostly floats, higher levels are slower for little gain
+TIMEOUT = 60           # seconds to wait for a reply
+SECRET_ENV_VAR = 'AUTOTUNE_SECRET'  # environment variable of the secret shared by a master and its workers
+DIGEST_SIZE = hashlib.sha256().digest_size
+
+
+class Registration(NamedTuple):
+    """Reply to /register: everything a worker needs to consume blocks."""
+    worker_id: int
+    worker: Worker
+    problem: HyperparameterOptimisationProblem
+    heartbeat_interval: float
+    seed: int
+
+
+class Lease(NamedTuple):
+    lease_id: int
+    block: Block
+
+
+class LeaseReply(NamedTuple):
+    """Reply to /lease: several blocks are leased at once if they are small (see HttpMaster.max_batch_cost)."""
+    leases: List[Lease]
+    is_done: bool  # whether the optimisation has finished, then workers stop
+
+
+class BlockResult(NamedTuple):
+    lease_id: int
+    evaluations: Optional[List[Evaluation]]  # evaluations of the arms of the block, None if the worker failed
+    error: Optional[str] = None
+
+
+def get_secret(secret: Optional[str] = None) -> str:
+    """
+    :param secret: secret shared by a master and its workers, by default the value of the AUTOTUNE_SECRET variable
+    :return: secret
+    """
+    secret = secret if secret is not None else os.environ.get(SECRET_ENV_VAR)
+    if not secret:
+        raise ValueError(f"A secret shared by the master and its workers must be supplied, eg. in the {SECRET_ENV_VAR} "
+                         f"environment variable")
+    return secret
+
+
+def _get_digest(payload: bytes, secret: str) -> bytes:
+    return hmac.new(secret.encode(), payload, hashlib.sha256).digest()
+
+
+def encode(obj: Any, secret: str) -> bytes:
+    """
+    :param obj: message
+    :param secret: secret shared by a master and its workers
+    :return: compact binary encoding of the message, prefixed with its digest
+    """
+    payload = zlib.compress(dill.dumps(obj, protocol=dill.HIGHEST_PROTOCOL), COMPRESSION_LEVEL)
+    return _get_digest(payload, secret) + payload
+
+
+def decode(data: bytes, secret: str) -> Any:
+    """
+    :param data: binary encoding of a message (see encode)
+    :param secret: secret shared by a master and its workers
+    :return: message
+    :raises ValueError: if the message was not encoded with the same secret (it is not unpickled then)
+    """
+    digest, payload = data[:DIGEST_SIZE], data[DIGEST_SIZE:]
+    if not hmac.compare_digest(digest, _get_digest(payload, secret)):
+        raise ValueError("The message was not encoded with the shared secret")
+    return dill.loads(zlib.decompress(payload))
+
+
+def post(url: str, route: str, message: Any, secret: str, timeout: float = TIMEOUT) -> Any:
+    """
+    :param url: url of the server (eg. http://127.0.0.1:5000)
+    :param route: route of the request (eg. lease)
+    :param message: body of the request
+    :param secret: secret shared by a master and its workers
+    :param timeout: seconds to wait for the reply
+    :return: decoded reply
+    """
+    request = Request(f"{url.rstrip('/')}/{route}", data=encode(message, secret),
+                      headers={'Content-Type': CONTENT_TYPE})
+    with urlopen(request, timeout=timeout) as reply:
+        return decode(reply.read(), secret)
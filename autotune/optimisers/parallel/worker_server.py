@@ -1,71 +1,168 @@
-from dataclasses import dataclass
-from typing import Callable, List, Optional, Type, Union
+import argparse
+import random
+import threading
+import traceback
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Set
 
-import dill
+import numpy as np
 from colorama import Fore, Style
-from flask import Flask
+from flask import Flask, Response, abort, jsonify, request
 
-from autotune.core import Evaluation, HyperparameterOptimisationProblem, OptimisationGoals, ShapeFamilyScheduler
-from autotune.optimisers import RandomOptimiser, SigOptimiser, TpeOptimiser
-from autotune.optimisers.parallel.block import Block
+from autotune.optimisers.parallel.protocol import (
+    CONTENT_TYPE, BlockResult, LeaseReply, Registration, decode, encode, get_secret, post)
 
 COL = Fore.MAGENTA
 END = Style.RESET_ALL
+MAX_BLOCKS = 8  # maximum number of (small) blocks leased at once
 
 
-@dataclass
-class Worker:
-    eta: int
-    optimisation_func: Callable[[OptimisationGoals], float]
-    sampler: Type[Union[TpeOptimiser, SigOptimiser, RandomOptimiser]]
-    min_or_max: Callable = min
-    is_simulation: bool = False
-    scheduler: Optional[ShapeFamilyScheduler] = None
+class WorkerClient:
+    """Worker side of the protocol (see protocol.py): registers with a master, then leases blocks, consumes them with
+    the Worker it got from the master and sends every result back as soon as it is ready, until the optimisation is
+    done. Heartbeats renew the leases of the blocks being consumed."""
 
-    def _get_optimisation_func_val(self, evaluation: Evaluation) -> float:
-        return self.optimisation_func(evaluation.optimisation_goals)
+    def __init__(self, master_url: str, max_blocks: int = MAX_BLOCKS, poll_interval: float = 0.5,
+                 secret: Optional[str] = None):
+        """
+        :param master_url: url of the master (eg. http://127.0.0.1:5000)
+        :param max_blocks: maximum number of (small) blocks leased at once
+        :param poll_interval: seconds to wait before asking again when there is no block to lease
+        :param secret: secret shared with the master, by default AUTOTUNE_SECRET (see protocol.get_secret)
+        """
+        self.master_url = master_url
+        self.secret = get_secret(secret)
+        self.max_blocks = max_blocks
+        self.poll_interval = poll_interval
+        self.worker_id: Optional[int] = None
+        self.n_consumed_blocks = 0
+        self._stop = threading.Event()
+
+    def run(self) -> None:
+        """Works for the master until the optimisation is done (or until stop is called)."""
+        registration: Registration = post(self.master_url, 'register', {}, self.secret)
+        self.worker_id = registration.worker_id
+        worker, problem = registration.worker, registration.problem
+        random.seed(registration.seed)
+        np.random.seed(registration.seed)
+        print(f"{COL}Registered as worker {self.worker_id} of {self.master_url}{END}")
 
-    def _get_best_n_evaluations(self, n: int, evaluations: List[Evaluation]) -> List[Evaluation]:
-        """Note that for minimization we sort in ascending order while for maximization we sort in descending order by
-        the value of the optimisation_func applied on evaluations.
+        is_done = False
+        while not is_done and not self._stop.is_set():
+            try:
+                reply: LeaseReply = post(self.master_url, 'lease', {'worker_id': self.worker_id,
+                                                                    'max_blocks': self.max_blocks}, self.secret)
+            except OSError as error:  # the master stops serving once the optimisation is done
+                print(f"{COL}Master {self.master_url} is unreachable ({error}){END}")
+                break
+            if not reply.leases:
+                is_done = reply.is_done or self._stop.wait(self.poll_interval)
+                continue
+            lease_ids = {lease.lease_id for lease in reply.leases}
+            with self._heartbeats(lease_ids, registration.heartbeat_interval):
+                for lease in reply.leases:
+                    try:
+                        result = BlockResult(lease.lease_id, worker.consume_block(lease.block, problem))
+                    except Exception:  # pylint: disable=broad-except  # reported to the master
+                        result = BlockResult(lease.lease_id, None, traceback.format_exc())
+                    try:
+                        is_done = post(self.master_url, 'results', {'worker_id': self.worker_id, 'results': [result]},
+                                       self.secret)
+                    except OSError as error:  # the leases expire, so that the master gives the blocks to others
+                        print(f"{COL}Master {self.master_url} is unreachable ({error}){END}")
+                        is_done = True
+                        break
+                    lease_ids.discard(lease.lease_id)
+                    self.n_consumed_blocks += 1
+        print(f"{COL}Worker {self.worker_id} finished after consuming {self.n_consumed_blocks} blocks{END}")
 
-        :param n: number of top "best evaluators" to retrieve
-        :param evaluations: A list of ordered pairs (evaluator, result of evaluator's evaluate() method)
-        :return: best n evaluators (those evaluators that gave the best n values on self.optimisation_goal)
+    @contextmanager
+    def _heartbeats(self, lease_ids: Set[int], interval: float) -> Iterator[None]:
         """
-        is_descending = self.min_or_max == max
-        sorted_evaluations_by_res = sorted(evaluations, key=self._get_optimisation_func_val, reverse=is_descending)
-        return sorted_evaluations_by_res[:n]
-
-    def consume_block(self, block: Block, problem: HyperparameterOptimisationProblem) -> Block:
-        if block.evaluations is None:
-            optimiser = self.sampler(
-                n_resources=block.r_i, max_iter=block.n_i, optimisation_func=self.optimisation_func,
-                min_or_max=self.min_or_max, is_simulation=self.is_simulation, scheduler=self.scheduler
-            )
-            optimiser.run_optimisation(problem, verbosity=True)
-            evaluations = optimiser.eval_history
-        else:
-            evaluations = [Evaluation(e.evaluator, e.evaluator.evaluate(n_resources=block.r_i))
-                           for e in block.evaluations]
-        print(f"{COL}** {'Generated' if block.evaluations is None else 'Evaluated'}: {block} {END}")
-        return Block(
-            bracket=block.bracket,
-            i=block.i+1,
-            max_i=block.max_i,
-            n_i=int(block.n_i/self.eta),  # is this okay?
-            r_i=block.r_i*self.eta,
-            evaluations=self._get_best_n_evaluations(int(block.n_i / self.eta), evaluations)
-        )
-
-
-WORKER: Worker
-
-
-app = Flask(__name__)
-
-
-@app.route('/init')
-def init() -> None:
-    global WORKER
-    WORKER = dill.load()
+        :param lease_ids: leases being consumed (shrinks as their results are sent)
+        :param interval: seconds between heartbeats
+        """
+        finished = threading.Event()
+
+        def send_heartbeats() -> None:
+            while not finished.wait(interval):
+                try:
+                    post(self.master_url, 'heartbeat', {'worker_id': self.worker_id, 'lease_ids': list(lease_ids)},
+                         self.secret)
+                except OSError:  # leases expire, so that the master gives the blocks to other workers
+                    pass
+
+        thread = threading.Thread(target=send_heartbeats, daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            finished.set()
+            thread.join()
+
+    def stop(self) -> None:
+        """Stops leasing blocks (the blocks already leased are consumed)."""
+        self._stop.set()
+
+    def get_status(self) -> Dict[str, Any]:
+        return {'master_url': self.master_url, 'worker_id': self.worker_id,
+                'n_consumed_blocks': self.n_consumed_blocks}
+
+
+def create_worker_app(secret: Optional[str] = None) -> Flask:
+    """
+    :param secret: secret shared with the masters, by default AUTOTUNE_SECRET (see protocol.get_secret), control
+                   requests which were not encoded with it are rejected (403)
+    :return: Flask app which controls the WorkerClients of this process: POST /start {'master_url': str, 'max_blocks':
+             int} starts one (in a background thread, with the secret of the app), GET /status describes them, POST
+             /stop {} stops them (bodies of POST requests and replies are encoded as in protocol.py)
+    """
+    secret = get_secret(secret)
+    app = Flask(__name__)
+    clients: List[WorkerClient] = []
+
+    def receive() -> Dict[str, Any]:
+        try:
+            return decode(request.get_data(), secret)
+        except ValueError:
+            abort(403)
+
+    def reply(message: Any) -> Response:
+        return Response(encode(message, secret), mimetype=CONTENT_TYPE)
+
+    @app.route('/start', methods=['POST'])
+    def start() -> Response:
+        message = receive()
+        client = WorkerClient(message['master_url'], message['max_blocks'], secret=secret)
+        threading.Thread(target=client.run, daemon=True).start()
+        clients.append(client)
+        return reply(client.get_status())
+
+    @app.route('/status')
+    def status() -> Response:
+        return jsonify([client.get_status() for client in clients])
+
+    @app.route('/stop', methods=['POST'])
+    def stop() -> Response:
+        receive()
+        for client in clients:
+            client.stop()
+        return reply([client.get_status() for client in clients])
+
+    return app
+
+
+def _get_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Worker server of Hyperband (see master_server.py), the secret '
+                                                 'shared with the master is read from AUTOTUNE_SECRET')
+    parser.add_argument('-host', default='127.0.0.1', help='host to listen on')
+    parser.add_argument('-port', type=int, default=5001, help='port to listen on')
+    parser.add_argument('-master', '--master-url', default=None, help='if given, start working for this master')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    arguments = _get_args()
+    if arguments.master_url is not None:
+        threading.Thread(target=WorkerClient(arguments.master_url).run, daemon=True).start()
+    create_worker_app().run(host=arguments.host, port=arguments.port, threaded=True)
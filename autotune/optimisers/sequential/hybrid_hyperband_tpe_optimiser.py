@@ -1,20 +1,16 @@
-from math import ceil
 from typing import Callable, Optional
 
-import mpmath
 from colorama import Fore, Style
 
 from autotune.core import (
-    Evaluation, HyperparameterOptimisationProblem, OptimisationGoals, Optimiser, ShapeFamilyScheduler,
-    optimisation_metric_user)
+    Evaluation, EvaluationExecutor, HyperparameterOptimisationProblem, OptimisationGoals, Optimiser,
+    ShapeFamilyScheduler, optimisation_metric_user)
 from autotune.optimisers.sequential.hyperband_optimiser import HyperbandOptimiser
 from autotune.optimisers.sequential.tpe_optimiser import TpeOptimiser
 
 COL = Fore.MAGENTA
 END = Style.RESET_ALL
 
-mpmath.mp.dps = 64
-
 
 class HybridHyperbandTpeOptimiser(HyperbandOptimiser):
 
@@ -23,7 +19,7 @@ class HybridHyperbandTpeOptimiser(HyperbandOptimiser):
     def __init__(self, eta: int, max_iter: int = None, max_time: int = None, min_or_max: Callable = min,
                  optimisation_func: Callable[[OptimisationGoals], float] = Optimiser.default_optimisation_func,
                  is_simulation: bool = False, scheduler: Optional[ShapeFamilyScheduler] = None,
-                 plot_simulation: bool = False):
+                 plot_simulation: bool = False, executor: Optional[EvaluationExecutor] = None):
         """
         :param eta: halving rate
         :param max_iter: max iteration (considered infinity if None) - stopping condition
@@ -34,9 +30,10 @@ class HybridHyperbandTpeOptimiser(HyperbandOptimiser):
         :param is_simulation: flag if the problem under optimisation is a real machine learning problem or a simulation
         :param scheduler: if the problem is a simulation, the scheduler provides the parameters for families of shapes
         :param plot_simulation: each simulated loss function will be added to plt.plot, use plt.show() to see results
+        :param executor: evaluates the arms of a rung (eg. concurrently), by default one after another
         """
         super().__init__(eta, max_iter, max_time, min_or_max, optimisation_func, is_simulation, scheduler,
-                         plot_simulation)
+                         plot_simulation, executor)
 
     @optimisation_metric_user
     def run_optimisation(self, problem: HyperparameterOptimisationProblem, verbosity: bool = False) -> Evaluation:
@@ -45,26 +42,17 @@ class HybridHyperbandTpeOptimiser(HyperbandOptimiser):
         :param verbosity: whether to print the results of every single evaluation/iteration
         :return: Evaluation of best arm (evaluator, optimisation_goals)
         """
-        R = self.max_iter  # maximum amount of resource that can be allocated to a single hyperparameter configuration
-        eta = self.eta     # halving rate
-
-        def log_eta(x: int) -> int: return int(mpmath.log(x)/mpmath.log(eta))
-        s_max = log_eta(R)              # number of unique executions of Successive Halving (minus one)
-        s_min = 2 if s_max >= 2 else 0  # skip the rest of the brackets after s_min
-        B = (s_max + 1) * R             # total/max resources (without reuse) per execution of Successive Halving
-
         # Exploration-exploitation trade-off management outer loop
-        for s in reversed(range(s_min, s_max + 1)):
-            n = int(ceil(int(B/R/(s+1))*eta**s))  # initial number of evaluators/configurations/arms
-            r = R*eta**(-s)                       # initial resources allocated to each evaluator/arm
+        for bracket in self.schedule:
+            n = bracket.n  # initial number of evaluators/configurations/arms
 
             # Successive halving with rate eta - based on values of self.optimisation_func(opt goals of each evaluation)
             evaluators = []
-            for i in range(s+1):
-                n_i = n*eta**(-i)  # evaluate n_i evaluators/configurations/arms
-                r_i = r*eta**i     # each with r_i resources
+            for rung in bracket.rungs:
+                n_i = rung.n_i        # evaluate n_i evaluators/configurations/arms
+                r_i = rung.resources  # each with r_i resources
 
-                if i == 0:  # Generate first n_i arms/evaluators with TPE
+                if rung.i == 0:  # Generate first n_i arms/evaluators with TPE
                     tpe_optimiser = TpeOptimiser(n_resources=r_i, max_iter=n_i,
                                                  optimisation_func=self.optimisation_func, min_or_max=self.min_or_max,
                                                  is_simulation=self.is_simulation, scheduler=self.scheduler,
@@ -78,12 +66,11 @@ class HybridHyperbandTpeOptimiser(HyperbandOptimiser):
                           f"--- Starting halving ---{END}")
 
                 else:        # Continue with halving as in Hyperband
-                    evaluations = [Evaluation(evaluator, evaluator.evaluate(n_resources=r_i))
-                                   for evaluator in evaluators]
-                    print(f"{COL}** Evaluated {int(n_i)} arms, each with {r_i:.2f} resources {END}")
+                    evaluations = self._evaluate_batch(problem, evaluators, n_resources=r_i)
+                    print(f"{COL}** Evaluated {n_i} arms, each with {r_i:.2f} resources {END}")
 
                 # Halving: keep best 1/eta of them, which will be allocated more resources/iterations
-                evaluators = self._get_best_n_evaluators(n=int(n_i/eta), evaluations=evaluations)
+                evaluators = self._get_best_n_evaluators(n=rung.n_keep, evaluations=evaluations)
 
                 best_evaluation_in_round = self.min_or_max(evaluations, key=self._get_optimisation_func_val)
                 self._update_evaluation_history(*best_evaluation_in_round)
@@ -1,17 +1,14 @@
-from math import ceil
 from typing import Callable, List, Optional
 
-import mpmath
 from colorama import Fore, Style
 
 from autotune.core import (
-    Evaluation, Evaluator, HyperparameterOptimisationProblem, OptimisationGoals, Optimiser, ShapeFamilyScheduler,
-    SimulationProblem, optimisation_metric_user)
+    Evaluation, EvaluationExecutor, Evaluator, HyperparameterOptimisationProblem, OptimisationGoals, Optimiser,
+    ShapeFamilyScheduler, SimulationProblem, optimisation_metric_user)
+from autotune.optimisers.hyperband_schedule import HyperbandSchedule
 
 COL = Fore.MAGENTA
 
-mpmath.mp.dps = 64
-
 
 class HyperbandOptimiser(Optimiser):
     """Examples of resources:
@@ -23,7 +20,7 @@ class HyperbandOptimiser(Optimiser):
     def __init__(self, eta: int, max_iter: int = None, max_time: int = None, min_or_max: Callable = min,
                  optimisation_func: Callable[[OptimisationGoals], float] = Optimiser.default_optimisation_func,
                  is_simulation: bool = False, scheduler: Optional[ShapeFamilyScheduler] = None,
-                 plot_simulation: bool = False):
+                 plot_simulation: bool = False, executor: Optional[EvaluationExecutor] = None):
         """
         :param eta: halving rate
         :param max_iter: max iteration (considered infinity if None) - stopping condition
@@ -34,27 +31,27 @@ class HyperbandOptimiser(Optimiser):
         :param is_simulation: flag if the problem under optimisation is a real machine learning problem or a simulation
         :param scheduler: if the problem is a simulation, the scheduler provides the parameters for families of shapes
         :param plot_simulation: each simulated loss function will be added to plt.plot, use plt.show() to see results
+        :param executor: evaluates the arms of a rung (eg. concurrently), by default one after another
         """
-        super().__init__(max_iter, max_time, min_or_max, optimisation_func, is_simulation, scheduler, plot_simulation)
+        super().__init__(max_iter, max_time, min_or_max, optimisation_func, is_simulation, scheduler, plot_simulation,
+                         executor)
         if max_iter is None:
             raise ValueError("For Hyperband max_iter cannot be None")
         self.eta = eta
+        self.schedule = HyperbandSchedule(max_iter, eta)  # brackets of Successive Halving
 
     def _get_optimisation_func_val(self, evaluation: Evaluation) -> float:
         return self.optimisation_func(evaluation.optimisation_goals)
 
     def _get_best_n_evaluators(self, n: int, evaluations: List[Evaluation]) -> List[Evaluator]:
-        """Note that for minimization we sort in ascending order while for maximization we sort in descending order by
-        the value of the optimisation_func applied on evaluations.
+        """Note that for minimization the best evaluators are those with the smallest values of the optimisation_func
+        while for maximization they are those with the greatest values (see _get_best_n_evaluations).
 
         :param n: number of top "best evaluators" to retrieve
         :param evaluations: A list of ordered pairs (evaluator, result of evaluator's evaluate() method)
         :return: best n evaluators (those evaluators that gave the best n values on self.optimisation_goal)
         """
-        is_descending = self.min_or_max == max
-        sorted_evaluations_by_res = sorted(evaluations, key=self._get_optimisation_func_val, reverse=is_descending)
-        sorted_evaluators = [evaluation.evaluator for evaluation in sorted_evaluations_by_res]
-        return sorted_evaluators[:n]
+        return [evaluation.evaluator for evaluation in self._get_best_n_evaluations(n, evaluations)]
 
     @optimisation_metric_user
     def run_optimisation(self, problem: HyperparameterOptimisationProblem, verbosity: bool = False) -> Evaluation:
@@ -63,21 +60,12 @@ class HyperbandOptimiser(Optimiser):
         :param verbosity: whether to print the results of every single evaluation/iteration
         :return: Evaluation of best arm (evaluator, optimisation_goals)
         """
-        R = self.max_iter  # maximum amount of resource that can be allocated to a single hyperparameter configuration
-        eta = self.eta     # halving rate
-
-        def log_eta(x: int) -> int: return int(mpmath.log(x)/mpmath.log(eta))
-        s_max = log_eta(R)              # number of unique executions of Successive Halving (minus one)
-        s_min = 2 if s_max >= 2 else 0  # skip the rest of the brackets after s_min
-        B = (s_max + 1) * R             # total/max resources (without reuse) per execution of Successive Halving
-
         # Exploration-exploitation trade-off management outer loop
-        for s in reversed(range(s_min, s_max + 1)):
-            n = int(ceil(int(B/R/(s+1))*eta**s))  # initial number of evaluators/configurations/arms
-            r = R*eta**(-s)                       # initial resources allocated to each evaluator/arm
+        for bracket in self.schedule:
+            n = bracket.n  # initial number of evaluators/configurations/arms
 
             if not self.is_simulation:
-                evaluators = [problem.get_evaluator() for _ in range(n)]
+                evaluators = self._get_random_evaluators(problem, n)
             else:  # is simulation
                 problem: SimulationProblem
                 evaluators = [problem.get_evaluator(*self.scheduler.get_family() if self.scheduler else (),
@@ -87,17 +75,18 @@ class HyperbandOptimiser(Optimiser):
             print(f"{COL}\n{'=' * 73}\n>> Generated {n} evaluators each with a random arm {Style.RESET_ALL}")
 
             # Successive halving with rate eta - based on values of self.optimisation_func(opt goals of each evaluation)
-            for i in range(s+1):
-                n_i = n*eta**(-i)  # evaluate n_i evaluators/configurations/arms
-                r_i = r*eta**i     # each with r_i resources
-                evaluations = [Evaluation(evaluator, evaluator.evaluate(n_resources=r_i)) for evaluator in evaluators]
-                print(f"{COL}** Evaluated {int(n_i)} arms, each with {r_i:.2f} resources {Style.RESET_ALL}")
+            for rung in bracket.rungs:
+                n_i = rung.n_i        # evaluate n_i evaluators/configurations/arms
+                r_i = rung.resources  # each with r_i resources
+                evaluations = self._evaluate_batch(problem, evaluators, n_resources=r_i)
+                print(f"{COL}** Evaluated {n_i} arms, each with {r_i:.2f} resources {Style.RESET_ALL}")
 
                 # Halving: keep best 1/eta of them, which will be allocated more resources/iterations
-                evaluators = self._get_best_n_evaluators(n=int(n_i/eta), evaluations=evaluations)
+                ranked_evaluations = self._get_best_n_evaluations(max(rung.n_keep, 1), evaluations)
+                evaluators = [evaluation.evaluator for evaluation in ranked_evaluations[:rung.n_keep]]
 
-                best_evaluation_in_round = self.min_or_max(evaluations, key=self._get_optimisation_func_val)
-                self._update_evaluation_history(*best_evaluation_in_round)
+                best_evaluation_in_round = ranked_evaluations[0]
+                self._update_evaluation_history(*best_evaluation_in_round, n_resources=r_i)
 
                 self._update_optimiser_metrics()
                 if verbosity:
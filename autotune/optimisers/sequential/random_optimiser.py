@@ -1,8 +1,10 @@
 from typing import Callable, Optional
 
 from autotune.core import (
-    Evaluation, HyperparameterOptimisationProblem, OptimisationGoals, Optimiser, ShapeFamilyScheduler,
-    SimulationProblem, optimisation_metric_user)
+    Evaluation, EvaluationExecutor, HyperparameterOptimisationProblem, OptimisationGoals, Optimiser,
+    ShapeFamilyScheduler, SimulationProblem, optimisation_metric_user)
+
+BATCH_SIZE = 1000  # maximum number of arms evaluated at once (if the problem supports batch evaluation)
 
 
 class RandomOptimiser(Optimiser):
@@ -15,7 +17,7 @@ class RandomOptimiser(Optimiser):
     def __init__(self, n_resources: int, max_iter: int = None, max_time: int = None, min_or_max: Callable = min,
                  optimisation_func: Callable[[OptimisationGoals], float] = Optimiser.default_optimisation_func,
                  is_simulation: bool = False, scheduler: Optional[ShapeFamilyScheduler] = None,
-                 plot_simulation: bool = False):
+                 plot_simulation: bool = False, executor: Optional[EvaluationExecutor] = None):
         """
         :param n_resources: number of resources per evaluation (of each arm)
         :param max_iter: max iteration (considered infinity if None) - stopping condition
@@ -26,8 +28,10 @@ class RandomOptimiser(Optimiser):
         :param is_simulation: flag if the problem under optimisation is a real machine learning problem or a simulation
         :param scheduler: if the problem is a simulation, the scheduler provides the parameters for families of shapes
         :param plot_simulation: each simulated loss function will be added to plt.plot, use plt.show() to see results
+        :param executor: evaluates the arms of a batch (eg. concurrently), by default one after another
         """
-        super().__init__(max_iter, max_time, min_or_max, optimisation_func, is_simulation, scheduler, plot_simulation)
+        super().__init__(max_iter, max_time, min_or_max, optimisation_func, is_simulation, scheduler, plot_simulation,
+                         executor)
         self.n_resources = n_resources
 
     @optimisation_metric_user
@@ -37,22 +41,27 @@ class RandomOptimiser(Optimiser):
         :param verbosity: whether to print the results of every single evaluation/iteration
         :return: Evaluation of best arm (evaluator, optimisation_goals)
         """
+        # problems that evaluate batches of arms at once get up to BATCH_SIZE arms per batch (stop conditions are then
+        # checked after each batch, rather than after each arm)
+        is_batched = isinstance(problem, HyperparameterOptimisationProblem) and problem.supports_batch_evaluation
         while not self._needs_to_stop():
-            # Draw random sample
+            batch_size = min(BATCH_SIZE, self.max_iter - self.num_iterations) if is_batched else 1
+            # Draw random samples
             if not self.is_simulation:
-                evaluator = problem.get_evaluator()
+                evaluators = self._get_random_evaluators(problem, int(batch_size))
             else:  # is simulation
                 problem: SimulationProblem
-                evaluator = problem.get_evaluator(*self.scheduler.get_family() if self.scheduler else (),
-                                                  should_plot=self.plot_simulation)
-            opt_goals = evaluator.evaluate(self.n_resources)
-            # Evaluate arm on problem
-            # Update evaluation history: arms tried so far, validation and test errors so far
-            self._update_evaluation_history(evaluator, opt_goals)
-            # Update evaluation metrics: time so far, number of evaluations so far, checkpoint times so far
-            self._update_optimiser_metrics()
-
-            if verbosity:
-                self._print_evaluation(self.optimisation_func(opt_goals))
+                evaluators = [problem.get_evaluator(*self.scheduler.get_family() if self.scheduler else (),
+                                                    should_plot=self.plot_simulation)
+                              for _ in range(int(batch_size))]
+            # Evaluate arms on problem
+            for evaluator, opt_goals in self._evaluate_batch(problem, evaluators, self.n_resources):
+                # Update evaluation history: arms tried so far, validation and test errors so far
+                self._update_evaluation_history(evaluator, opt_goals, n_resources=self.n_resources)
+                # Update evaluation metrics: time so far, number of evaluations so far, checkpoint times so far
+                self._update_optimiser_metrics()
+
+                if verbosity:
+                    self._print_evaluation(self.optimisation_func(opt_goals))
 
         return self._get_best_evaluation()
@@ -54,7 +54,8 @@ class TpeOptimiser(Optimiser):
 
         # Compute statistics
         for t in self.trials.trials[self.n_injected_trials:]:
-            self._update_evaluation_history(t["result"]["evaluator"], t["result"]["optimisation_goals"])
+            self._update_evaluation_history(t["result"]["evaluator"], t["result"]["optimisation_goals"],
+                                            n_resources=self.n_resources, timestamp=t['result']['eval_time'])
             self.checkpoints.append(t['result']['eval_time'] - self.time_zero)
 
         return self._get_best_evaluation()
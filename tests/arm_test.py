@@ -0,0 +1,39 @@
+import pickle
+
+import numpy as np
+
+import autotune.core.arm as arm_module
+from autotune.benchmarks import OptFunctionProblem
+from autotune.core import Arm, Evaluator, OptimisationGoals
+from autotune.optimisers import HybridHyperbandTpeTransferAllOptimiser
+
+
+def test_arm_hash_only_depends_on_hyperparameters() -> None:
+    arm = Arm(x=1, y=np.float64(0.5))
+    same_arm = Arm(y=0.5, x=1.0)
+    assert arm == same_arm and hash(arm) == hash(same_arm) and arm.arm_id == same_arm.arm_id
+    assert pickle.loads(pickle.dumps(arm)).arm_id == arm.arm_id
+    assert arm.__dict__ == {'x': 1, 'y': 0.5}
+
+    arm_id = arm.arm_id
+    arm.x = 2
+    assert arm.arm_id != arm_id and arm != same_arm
+    arm.x = 1
+    assert arm.arm_id == arm_id and arm['x'] == arm.x == 1
+
+
+def test_evaluations_by_resources_lookups_do_not_format(monkeypatch) -> None:  # type: ignore
+    def optimisation_func(opt_goals: OptimisationGoals) -> float:
+        return opt_goals.fval
+
+    optimiser = HybridHyperbandTpeTransferAllOptimiser(eta=3, max_iter=9, optimisation_func=optimisation_func)
+    optimiser.run_optimisation(OptFunctionProblem('branin'), verbosity=False)
+    evaluators = list(optimiser.evaluations_by_resources)
+
+    def fail(*_: object) -> None:
+        raise AssertionError("arms are hashed by formatting them")
+
+    monkeypatch.setattr(Arm, '__str__', fail)
+    monkeypatch.setattr(Evaluator, '__str__', fail)
+    monkeypatch.setattr(arm_module, 'blake2b', fail)  # the digests of the arms are not computed again either
+    assert all(evaluator in optimiser.evaluations_by_resources for evaluator in evaluators)
@@ -0,0 +1,44 @@
+from typing import Dict, List
+
+import numpy as np
+import pytest
+
+from autotune.benchmarks import KnownFnProblem, KnownFnStore, OptFunctionProblem
+from autotune.core import Arm
+from autotune.experiments.known_functions_evaluation import cross_validate_approximation
+from autotune.experiments.known_functions_evaluation.cross_validate_approximation import cross_validate
+
+
+def _cross_validate_by_evaluation(n_folds: int, all_known_fns: Dict[Arm, List[float]],
+                                  real_problem: OptFunctionProblem) -> np.ndarray:
+    arms = list(all_known_fns.keys())
+    fold_size = max(len(arms) // n_folds, 1)
+    min_loss_fn_len = min(len(loss_fn) for loss_fn in all_known_fns.values())
+    loss_fns = np.array([loss_fn[:min_loss_fn_len] for loss_fn in all_known_fns.values()])
+    normalization_factors = loss_fns.max(axis=0) - loss_fns.min(axis=0)
+    res = []
+    for i in range(0, len(arms), fold_size):
+        db_loss_fns = {arm: all_known_fns[arm] for arm in arms[:i] + arms[i + fold_size:]}
+        problem = KnownFnProblem(known_fs=db_loss_fns, real_problem=real_problem)
+        for arm in arms[i: i + fold_size]:
+            actual_loss_fn = problem.get_evaluator(arm=arm).evaluate(n_resources=min_loss_fn_len).fvals
+            res.append(np.abs(np.array(actual_loss_fn[:min_loss_fn_len]) - all_known_fns[arm][:min_loss_fn_len]) /
+                       normalization_factors)
+    return np.array(res)
+
+
+@pytest.mark.parametrize("n_folds", [2, 10, 103, 500])
+def test_cross_validate_matches_evaluation(n_folds: int, monkeypatch) -> None:
+    monkeypatch.setattr(cross_validate_approximation, "CHUNK_SIZE", 1000)  # several chunks
+    np.random.seed(0)
+    problem = OptFunctionProblem('branin')
+    known_fns = {problem.get_evaluator().arm: list(np.random.rand(5 + i % 3)) for i in range(103)}
+    known_fns.update({Arm(x=float(x), y=float(y)): list(np.random.rand(6)) for x in range(-5, 10, 5) for y in (0, 5)})
+
+    expected = _cross_validate_by_evaluation(n_folds, known_fns, problem)
+    res, min_loss_fn_len = cross_validate(n_folds, known_fns, problem)
+    assert min_loss_fn_len == 5
+    np.testing.assert_array_equal(res, expected)
+
+    store_res, _ = cross_validate(n_folds, KnownFnStore.from_known_fs(known_fns), problem)
+    assert store_res.shape == res.shape
@@ -0,0 +1,42 @@
+import numpy as np
+
+from autotune.benchmarks.mnist_problem import HYPERPARAMS_DOMAIN
+from autotune.core import Arm, Domain, DomainCodec, Param
+from autotune.core.params import IntParam
+
+DOMAIN = Domain(
+    learning_rate=Param('learning_rate', np.log(10 ** -6), np.log(10 ** 0), distrib='uniform', scale='log'),
+    momentum=Param('momentum', 0.3, 0.999, distrib='uniform', scale='linear'),
+    batch_size=Param('batch_size', 20, 2000, distrib='uniform', scale='linear', interval=1),
+    n_units=Param('n_units', np.log(8), np.log(512), distrib='uniform', scale='log', interval=4),
+    n_layers=IntParam('n_layers', 1, 5),
+    dropout=Param('dropout', 0.5, 0.1, distrib='normal', scale='linear'),
+)
+
+
+def test_sample_matches_draw_hp_val() -> None:
+    hyperparams_to_opt = tuple(HYPERPARAMS_DOMAIN.hyperparams_names())
+    expected = []
+    np.random.seed(0)
+    for _ in range(100):
+        arm = Arm()
+        arm.draw_hp_val(domain=HYPERPARAMS_DOMAIN, hyperparams_to_opt=hyperparams_to_opt)
+        expected.append(arm)
+
+    np.random.seed(0)
+    arms = HYPERPARAMS_DOMAIN.compile(hyperparams_to_opt).sample(100)
+    for arm, expected_arm in zip(arms, expected):
+        assert arm.batch_size == expected_arm.batch_size and isinstance(arm.batch_size, int)
+        assert np.isclose(arm.learning_rate, expected_arm.learning_rate)
+        assert np.isclose(arm.weight_decay, expected_arm.weight_decay)
+        assert np.isclose(arm.momentum, expected_arm.momentum)
+
+
+def test_decode_encode_round_trip() -> None:
+    codec = DomainCodec(DOMAIN)
+    values = codec.sample_values(1000, np.random.default_rng(0))
+    assert np.all(values[:, codec.is_integer] == np.floor(values[:, codec.is_integer]))
+    assert np.all((1 <= values[:, 4]) & (values[:, 4] <= 5))
+    assert np.all((np.exp(DOMAIN.learning_rate.min_val) <= values[:, 0]) & (values[:, 0] <= 1))
+    assert np.allclose(codec.decode(codec.encode(values)), values)
+    assert codec.from_arms(codec.to_arms(values)).tolist() == values.tolist()
@@ -0,0 +1,32 @@
+import pickle
+
+import numpy as np
+import pytest
+
+from autotune.benchmarks.torch_model_builders import LogisticRegressionBuilder
+from autotune.core import Arm, EvaluationHistory, OptimisationGoals, Optimiser, get_best_n_indices
+from autotune.core.evaluation import Evaluation
+from autotune.util.typing import MinOrMax
+from tests.hyperband_test import HyperbandTestEvaluator
+
+
+@pytest.mark.parametrize('min_or_max', [min, max])
+def test_best_n_indices_match_stable_sort(min_or_max: MinOrMax) -> None:
+    values = np.random.default_rng(0).integers(0, 20, size=500).astype(float)  # many ties
+    expected = sorted(range(len(values)), key=lambda i: values[i], reverse=min_or_max == max)
+    for n in (0, 1, 7, 100, 499, 500, 600):
+        assert get_best_n_indices(values, n, min_or_max).tolist() == expected[:n]
+
+
+def test_evaluation_history_incumbent() -> None:
+    history = EvaluationHistory(Optimiser.default_optimisation_func, min)
+    goals = [OptimisationGoals(validation_error=v, test_error=-1) for v in np.random.default_rng(1).random(3000)]
+    for i, opt_goals in enumerate(goals):
+        evaluator = HyperbandTestEvaluator(LogisticRegressionBuilder(Arm(x=float(i))))
+        history.append(Evaluation(evaluator, opt_goals), n_resources=i)
+        assert history.best_value == min(g.validation_error for g in goals[:i + 1])
+
+    assert len(history) == 3000 and history.resources.tolist() == list(range(3000))
+    assert history.incumbent is min(history, key=lambda e: e.optimisation_goals.validation_error)
+    assert history.top_k(5) == sorted(history, key=lambda e: e.optimisation_goals.validation_error)[:5]
+    assert pickle.loads(pickle.dumps(history)).values.tolist() == history.values.tolist()
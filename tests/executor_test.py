@@ -0,0 +1,59 @@
+from typing import List
+
+import numpy as np
+import pytest
+
+from autotune.benchmarks import OptFunctionSimulationProblem
+from autotune.core import EvaluationExecutor, OptimisationGoals, ProcessExecutor, SerialExecutor, ThreadExecutor
+from autotune.optimisers import HyperbandOptimiser
+
+N_ARMS = 20
+
+
+def optimisation_func(opt_goals: OptimisationGoals) -> float:
+    return opt_goals.fval
+
+
+def _evaluate_rungs(executor: EvaluationExecutor) -> List[List[float]]:
+    problem = OptFunctionSimulationProblem('branin', is_lazy=True, crn=0)
+    evaluators = [problem.get_evaluator(arm) for arm in problem.draw_arms(N_ARMS)]
+    with executor:
+        fvals = [[goals.fval for goals in executor.evaluate(evaluators, n_resources)] for n_resources in (3, 9)]
+    # the state of the evaluators was carried back (their lazy loss functions were simulated up to 9 resources)
+    assert all(len(evaluator.non_smooth_fs) == 9 for evaluator in evaluators)
+    return fvals
+
+
+@pytest.mark.parametrize("executor", [ThreadExecutor(4), ProcessExecutor(2)])
+def test_executors_match_serial_evaluation(executor: EvaluationExecutor) -> None:
+    assert _evaluate_rungs(executor) == _evaluate_rungs(SerialExecutor())
+
+
+def test_hyperband_with_process_executor() -> None:
+    def run(executor: EvaluationExecutor) -> List[float]:
+        optimiser = HyperbandOptimiser(eta=3, max_iter=27, optimisation_func=optimisation_func, executor=executor)
+        optimiser.run_optimisation(OptFunctionSimulationProblem('branin', crn=1), verbosity=False)
+        executor.shutdown()
+        return optimiser.eval_history.values.tolist()
+
+    assert run(ProcessExecutor(2)) == run(SerialExecutor())
+
+
+def test_process_workers_draw_different_values() -> None:
+    problem = OptFunctionSimulationProblem('branin')
+    evaluators = [problem.get_evaluator(init_noise=1) for _ in range(64)]
+    with ProcessExecutor(2, chunks_per_worker=8) as executor:
+        executor.evaluate(evaluators, n_resources=1)
+    noises = [evaluator.f_1 - evaluator.get_function_value() + evaluator.start_shift for evaluator in evaluators]
+    assert len(set(noises)) == len(evaluators)
+
+
+def test_process_workers_are_seeded_from_the_global_seed() -> None:
+    def evaluate() -> List[float]:
+        np.random.seed(0)
+        problem = OptFunctionSimulationProblem('branin')
+        evaluators = [problem.get_evaluator(init_noise=1) for _ in range(8)]
+        with ProcessExecutor(1) as executor:  # a single worker evaluates the evaluators in order
+            return [goals.fval for goals in executor.evaluate(evaluators, n_resources=1)]
+
+    assert evaluate() == evaluate()
@@ -0,0 +1,91 @@
+import threading
+from fractions import Fraction
+from typing import Any
+from urllib.error import HTTPError
+
+import pytest
+
+from autotune.benchmarks import OptFunctionSimulationProblem
+from autotune.optimisers import RandomOptimiser
+from autotune.optimisers.parallel.local_harness import LocalHarness, optimisation_func
+from autotune.optimisers.parallel.master_server import HttpMaster
+from autotune.optimisers.parallel.protocol import decode, encode
+from autotune.optimisers.parallel.worker_server import WorkerClient, create_worker_app
+
+SECRET = 'secret'
+
+
+def _get_master(max_iter: int, **kwargs: Any) -> HttpMaster:
+    kwargs.setdefault('secret', SECRET)
+    return HttpMaster(n_workers=2, eta=3, sampler=RandomOptimiser, max_iter=max_iter,
+                      optimisation_func=optimisation_func, max_block_size=3, **kwargs)
+
+
+def test_small_blocks_are_leased_in_batches_until_they_expire() -> None:
+    master = _get_master(max_iter=9, lease_timeout=0)
+    master.start(OptFunctionSimulationProblem('branin'))
+    try:
+        worker_id = master.register().worker_id
+        leases = master.lease(worker_id, max_blocks=10).leases
+        assert [lease.block.cost for lease in leases] == [3, 3, 3]  # parts of the first rung, up to max_iter resources
+        assert decode(encode(leases, SECRET), SECRET) == leases and leases[0].block.r_i == Fraction(1)
+
+        # leases that were not renewed by a heartbeat expire, their blocks are leased again
+        assert [lease.block for lease in master.lease(worker_id, max_blocks=10).leases] == \
+            [lease.block for lease in leases]
+        assert master.get_status()['n_leased_blocks'] == 3
+    finally:
+        master._server.shutdown()
+
+
+def test_workers_run_all_brackets_over_http() -> None:
+    master = _get_master(max_iter=27)
+    master_url = master.start(OptFunctionSimulationProblem('branin'))
+    clients = [WorkerClient(master_url, poll_interval=0.05, secret=SECRET) for _ in range(2)]
+    threads = [threading.Thread(target=client.run) for client in clients]
+    for thread in threads:
+        thread.start()
+    best = master.wait()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(master.best_evaluations) == [2, 3] and not any(master._queues)
+    assert best.optimisation_goals.fval == min(e.optimisation_goals.fval for e in master.best_evaluations.values())
+    assert sorted(client.worker_id for client in clients) == [0, 1]
+
+
+def test_local_harness() -> None:
+    with LocalHarness(n_workers=1) as harness:
+        master = _get_master(max_iter=9, secret=harness.secret)
+        harness.start_workers(master.start(OptFunctionSimulationProblem('branin')))
+        best = master.wait()
+        assert best.optimisation_goals.fval == master.best_evaluations[2].optimisation_goals.fval
+
+
+def test_messages_of_another_secret_are_rejected() -> None:
+    with pytest.raises(ValueError, match="shared secret"):
+        decode(encode({'worker_id': 0}, 'another secret'), SECRET)
+
+    master = _get_master(max_iter=9)
+    master_url = master.start(OptFunctionSimulationProblem('branin'))
+    try:
+        with pytest.raises(HTTPError, match="403"):
+            WorkerClient(master_url, secret='another secret').run()
+        assert master.get_status()['n_registered_workers'] == 0
+    finally:
+        master._server.shutdown()
+
+
+def test_worker_app_only_obeys_its_secret() -> None:
+    app = create_worker_app(SECRET).test_client()
+    assert app.post('/start', data=encode({'master_url': 'http://127.0.0.1:1', 'max_blocks': 1},
+                                          'another secret')).status_code == 403
+    assert app.post('/stop', data=encode({}, 'another secret')).status_code == 403
+
+    master = _get_master(max_iter=9)
+    master_url = master.start(OptFunctionSimulationProblem('branin'))
+    # the client uses the secret of the app, whatever the request says (the master rejects another secret)
+    reply = app.post('/start', data=encode({'master_url': master_url, 'max_blocks': 1, 'secret': 'another secret'},
+                                           SECRET))
+    assert decode(reply.data, SECRET)['master_url'] == master_url
+    assert master.wait().optimisation_goals.fval == master.best_evaluations[2].optimisation_goals.fval
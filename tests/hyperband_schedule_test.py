@@ -0,0 +1,33 @@
+from fractions import Fraction
+
+import pytest
+
+from autotune.optimisers.hyperband_schedule import HyperbandSchedule, floor_log
+
+
+def test_floor_log_is_exact() -> None:
+    assert [floor_log(x, 3) for x in (1, 2, 3, 8, 9, 242, 243, 244)] == [0, 0, 1, 1, 2, 4, 5, 5]
+    assert floor_log(10 ** 30, 10) == 30  # int(math.log(x) / math.log(base)) gives 29 (and 4 for 243 in base 3)
+
+
+def test_hyperband_schedule() -> None:
+    schedule = HyperbandSchedule(max_iter=81, eta=3)
+    assert (schedule.s_max, schedule.s_min, schedule.budget) == (4, 2, 405)
+    assert [bracket.s for bracket in schedule] == [4, 3, 2]
+    assert [(rung.n_i, rung.r_i, rung.n_keep) for rung in schedule.brackets[0].rungs] == \
+        [(81, 1, 27), (27, 3, 9), (9, 9, 3), (3, 27, 1), (1, 81, 0)]
+    assert [bracket.get_cost() for bracket in schedule] == [405, 324, 243]
+    assert schedule.get_total_cost() == 972 and schedule.get_total_cost(with_reuse=True) == 729
+    assert schedule.get_peak_concurrent_arms() == 81 and schedule.get_peak_concurrent_arms(True) == 81 + 27 + 9
+    assert schedule.estimate_wall_time(2) == 2 * 972
+    assert schedule.estimate_wall_time(1, n_workers=81) == (1 + 3 + 9 + 27 + 81) + (3 + 9 + 27 + 81) + (9 + 27 + 81)
+
+    rungs = HyperbandSchedule(max_iter=100, eta=3).brackets[0].rungs
+    assert rungs[0].r_i == Fraction(100, 81) and rungs[-1].r_i == 100 and rungs[-1].resources == 100.0
+
+
+def test_hyperband_schedule_rejects_invalid_parameters() -> None:
+    with pytest.raises(ValueError):
+        HyperbandSchedule(max_iter=81, eta=1)
+    with pytest.raises(ValueError):
+        HyperbandSchedule(max_iter=0, eta=3)
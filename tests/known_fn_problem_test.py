@@ -0,0 +1,62 @@
+import pickle
+from typing import Dict, List
+
+import numpy as np
+
+from autotune.benchmarks import KnownFnProblem, KnownFnStore, OptFunctionProblem
+from autotune.benchmarks.known_loss_fn_problem import KnownFnIndex
+from autotune.core import Arm, Domain
+
+
+def _closest_arm_by_linear_scan(known_arms: List[Arm], proposed_arm: Arm, domain: Domain) -> Arm:
+    min_sq_error, min_sq_error_arm = np.inf, None
+    normalized_proposed_arm = Arm.normalize(proposed_arm, domain=domain)
+    for arm in known_arms:
+        normalized_arm = Arm.normalize(arm, domain=domain)
+        sq_error = sum((float(normalized_proposed_arm[hp]) - float(normalized_arm[hp])) ** 2
+                       for hp in proposed_arm.__dict__.keys())
+        if sq_error < min_sq_error:
+            min_sq_error_arm, min_sq_error = arm, sq_error
+    assert min_sq_error_arm is not None
+    return min_sq_error_arm
+
+
+def test_known_fn_index_matches_linear_scan() -> None:
+    np.random.seed(0)
+    problem = OptFunctionProblem('branin')
+    known_arms = [problem.get_evaluator().arm for _ in range(500)]
+    known_arms += [Arm(x=float(x), y=float(y)) for x in range(-5, 10, 3) for y in range(0, 15, 3)]  # on a grid
+    proposed_arms = [problem.get_evaluator().arm for _ in range(200)]
+    proposed_arms += [Arm(x=x + 1.5, y=y + 1.5) for x in range(-5, 10, 3) for y in range(0, 15, 3)]  # ties
+
+    index = KnownFnIndex.from_arms(known_arms, problem.domain)
+    expected = [_closest_arm_by_linear_scan(known_arms, arm, problem.domain) for arm in proposed_arms]
+    assert index.get_closest_arms(proposed_arms) == expected
+
+
+def test_known_fn_problem_evaluation() -> None:
+    np.random.seed(0)
+    problem = OptFunctionProblem('branin')
+    known_fs: Dict[Arm, List[float]] = {problem.get_evaluator().arm: [float(i), float(i) / 2] for i in range(100)}
+    known_fn_problem = KnownFnProblem(known_fs, problem)
+    arm = list(known_fs.keys())[42]
+    evaluator = known_fn_problem.get_evaluator(Arm(x=arm.x, y=arm.y))
+    assert evaluator.evaluate(n_resources=2).fval == 21.
+    assert evaluator.closest_arm is arm
+
+
+def test_known_fn_store_round_trip(tmp_path) -> None:
+    np.random.seed(0)
+    problem = OptFunctionProblem('branin')
+    known_fs: Dict[Arm, List[float]] = {problem.get_evaluator().arm: [0.5] * (1 + i % 7) for i in range(100)}
+    KnownFnStore.from_known_fs(known_fs).save(str(tmp_path))
+    store = KnownFnStore.load(str(tmp_path))
+    assert len(store) == len(known_fs)
+    assert [store.get_loss_function(i) for i in range(len(store))] == list(known_fs.values())
+    assert [store.get_arm(i) for i in range(len(store))] == list(known_fs.keys())
+    assert pickle.loads(pickle.dumps(store)) is store  # pickled as its directory, loaded once per process
+
+    arm = list(known_fs.keys())[42]
+    evaluator = KnownFnProblem(store, problem).get_evaluator(Arm(x=arm.x, y=arm.y))
+    assert evaluator.evaluate(n_resources=1).fvals == known_fs[arm]
+    assert evaluator.closest_arm == arm
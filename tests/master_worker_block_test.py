@@ -0,0 +1,77 @@
+import os
+from fractions import Fraction
+from typing import List
+
+import numpy as np
+import pytest
+
+from autotune.benchmarks import OptFunctionSimulationProblem
+from autotune.core import Evaluation, HyperparameterOptimisationProblem, OptimisationGoals
+from autotune.optimisers import RandomOptimiser
+from autotune.optimisers.hyperband_schedule import HyperbandSchedule
+from autotune.optimisers.parallel.master_worker_block import Block, Master, Worker
+
+
+def optimisation_func(opt_goals: OptimisationGoals) -> float:
+    return opt_goals.fval
+
+
+def test_idle_worker_steals_from_longest_queue() -> None:
+    master = Master(n_workers=3, eta=3, sampler=RandomOptimiser, max_iter=81, max_block_size=10)
+    parts = master._split(Block(bracket=4, i=1, max_i=5, n_i=81, r_i=Fraction(1)))
+    assert [part.n_i for part in parts] == [9] * 9 and [part.part for part in parts] == list(range(9))
+    master._queues[0].extend(parts[:2])
+    master._queues[1].extend(parts[2:])
+    assert master._get_next_block(0) is parts[0]
+    assert master._get_next_block(2) is parts[-1]  # the newest block of the longest queue
+    assert master._get_next_block(0) is parts[1]
+    assert master._get_next_block(0) is parts[-2]
+
+
+def test_rungs_are_split_across_workers_by_default() -> None:
+    block = Block(bracket=4, i=1, max_i=5, n_i=81, r_i=Fraction(1))
+    parts = Master(n_workers=8, eta=3, sampler=RandomOptimiser, max_iter=81)._split(block)
+    assert [part.n_i for part in parts] == [11] + [10] * 7  # at most ceil(81 / 8) arms each
+    assert Master(n_workers=8, eta=3, sampler=RandomOptimiser, max_iter=81, max_block_size=None)._split(block) == [block]
+
+
+def test_master_runs_all_brackets_on_worker_processes() -> None:
+    master = Master(n_workers=2, eta=3, sampler=RandomOptimiser, max_iter=27, optimisation_func=optimisation_func,
+                    max_block_size=4, seed=0)
+    best = master.run_optimisation(OptFunctionSimulationProblem('branin'))
+    assert sorted(master.best_evaluations) == sorted(bracket.s for bracket in HyperbandSchedule(27, 3))
+    assert best.optimisation_goals.fval == min(e.optimisation_goals.fval for e in master.best_evaluations.values())
+    assert not master._rungs and not any(master._queues)
+
+
+class _DyingWorker(Worker):
+    """Worker whose process dies (eg. killed by the OOM killer) as soon as it is given a block."""
+
+    def consume_block(self, block: Block, problem: HyperparameterOptimisationProblem) -> List[Evaluation]:
+        os._exit(1)
+
+
+def test_blocks_of_dead_workers_are_queued_again() -> None:
+    master = Master(n_workers=2, eta=3, sampler=RandomOptimiser, max_iter=27, optimisation_func=optimisation_func,
+                    max_block_size=4, seed=0, poll_interval=0.1)
+    master._workers[0] = _DyingWorker(master.eta, optimisation_func, RandomOptimiser)
+    master.run_optimisation(OptFunctionSimulationProblem('branin'))
+    assert sorted(master.best_evaluations) == sorted(bracket.s for bracket in HyperbandSchedule(27, 3))
+    assert not master._rungs and not any(master._queues)
+
+
+def test_master_raises_once_all_workers_died() -> None:
+    master = Master(n_workers=2, eta=3, sampler=RandomOptimiser, max_iter=27, optimisation_func=optimisation_func,
+                    poll_interval=0.1)
+    master._workers = [_DyingWorker(master.eta, optimisation_func, RandomOptimiser) for _ in range(2)]
+    with pytest.raises(RuntimeError, match="All 2 worker processes died"):
+        master.run_optimisation(OptFunctionSimulationProblem('branin'))
+
+
+def test_global_seed_reproduces_runs() -> None:
+    def run() -> float:
+        np.random.seed(0)
+        master = Master(n_workers=1, eta=3, sampler=RandomOptimiser, max_iter=27, optimisation_func=optimisation_func)
+        return master.run_optimisation(OptFunctionSimulationProblem('branin')).optimisation_goals.fval
+
+    assert run() == run()
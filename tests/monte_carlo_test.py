@@ -0,0 +1,74 @@
+import random
+
+import numpy as np
+import pytest
+
+from autotune.experiments.monte_carlo import KsDistanceStoppingRule, MeanOfeStoppingRule, OptimumsFile, run_monte_carlo
+
+N_RUNS = 8
+SEED = 42
+
+
+_offset = 0.0  # set once per process by _set_offset
+
+
+def _noisy_run(_: np.random.SeedSequence) -> float:
+    return float(np.random.randn() + random.random())
+
+
+def _set_offset(offset: float) -> None:
+    global _offset
+    _offset = offset
+
+
+def _offset_run(seed_sequence: np.random.SeedSequence) -> float:
+    return _offset + _noisy_run(seed_sequence)
+
+
+def test_runs_are_reproducible_across_processes() -> None:
+    serial = run_monte_carlo(_noisy_run, N_RUNS, seed=SEED)
+    assert serial == run_monte_carlo(_noisy_run, N_RUNS, seed=SEED, n_processes=2)
+    assert len(set(serial)) == N_RUNS
+
+
+def test_initializer_runs_in_every_process() -> None:
+    expected = [optimum + 100 for optimum in run_monte_carlo(_noisy_run, N_RUNS, seed=SEED)]
+    for n_processes in (1, 2):
+        assert run_monte_carlo(_offset_run, N_RUNS, seed=SEED, n_processes=n_processes, initializer=_set_offset,
+                               initargs=(100,)) == expected
+
+
+def test_partial_batch_is_resumed(tmp_path) -> None:  # type: ignore
+    path = str(tmp_path / "optimums.txt")
+    first_half = run_monte_carlo(_noisy_run, N_RUNS // 2, seed=SEED, optimums_path=path)
+
+    finished = []
+    optimums = run_monte_carlo(_noisy_run, N_RUNS, optimums_path=path, on_result=lambda i, _: finished.append(i))
+    assert sorted(finished) == list(range(N_RUNS // 2, N_RUNS))
+    assert optimums[:N_RUNS // 2] == first_half
+    assert optimums == run_monte_carlo(_noisy_run, N_RUNS, seed=SEED)
+    assert OptimumsFile(path).read() == dict(enumerate(optimums))
+
+
+def test_stopping_rule_stops_at_the_same_run_in_parallel() -> None:
+    stopping_rule = MeanOfeStoppingRule(tolerance=0.4, min_runs=10)
+    optimums = run_monte_carlo(_noisy_run, 1000, seed=SEED, stopping_rule=stopping_rule)
+    assert 10 <= len(optimums) < 1000
+    assert stopping_rule.get_half_width(optimums) <= 0.4 < stopping_rule.get_half_width(optimums[:-1])
+    assert optimums == run_monte_carlo(_noisy_run, 1000, seed=SEED, n_processes=2, stopping_rule=stopping_rule)
+
+
+def test_ks_distance_stopping_rule() -> None:
+    with pytest.raises(ValueError):
+        KsDistanceStoppingRule(np.zeros(10), tolerance=0.1)
+    stopping_rule = KsDistanceStoppingRule(np.random.randn(20000), tolerance=0.1)
+    optimums = run_monte_carlo(_noisy_run, 1000, seed=SEED, stopping_rule=stopping_rule)
+    assert stopping_rule.get_half_width(optimums) <= 0.1 < stopping_rule.get_half_width(optimums[:-1])
+
+
+def test_ks_distance_half_width_depends_on_the_optimums() -> None:
+    reference_optimums = np.random.randn(1000)
+    stopping_rule = KsDistanceStoppingRule(reference_optimums, tolerance=0.1)
+    # optimums that are all above the reference are at distance 1 in every resample, close ones are not
+    assert stopping_rule.get_half_width(reference_optimums.max() + 1 + np.arange(50)) == 0
+    assert stopping_rule.get_half_width(np.random.randn(50)) > 0
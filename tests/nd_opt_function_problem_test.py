@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from autotune.benchmarks import (
+    AVAILABLE_ND_OPT_FUNCTIONS, NdOptFunctionProblem, NdOptFunctionSimulationProblem, OptFunctionProblem)
+from autotune.benchmarks.nd_opt_function_problem import ND_OPT_FUNCTIONS, get_points
+from autotune.core import EvaluatorParams, OptimisationGoals
+from autotune.optimisers import HyperbandOptimiser
+
+
+def test_global_minima() -> None:
+    d = 30
+    assert ND_OPT_FUNCTIONS['rastrigin'](np.zeros((1, d)))[0] == 0
+    assert ND_OPT_FUNCTIONS['ackley'](np.zeros((1, d)))[0] == pytest.approx(0, abs=1e-12)
+    assert ND_OPT_FUNCTIONS['levy'](np.ones((1, d)))[0] == pytest.approx(0, abs=1e-12)
+    assert ND_OPT_FUNCTIONS['styblinski_tang'](np.full((1, d), -2.903534))[0] == pytest.approx(-39.16617 * d)
+
+
+def test_rastrigin_matches_2d() -> None:
+    np.random.seed(0)
+    problem_2d, problem_nd = OptFunctionProblem('rastrigin'), NdOptFunctionProblem('rastrigin', 2)
+    evaluators = [problem_2d.get_evaluator() for _ in range(100)]
+    xs = np.array([[e.arm.x, e.arm.y] for e in evaluators])
+    expected = [e.evaluate(n_resources=1).fval for e in evaluators]
+    np.testing.assert_allclose(ND_OPT_FUNCTIONS['rastrigin'](xs), expected)
+    assert problem_nd.domain['x1'].min_val == problem_2d.domain['x'].min_val
+
+
+@pytest.mark.parametrize("func_name", AVAILABLE_ND_OPT_FUNCTIONS)
+def test_evaluate_batch_matches_evaluate(func_name: str) -> None:
+    np.random.seed(0)
+    problem = NdOptFunctionProblem(func_name, 50)
+    evaluators = [problem.get_evaluator() for _ in range(20)]
+    assert get_points([evaluators[0].arm], 50).shape == (1, 50)
+    expected = [evaluator.evaluate(n_resources=1).fval for evaluator in evaluators]
+    np.testing.assert_allclose([goals.fval for goals in problem.evaluate_batch(evaluators, n_resources=1)], expected)
+
+
+def test_simulation() -> None:
+    np.random.seed(0)
+    problem = NdOptFunctionSimulationProblem('ackley', 20, seed=0)
+    evaluator = problem.get_evaluator(max_resources=27)
+    assert evaluator.evaluate(n_resources=27).fval == pytest.approx(evaluator.get_function_value() - 200)
+    assert problem.simulate_batch([EvaluatorParams(None, 0.9, 10, 0.1, max_res=27)] * 5).shape == (5, 27)
+
+    def optimisation_func(opt_goals: OptimisationGoals) -> float:
+        return opt_goals.fval
+
+    optimiser = HyperbandOptimiser(eta=3, max_iter=27, optimisation_func=optimisation_func, is_simulation=True)
+    assert optimiser.run_optimisation(problem, verbosity=False).evaluator.arm.x20 is not None
+
+
+@pytest.mark.parametrize("problem", [NdOptFunctionProblem('levy', 2), NdOptFunctionSimulationProblem('levy', 2)])
+def test_surfaces_are_not_supported(problem: OptFunctionProblem) -> None:
+    with pytest.raises(TypeError):
+        problem.sample_domain(100)
+    with pytest.raises(TypeError):
+        problem.plot_surface(100)
@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+from autotune.benchmarks import AVAILABLE_OPT_FUNCTIONS, OptFunctionProblem, OptFunctionSimulationProblem
+from autotune.benchmarks.opt_function_problem import OPT_FUNCTIONS
+from autotune.core import OptimisationGoals
+from autotune.optimisers import RandomOptimiser
+
+
+@pytest.mark.parametrize("func_name", AVAILABLE_OPT_FUNCTIONS)
+def test_evaluate_batch_matches_evaluate(func_name: str) -> None:
+    np.random.seed(0)
+    problem = OptFunctionProblem(func_name)
+    evaluators = [problem.get_evaluator() for _ in range(100)]
+    expected = [evaluator.evaluate(n_resources=1).fval for evaluator in evaluators]
+    np.testing.assert_allclose([goals.fval for goals in problem.evaluate_batch(evaluators, n_resources=1)], expected)
+
+
+def test_noise_is_drawn_per_value() -> None:
+    xs, ys = np.zeros(1000), np.ones(1000)
+    noisy = OPT_FUNCTIONS['branin'](xs, ys, noise_variance=1, rng=np.random.default_rng(0))
+    assert len(set(noisy - OPT_FUNCTIONS['branin'](xs, ys))) == 1000
+
+
+def test_random_search_in_batches() -> None:
+    assert OptFunctionProblem.supports_batch_evaluation
+    assert not OptFunctionSimulationProblem.supports_batch_evaluation
+
+    def optimisation_func(opt_goals: OptimisationGoals) -> float:
+        return opt_goals.fval
+
+    np.random.seed(0)
+    optimiser = RandomOptimiser(n_resources=1, max_iter=2500, min_or_max=min, optimisation_func=optimisation_func)
+    optimum = optimiser.run_optimisation(OptFunctionProblem('branin'), verbosity=False)
+    assert optimiser.num_iterations == len(optimiser.eval_history) == 2500
+    assert optimum.optimisation_goals.fval == min(optimisation_func(e.optimisation_goals) for e in optimiser.eval_history)
+    assert optimum.optimisation_goals.fval == OPT_FUNCTIONS['branin'](optimum.evaluator.arm.x, optimum.evaluator.arm.y)
+
+
+def test_plot_surface_to_file(tmp_path) -> None:
+    OptFunctionProblem('camel').plot_surface(10000, is_grid=True, file_path=str(tmp_path / "surface.png"))
+    OptFunctionSimulationProblem('branin').plot_surface(500, max_resources=9, file_path=str(tmp_path / "sim.png"))
+    assert (tmp_path / "surface.png").exists() and (tmp_path / "sim.png").exists()
+
+
+def test_noise_free_evaluation_draws_nothing() -> None:
+    problem = OptFunctionProblem('branin')
+    evaluators = [problem.get_evaluator() for _ in range(10)]
+    state = np.random.get_state()
+    problem.evaluate_batch(evaluators, n_resources=1)
+    evaluators[0].evaluate(n_resources=1)
+    assert np.array_equal(np.random.get_state()[1], state[1])
+    noise = OPT_FUNCTIONS['branin'](np.zeros(1000), np.ones(1000), noise_variance=1) - OPT_FUNCTIONS['branin'](0, 1)
+    assert len(set(noise)) == 1000  # drawn per value from the global numpy random state too
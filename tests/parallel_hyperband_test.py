@@ -0,0 +1,62 @@
+from typing import List, Tuple
+
+import numpy as np
+
+from autotune.benchmarks import OptFunctionSimulationProblem
+from autotune.core import Evaluation, Evaluator, HyperparameterOptimisationProblem, OptimisationGoals
+from autotune.optimisers import HyperbandOptimiser
+from autotune.optimisers.hyperband_schedule import Bracket, HyperbandSchedule
+from autotune.optimisers.parallel import ParallelHyperbandOptimiser
+
+ETA = 3
+MAX_ITER = 27
+
+
+def optimisation_func(opt_goals: OptimisationGoals) -> float:
+    return opt_goals.fval
+
+
+def test_concurrent_brackets_match_sequential_hyperband() -> None:
+    sequential = HyperbandOptimiser(eta=ETA, max_iter=MAX_ITER, optimisation_func=optimisation_func)
+    expected = sequential.run_optimisation(OptFunctionSimulationProblem('branin', crn=0), verbosity=False)
+
+    optimiser = ParallelHyperbandOptimiser(eta=ETA, max_iter=MAX_ITER, optimisation_func=optimisation_func,
+                                           n_workers=len(sequential.schedule))
+    optimum = optimiser.run_optimisation(OptFunctionSimulationProblem('branin', crn=0), verbosity=False)
+
+    # brackets are merged as they finish, so only the order of the evaluation history may differ
+    assert sorted(optimiser.eval_history.values.tolist()) == sorted(sequential.eval_history.values.tolist())
+    assert optimiser.num_iterations == sequential.num_iterations == sum(len(b.rungs) for b in sequential.schedule)
+    assert optimum.evaluator.arm == expected.evaluator.arm
+    assert optimum.optimisation_goals.fval == expected.optimisation_goals.fval
+
+
+class _FirstDrawOptimiser(ParallelHyperbandOptimiser):
+    """Records the first value that every bracket draws from the global numpy random state."""
+
+    def _run_bracket(self, problem: HyperparameterOptimisationProblem, bracket: Bracket,
+                     evaluators: List[Evaluator]) -> List[Tuple[Evaluation, float]]:
+        first_draw = np.random.random()
+        best_evaluations = super()._run_bracket(problem, bracket, evaluators)
+        best_evaluations[0][0].evaluator.first_draw = first_draw
+        return best_evaluations
+
+
+def test_brackets_draw_different_values_in_worker_processes() -> None:
+    optimiser = _FirstDrawOptimiser(eta=ETA, max_iter=MAX_ITER, optimisation_func=optimisation_func,
+                                    n_workers=len(HyperbandSchedule(MAX_ITER, ETA)))
+    optimiser.run_optimisation(OptFunctionSimulationProblem('branin'), verbosity=False)
+    first_draws = {id(evaluation.evaluator): evaluation.evaluator.first_draw for evaluation in optimiser.eval_history
+                   if hasattr(evaluation.evaluator, 'first_draw')}  # the same evaluator may be the best of many rungs
+    assert len(set(first_draws.values())) == len(first_draws) == len(optimiser.schedule)
+
+
+def test_global_seed_reproduces_runs_with_any_number_of_workers() -> None:
+    def run(n_workers: int) -> List[float]:
+        np.random.seed(0)
+        optimiser = ParallelHyperbandOptimiser(eta=ETA, max_iter=MAX_ITER, optimisation_func=optimisation_func,
+                                               n_workers=n_workers)
+        optimiser.run_optimisation(OptFunctionSimulationProblem('branin'), verbosity=False)
+        return sorted(optimiser.eval_history.values.tolist())  # brackets are merged as they finish
+
+    assert run(2) == run(2) == run(1)
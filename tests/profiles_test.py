@@ -0,0 +1,34 @@
+from typing import List
+
+import numpy as np
+
+from autotune.experiments.simulation_evaluation import profiles
+from autotune.experiments.simulation_evaluation.profiles import get_dynamic_order_profile, get_ends_order_profile
+
+
+def _naive_order_score(loss_functions: np.ndarray, before: int, after: int) -> float:
+    num_func = loss_functions.shape[0]
+    function_scores = []
+    for i in range(num_func):
+        still_less = {j for j in range(num_func) if loss_functions[j, after] < loss_functions[i, after]} & \
+                     {j for j in range(num_func) if loss_functions[j, before] < loss_functions[i, before]}
+        still_great = {j for j in range(num_func) if loss_functions[j, after] > loss_functions[i, after]} & \
+                      {j for j in range(num_func) if loss_functions[j, before] > loss_functions[i, before]}
+        function_scores.append((len(still_less) + len(still_great)) / (num_func - 1))
+    return sum(function_scores) / len(function_scores)
+
+
+def _naive_dynamic_order_profile(loss_functions: np.ndarray) -> List[float]:
+    return [_naive_order_score(loss_functions, t - 1, t) for t in range(1, loss_functions.shape[1])]
+
+
+def test_order_profiles_match_naive_implementation(monkeypatch) -> None:  # type: ignore
+    monkeypatch.setattr(profiles, 'CHUNK_SIZE', 100)  # several chunks of epochs
+    rng = np.random.default_rng(0)
+    continuous = np.cumsum(rng.standard_normal((40, 15)), axis=1)
+    with_ties = rng.integers(0, 4, size=(40, 15)).astype(float)
+    with_nans = continuous.copy()
+    with_nans[rng.random(with_nans.shape) < 0.05] = np.nan
+    for loss_functions in (continuous, with_ties, with_nans, continuous[:2]):
+        assert get_dynamic_order_profile(loss_functions) == _naive_dynamic_order_profile(loss_functions)
+        assert get_ends_order_profile(loss_functions) == _naive_order_score(loss_functions, 0, 14)
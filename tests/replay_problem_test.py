@@ -0,0 +1,36 @@
+import pickle
+
+import numpy as np
+
+from autotune.benchmarks import OptFunctionProblem, ReplayProblem, load_recorded_loss_functions
+from autotune.core import Arm, OptimisationGoals
+from autotune.optimisers import HyperbandOptimiser
+
+
+def test_replay_problem(tmp_path) -> None:
+    np.random.seed(0)
+    domain = OptFunctionProblem('branin').domain
+    recorded_fs = {}
+    for i in range(20):
+        arm = Arm(x=float(np.random.uniform(-5, 10)), y=float(np.random.uniform(1, 15)))
+        recorded_fs[arm] = list(np.random.rand(1 + i))
+        arm_dir = tmp_path / f"arm-{i}"
+        arm_dir.mkdir()
+        with open(arm_dir / "loss_progress.model.pth", "wb") as f:
+            pickle.dump(([1] + recorded_fs[arm], arm), f)  # as saved by TorchEvaluator, starting with the initial 1
+    assert load_recorded_loss_functions([tmp_path]) == recorded_fs
+
+    problem = ReplayProblem.from_output_dirs([tmp_path], domain)
+    arm, loss_fn = list(recorded_fs.items())[10]
+    evaluator = problem.get_evaluator(Arm(x=arm.x, y=arm.y))
+    assert evaluator.evaluate(n_resources=3).validation_error == loss_fn[2]
+    assert evaluator.evaluate(n_resources=100).validation_error == loss_fn[-1]  # only 11 epochs were recorded
+    assert evaluator.closest_arm == arm
+
+    def optimisation_func(opt_goals: OptimisationGoals) -> float:
+        return opt_goals.validation_error
+
+    optimiser = HyperbandOptimiser(eta=3, max_iter=9, min_or_max=min, optimisation_func=optimisation_func,
+                                   is_simulation=True)
+    optimum = optimiser.run_optimisation(problem, verbosity=False)
+    assert optimum.optimisation_goals.validation_error in {val_error for fn in recorded_fs.values() for val_error in fn}
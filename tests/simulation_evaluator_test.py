@@ -0,0 +1,167 @@
+import pickle
+from typing import List, Optional
+
+import numpy as np
+
+from autotune.benchmarks import OptFunctionSimulationProblem
+from autotune.benchmarks.opt_function_simulation_problem import OptFunctionSimulationEvaluator
+from autotune.core import (
+    Arm, CommonRandomNumbers, CurveBank, EvaluatorParams, ShapeFamily, SimulationEvaluator, simulate_batch)
+from autotune.core.curve_bank import simulate_shapes
+from autotune.core.simulation_evaluator import ZERO_AGGRESSIVENESS_MODE, get_gamma_process_schedule
+
+MAX_RESOURCES = 81
+SEED = 3
+
+FAMILIES_OF_SHAPES = (
+    ShapeFamily(None, 1.5, 10, 15, False),  # with aggressive start
+    ShapeFamily(None, 0.5, 7, 10, False),   # with average aggressiveness at start and at the beginning
+    ShapeFamily(None, 0.2, 4, 7, True),     # non aggressive start, aggressive end
+)
+
+
+def _simulate_one_by_one(f_1s: np.ndarray, f_ns: np.ndarray) -> np.ndarray:
+    loss_functions = []
+    for i, (f_1, f_n) in enumerate(zip(f_1s, f_ns)):
+        _, ml_agg, necessary_agg, up_spikiness, is_smooth, *_ = FAMILIES_OF_SHAPES[i % len(FAMILIES_OF_SHAPES)]
+        evaluator = SimulationEvaluator(ml_agg, necessary_agg, up_spikiness, MAX_RESOURCES, is_smooth)
+        evaluator.non_smooth_fs = [f_1]
+        evaluator.simulate(MAX_RESOURCES, MAX_RESOURCES, f_n)
+        loss_functions.append(evaluator.fs)
+    return np.array(loss_functions)
+
+
+def _simulate_batch(f_1s: np.ndarray, f_ns: np.ndarray) -> np.ndarray:
+    families = [FAMILIES_OF_SHAPES[i % len(FAMILIES_OF_SHAPES)] for i in range(len(f_1s))]
+    return simulate_batch(
+        f_1s, f_ns, ml_aggressiveness=[f.ml_agg for f in families],
+        necessary_aggressiveness=[f.necessary_agg for f in families], up_spikiness=[f.up_spikiness for f in families],
+        max_resources=MAX_RESOURCES, is_smooth=[f.is_smooth for f in families])
+
+
+def test_batch_simulation_matches_sequential_simulation() -> None:
+    f_1s, f_ns = np.linspace(50, 150, 12), np.linspace(-150, -50, 12)
+    np.random.seed(SEED)
+    expected = _simulate_one_by_one(f_1s, f_ns)
+    np.random.seed(SEED)
+    actual = _simulate_batch(f_1s, f_ns)
+
+    assert actual.shape == (12, MAX_RESOURCES)
+    np.testing.assert_allclose(actual, expected, rtol=0, atol=1e-9)
+
+
+def test_batch_simulation_reaches_target() -> None:
+    f_1s, f_ns = np.full(30, 100.), np.full(30, -100.)
+    non_smooth = simulate_batch(f_1s, f_ns, 1.5, 10, 15, MAX_RESOURCES, is_smooth=False)
+    np.testing.assert_allclose(non_smooth[:, 0], f_1s)
+    np.testing.assert_allclose(non_smooth[:, -1], f_ns)
+
+
+def test_problem_batch_simulation() -> None:
+    problem = OptFunctionSimulationProblem('rastrigin')
+    params = [EvaluatorParams(None, *family[1:], max_res=MAX_RESOURCES, noise=10)  # type: ignore
+              for family in FAMILIES_OF_SHAPES * 4]
+    loss_functions = problem.simulate_batch(params)
+    assert loss_functions.shape == (12, MAX_RESOURCES)
+    assert np.isfinite(loss_functions).all()
+
+
+def test_gamma_process_schedule() -> None:
+    n, k = MAX_RESOURCES + 1, ZERO_AGGRESSIVENESS_MODE
+    schedule = get_gamma_process_schedule(n, k)
+    assert schedule is get_gamma_process_schedule(n, k)
+    for time in (0, 1, n // 2, n - 1):
+        beta_t = (k + np.sqrt(k**2 + 4 * (n - time))) / (2*(n-time))
+        assert schedule.shapes[time] == k * beta_t + 1
+        assert schedule.scales[time] == 1 / beta_t
+    assert schedule.draw(1, n, size=(5, n - 1)).shape == (5, n - 1)
+
+
+def test_simulated_loss_function_is_memoized() -> None:
+    problem = OptFunctionSimulationProblem('rastrigin')
+    evaluator = problem.get_evaluator(None, 0.2, 4, 7, True, max_resources=MAX_RESOURCES, init_noise=10)
+    first = [evaluator.evaluate(n_resources=r).fval for r in (1, 3, 9, 27, 81)]
+    loss_function = evaluator.fs
+    assert evaluator.fs is loss_function
+    assert [evaluator.evaluate(n_resources=r).fval for r in (1, 3, 9, 27, 81)] == first
+    assert evaluator.non_smooth_fs[0] == evaluator.f_1 and evaluator.non_smooth_fs[-1] == evaluator.f_n
+
+
+def test_lazy_simulation_matches_full_simulation() -> None:
+    arm = OptFunctionSimulationProblem('rastrigin').get_evaluator().arm
+    full = OptFunctionSimulationProblem('rastrigin', seed=SEED).get_evaluator(
+        arm, 1.5, 10, 15, False, max_resources=MAX_RESOURCES, init_noise=10)
+    lazy = OptFunctionSimulationProblem('rastrigin', is_lazy=True, seed=SEED).get_evaluator(
+        arm, 1.5, 10, 15, False, max_resources=MAX_RESOURCES, init_noise=10)
+
+    for n_resources in (1, 3, 9, 27, 81):
+        assert lazy.evaluate(n_resources=n_resources).fval == full.evaluate(n_resources=n_resources).fval
+        assert len(lazy.non_smooth_fs) == n_resources
+    assert lazy.non_smooth_fs == full.non_smooth_fs
+
+
+def test_lazy_simulation_is_reproduced_by_the_global_seed() -> None:
+    def simulate() -> List[float]:
+        np.random.seed(SEED)
+        evaluator = OptFunctionSimulationProblem('rastrigin', is_lazy=True).get_evaluator(
+            None, 1.5, 10, 15, False, max_resources=MAX_RESOURCES, init_noise=10)
+        evaluator.evaluate(n_resources=MAX_RESOURCES)
+        return evaluator.non_smooth_fs
+
+    assert simulate() == simulate()
+
+
+def test_common_random_numbers() -> None:
+    def simulate(problem: OptFunctionSimulationProblem, arm: Optional[Arm] = None) -> OptFunctionSimulationEvaluator:
+        evaluator = problem.get_evaluator(arm, 1.5, 10, 15, False, max_resources=MAX_RESOURCES, init_noise=10)
+        evaluator.evaluate(n_resources=MAX_RESOURCES)
+        return evaluator
+
+    problem, other_problem = [OptFunctionSimulationProblem('rastrigin', crn=SEED) for _ in range(2)]
+    random_evaluators = [simulate(problem) for _ in range(3)]
+    simulate(other_problem, Arm(x=0.5, y=0.5))  # another optimiser may evaluate some arms of its own in between
+    other_evaluators = [simulate(other_problem) for _ in range(3)]
+    for evaluator, other_evaluator in zip(random_evaluators, other_evaluators):
+        assert str(evaluator.arm) == str(other_evaluator.arm)
+        assert evaluator.non_smooth_fs == other_evaluator.non_smooth_fs
+
+    # an arm suggested with other numeric types (eg. by TPE) gets the same loss function as the same random arm
+    arm = random_evaluators[-1].arm
+    same_arm = Arm(y=float(arm.y), x=float(arm.x))
+    assert simulate(other_problem, same_arm).non_smooth_fs == random_evaluators[-1].non_smooth_fs
+
+    crn = CommonRandomNumbers(SEED)
+    assert crn.families_seed == CommonRandomNumbers(SEED).families_seed != CommonRandomNumbers(SEED + 1).families_seed
+
+
+def test_simulated_shapes_match_simulation() -> None:
+    f_1s, f_ns = np.linspace(50, 150, 12), np.linspace(-150, -50, 12)
+    for family in FAMILIES_OF_SHAPES:
+        np.random.seed(SEED)
+        expected = simulate_batch(f_1s, f_ns, *family[1:4], MAX_RESOURCES, is_smooth=family.is_smooth)
+        np.random.seed(SEED)
+        alphas, gammas = simulate_shapes(*family[1:4], MAX_RESOURCES, len(f_1s), is_smooth=family.is_smooth)
+        actual = f_ns[:, None] + alphas * (f_1s - f_ns)[:, None] + gammas
+        np.testing.assert_allclose(actual, expected, rtol=0, atol=1e-9)
+
+
+def test_curve_bank(tmp_path) -> None:  # type: ignore
+    family = FAMILIES_OF_SHAPES[2]
+    bank = CurveBank.get_or_create(str(tmp_path), family, MAX_RESOURCES, n_curves=50)
+    assert len(bank) == 50 and bank.max_resources == MAX_RESOURCES
+    assert bank is CurveBank.get_or_create(str(tmp_path), family, MAX_RESOURCES, n_curves=50)
+
+    problem = OptFunctionSimulationProblem('rastrigin', curve_bank_dir=str(tmp_path), curve_bank_size=50)
+    evaluator = problem.get_evaluator(None, *family[1:], max_resources=MAX_RESOURCES, init_noise=10)
+    evaluator.evaluate(n_resources=MAX_RESOURCES)
+    assert any(np.allclose(evaluator.fs, bank.get_loss_function(i, evaluator.f_1, evaluator.f_n)) for i in range(50))
+    assert problem.get_evaluator(None, *family[1:], max_resources=MAX_RESOURCES).curve_bank is evaluator.curve_bank
+
+
+def test_curve_bank_is_looked_up_once_per_problem(tmp_path, monkeypatch) -> None:  # type: ignore
+    problem = OptFunctionSimulationProblem('rastrigin', curve_bank_dir=str(tmp_path), curve_bank_size=50)
+    problem.get_evaluator(None, *FAMILIES_OF_SHAPES[2][1:], max_resources=MAX_RESOURCES)
+    monkeypatch.setattr(CurveBank, 'get_or_create', None)  # any further lookup would fail
+    for _ in range(3):
+        problem.get_evaluator(None, *FAMILIES_OF_SHAPES[2][1:], max_resources=MAX_RESOURCES)
+    assert pickle.loads(pickle.dumps(problem))._curve_banks == problem._curve_banks  # the bank is pickled by path